@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from agent import policies
+from agent.graph import new_call_id
+from agent.state import AgentState, graph_input
+from agent.streaming import Event, run_streaming
+from tools.cache import ToolCache
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key        TEXT PRIMARY KEY,
+    question   TEXT NOT NULL,
+    payload    TEXT NOT NULL,
+    size       INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_used  REAL NOT NULL,
+    hits       INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS answers_last_used ON answers (last_used);
+"""
+
+
+def normalize_question(question: str) -> str:
+    """
+    Case, punctuation and whitespace variants of a question map to the same string.
+    """
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+
+def question_key(question: str) -> str:
+    """
+    The normalized question plus what the planner reads from the raw text
+    (policies.analyze): triggers and terms, quoted terms included. So `define "foo bar"`
+    and `define foo bar`, or `tl;dr` and `tl dr`, which are planned differently, never
+    share an answer although they normalize alike.
+    """
+    features = policies.analyze(question)
+    return "\x1f".join([normalize_question(question), "|".join(sorted(features.triggers)), "|".join(features.terms)])
+
+
+def answer_cache_version(registry, glossary_path: Optional[str] = None) -> Callable[[], Any]:
+    """
+    version_fn for an AnswerCache: the registry's data version (the KB) plus digests of
+    the definitions (DEFINITIONS or the glossary file) and of the planner's vocabulary.
+    All are content based, so editing any of them invalidates answers across restarts.
+    """
+    from tools.implementations import definitions_digest
+
+    def version() -> Any:
+        return (registry.data_version(), definitions_digest(glossary_path), policies.vocabulary_digest())
+
+    return version
+
+
+class AnswerCache:
+    """
+    Whole-answer cache in a local SQLite file, fronted by an in-process LRU.
+
+    Keyed on the question (question_key), the data version (KB, definitions and
+    vocabulary, see answer_cache_version), max_iterations and a namespace for anything
+    else that changes answers (answer_cache_namespace). The file
+    is shared across restarts and processes (WAL mode); when it grows past `max_bytes`
+    of stored payloads, the least recently used answers are evicted.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        namespace: str = "",
+        version_fn: Optional[Callable[[], Any]] = None,
+        memory_entries: int = 1024,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.namespace = namespace
+        self._version_fn = version_fn
+        self._memory = ToolCache(max_entries=memory_entries, ttl_s=None)
+        self._local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections are per thread.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def key(self, question: str, max_iterations: int) -> str:
+        version = self._version_fn() if self._version_fn else None
+        raw = "\x1f".join([question_key(question), str(version), str(max_iterations), self.namespace])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question: str, max_iterations: int) -> Optional[Dict[str, Any]]:
+        """
+        Cached final state (as graph.invoke returns it, plus "cached": True), or None.
+        """
+        key = self.key(question, max_iterations)
+        hit, state = self._memory.get(key)
+        if not hit:
+            row = self._conn().execute("SELECT payload FROM answers WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            state = AgentState.model_validate_json(row[0])
+            self._memory.put(key, state)
+            self._conn().execute(
+                "UPDATE answers SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+            )
+        self.hits += 1
+        out = {name: getattr(state, name) for name in AgentState.model_fields}
+        out["cached"] = True
+        return out
+
+    def put(self, question: str, max_iterations: int, out: Dict[str, Any]) -> None:
+        key = self.key(question, max_iterations)
+        state = AgentState.model_validate({k: v for k, v in out.items() if k in AgentState.model_fields})
+        payload = state.model_dump_json()
+        now = time.time()
+
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO answers (key, question, payload, size, created_at, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, question, payload, len(payload), now, now),
+        )
+        self._memory.put(key, state)
+        self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM answers").fetchone()[0]
+        while total > self.max_bytes:
+            rows = conn.execute("SELECT key, size FROM answers ORDER BY last_used LIMIT 64").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        # Evicted keys may linger in the in-process front; they stay valid answers.
+
+    def stats(self) -> Dict[str, Any]:
+        count, size = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM answers").fetchone()
+        return {"entries": count, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM answers")
+        self._memory.clear()
+
+
+def answer_cache_namespace(
+    search_backend: str,
+    kb_path: Optional[str],
+    glossary_path: Optional[str] = None,
+    kb_dir: Optional[str] = None,
+    index_dir: Optional[str] = None,
+    speculative: bool = False,
+) -> str:
+    """
+    Namespace of answers produced by one tool and graph setup (answers from another setup
+    never match). It covers every option that changes the graph's output: the search
+    setup (backend, KB file or directory, prebuilt index), the glossary, and speculative
+    mode, whose plans and iteration counts differ. Options that only change how the same
+    answer is computed (shards, concurrency, compact state, limits) are left out.
+    """
+    namespace = f"{search_backend}|{kb_path or ''}"
+    if kb_dir:
+        namespace += f"|kbdir={kb_dir}"
+    if index_dir:
+        namespace += f"|indexdir={index_dir}"
+    if speculative:
+        namespace += "|speculative"
+    return namespace + f"|glossary={glossary_path}" if glossary_path else namespace
+
+
+_CITATION = re.compile(r"(\[source: \w+#)([^\]]+)(\])")
+
+
+def reissue_call_ids(out: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A replayed answer with fresh call ids, as if its tool calls had just run: the ids in
+    the tool calls and results, logs, speculation, citations and the answer text are
+    renumbered consistently, so answers to different questions never cite the same call.
+    The cached models are copied, not modified.
+    """
+    ids: Dict[str, str] = {}
+
+    def renumber(call_id: str) -> str:
+        if call_id not in ids:
+            ids[call_id] = new_call_id()
+        return ids[call_id]
+
+    out = dict(out)
+    out["tool_calls"] = [c.model_copy(update={"id": renumber(c.id)}) for c in out["tool_calls"]]
+    out["tool_results"] = [r.model_copy(update={"id": renumber(r.id)}) for r in out["tool_results"]]
+    out["tool_log"] = [renumber(i) for i in out["tool_log"]]
+    out["step_log"] = [
+        s.model_copy(update={"call_ids": [renumber(i) for i in s.call_ids]}) for s in out["step_log"]
+    ]
+    if out["speculation"] is not None:
+        spec = out["speculation"]
+        out["speculation"] = spec.model_copy(update={"call_id": renumber(spec.call_id)})
+    final = out["final"]
+    if final is not None:
+        out["final"] = final.model_copy(
+            update={
+                "answer": _CITATION.sub(lambda m: m.group(1) + ids.get(m.group(2), m.group(2)) + m.group(3), final.answer),
+                "citations": [c.model_copy(update={"call_id": renumber(c.call_id)}) for c in final.citations],
+            }
+        )
+    return out
+
+
+def _degraded(out: Dict[str, Any]) -> bool:
+    # Answers cut short by timeouts or the latency budget are not worth keeping.
+    timed_out = any(r.status != "ok" for r in out["tool_results"])
+    return timed_out or (out["needs_more_evidence"] and out["iteration"] < out["max_iterations"])
+
+
+def invoke_cached(
+    graph,
+    state: AgentState,
+    answer_cache: Optional[AnswerCache],
+    on_event: Optional[Callable[[Event], None]] = None,
+) -> Dict[str, Any]:
+    """
+    graph.invoke with the answer cache in front; fresh, complete results are stored for next time.
+    With `on_event`, the graph is streamed and progress events are passed on as they happen
+    (a cache hit produces none).
+    """
+    if answer_cache is not None:
+        cached = answer_cache.get(state.user_question, state.max_iterations)
+        if cached is not None:
+            cached["question_id"] = state.question_id
+            return reissue_call_ids(cached)
+
+    out = graph.invoke(graph_input(state)) if on_event is None else run_streaming(graph, state, on_event)
+    if answer_cache is not None and not _degraded(out):
+        answer_cache.put(state.user_question, state.max_iterations, out)
+    return out
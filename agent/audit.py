@@ -0,0 +1,264 @@
+"""
+Streaming audit log of tool results.
+
+act_node hands each step's ToolResults to the graph's audit sink (build_graph(audit=...))
+and keeps what the sink returns in the state. Any object with a
+`record(results, question_id) -> results` method can be a sink. AuditLog, the one
+provided, appends every result as a JSON line (ToolResult.log_entry plus question_id) and
+returns results whose large outputs are left in the file:
+
+- Typed outputs (tools.results) are already small references, so they stay in the state.
+- Plain-text outputs longer than `inline_chars` are replaced by an AuditedOutput. It holds
+  a preview and the position of the full entry, and reads the text back when rendered.
+
+So the state, batch records and the tool log print the same text as before, while memory
+no longer grows with output size. The log is written as numbered segments,
+<prefix>.00001.jsonl, <prefix>.00002.jsonl, ... A new segment starts once the current one
+passes `max_bytes`, and on every new AuditLog, so restarts never append to an old segment.
+Finished segments can be gzip-compressed in the background (<prefix>.NNNNN.jsonl.gz), and
+only the newest `keep` segments are retained. An output whose segment has been deleted
+renders as unavailable.
+
+    python -m agent.audit show audit/tools call_0003      # one entry, across segments
+    python -m agent.audit tail audit/tools -n 20          # latest entries (summaries)
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import re
+import shutil
+import sys
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict
+
+from tools.results import NO_RESULTS_PREFIX
+
+if TYPE_CHECKING:
+    from agent.state import ToolResult
+
+# Plain-text outputs up to this many characters stay in the state.
+DEFAULT_INLINE_CHARS = 240
+PREVIEW_CHARS = 160
+
+
+def segment_path(prefix: str, segment: int, compressed: bool = False) -> str:
+    return f"{prefix}.{segment:05d}.jsonl" + (".gz" if compressed else "")
+
+
+def list_segments(prefix: str) -> List[Tuple[int, str]]:
+    """
+    (segment number, path) of every segment of `prefix` on disk, oldest first. A segment
+    that exists both plain and compressed (compression in progress) is listed once, plain.
+    """
+    directory, name = os.path.split(os.path.abspath(prefix))
+    pattern = re.compile(re.escape(name) + r"\.(\d{5,})\.jsonl(\.gz)?")
+    found: Dict[int, str] = {}
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    for entry in sorted(names):
+        m = pattern.fullmatch(entry)
+        if m is not None:
+            segment = int(m.group(1))
+            if m.group(2) is None or segment not in found:
+                found[segment] = os.path.join(directory, entry)
+    return sorted(found.items())
+
+
+def _open_segment(prefix: str, segment: int):
+    path = segment_path(prefix, segment)
+    try:
+        return open(path, "rb")
+    except FileNotFoundError:
+        return gzip.open(path + ".gz", "rb")
+
+
+@lru_cache(maxsize=32)
+def read_entry(prefix: str, segment: int, offset: int) -> Optional[Dict[str, Any]]:
+    """
+    The audit entry at byte `offset` of a segment (offsets count uncompressed bytes, so
+    they stay valid after compression); None once the segment is gone.
+    """
+    try:
+        with _open_segment(prefix, segment) as f:
+            f.seek(offset)
+            line = f.readline()
+    except FileNotFoundError:
+        return None
+    return json.loads(line) if line else None
+
+
+class AuditedOutput(BaseModel):
+    """
+    Stand-in for a plain-text tool output kept in the audit log instead of the state.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    kind: Literal["audited"] = "audited"
+    prefix: str  # absolute AuditLog prefix
+    segment: int
+    offset: int
+    chars: int  # length of the full text
+    preview: str
+    empty: bool = False  # the text reports a search without results (tools.results.no_results)
+
+    def render(self) -> str:
+        entry = read_entry(self.prefix, self.segment, self.offset)
+        if entry is None:
+            return f"{self.preview}… (full output unavailable: its audit log segment was deleted)"
+        return entry["output"]
+
+
+class AuditLog:
+    """
+    Audit sink writing size-rotated JSONL segments under `prefix` (see module docstring).
+    Thread-safe: one log can serve all requests of a process. Call close() when done.
+    """
+
+    def __init__(
+        self,
+        prefix: str,
+        max_bytes: int = 64 * 1024 * 1024,
+        keep: int = 8,
+        compress: bool = False,
+        inline_chars: int = DEFAULT_INLINE_CHARS,
+    ) -> None:
+        self.prefix = os.path.abspath(prefix)
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.compress = compress
+        self.inline_chars = inline_chars
+        self.entries = 0
+        self.offloaded = 0
+        self._lock = threading.Lock()
+        self._compressing: List[threading.Thread] = []
+        os.makedirs(os.path.dirname(self.prefix), exist_ok=True)
+        existing = list_segments(self.prefix)
+        self._open(existing[-1][0] + 1 if existing else 1)
+        self._prune()
+
+    def _open(self, segment: int) -> None:
+        self.segment = segment
+        self._f = open(segment_path(self.prefix, segment), "ab")
+        self._offset = self._f.tell()
+
+    def _rotate(self) -> None:
+        self._f.close()
+        finished = self.segment
+        self._open(finished + 1)
+        if self.compress:
+            t = threading.Thread(target=self._finish_segment, args=(finished,), name="audit-gzip")
+            self._compressing = [c for c in self._compressing if c.is_alive()] + [t]
+            t.start()
+        else:
+            self._prune()
+
+    def _finish_segment(self, segment: int) -> None:
+        path = segment_path(self.prefix, segment)
+        tmp = f"{path}.gz.tmp{os.getpid()}"
+        with open(path, "rb") as src, gzip.open(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.replace(tmp, path + ".gz")
+        os.remove(path)
+        self._prune()
+
+    def _prune(self) -> None:
+        if self.keep <= 0:
+            return
+        for segment, path in list_segments(self.prefix)[: -self.keep]:
+            for p in (segment_path(self.prefix, segment), segment_path(self.prefix, segment, compressed=True)):
+                try:
+                    os.remove(p)
+                except FileNotFoundError:
+                    pass
+
+    def record(self, results: List["ToolResult"], question_id: Optional[str] = None) -> List["ToolResult"]:
+        """
+        Appends one entry per result and returns the results to keep in the state.
+        """
+        kept = []
+        with self._lock:
+            for r in results:
+                entry = r.log_entry()
+                entry["question_id"] = question_id
+                line = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+                if self._offset and self._offset + len(line) > self.max_bytes:
+                    self._rotate()
+                offset = self._offset
+                self._f.write(line)
+                self._offset += len(line)
+                self.entries += 1
+                if isinstance(r.output, str) and len(r.output) > self.inline_chars:
+                    self.offloaded += 1
+                    output = AuditedOutput(
+                        prefix=self.prefix,
+                        segment=self.segment,
+                        offset=offset,
+                        chars=len(r.output),
+                        preview=r.output[:PREVIEW_CHARS],
+                        empty=NO_RESULTS_PREFIX in r.output,
+                    )
+                    r = r.model_copy(update={"output": output})
+                kept.append(r)
+            # Flushed per step, so entries can be read back (and tailed) right away.
+            self._f.flush()
+        return kept
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": self.entries, "offloaded": self.offloaded, "segment": self.segment, "prefix": self.prefix}
+
+    def close(self) -> None:
+        with self._lock:
+            self._f.close()
+        for t in self._compressing:
+            t.join()
+
+
+def iter_entries(prefix: str) -> Iterator[Dict[str, Any]]:
+    """
+    All entries still on disk, oldest first.
+    """
+    for segment, _ in list_segments(prefix):
+        try:
+            with _open_segment(prefix, segment) as f:
+                for line in f:
+                    yield json.loads(line)
+        except FileNotFoundError:
+            continue  # pruned while reading
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m agent.audit", description="Read tool audit logs.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("show", help="Print the entries of one call id as JSON.")
+    p.add_argument("prefix")
+    p.add_argument("call_id")
+    p = sub.add_parser("tail", help="Summarize the latest entries.")
+    p.add_argument("prefix")
+    p.add_argument("-n", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "show":
+        found = [e for e in iter_entries(args.prefix) if e["id"] == args.call_id]
+        if not found:
+            sys.exit(f"{args.call_id}: not in {args.prefix}")
+        for entry in found:
+            print(json.dumps(entry, ensure_ascii=False, indent=2))
+        return
+
+    for e in deque(iter_entries(args.prefix), maxlen=args.n):
+        print(f"{e['id']:16} {e['name']:18} {e.get('status', 'ok'):8} {e.get('duration_ms', 0):>6} ms  "
+              f"{len(e['output']):>8} chars  q={e.get('question_id')}")
+
+
+if __name__ == "__main__":
+    main()
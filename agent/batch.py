@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from agent import graph as graph_module
+from agent.answer_cache import AnswerCache, answer_cache_namespace, answer_cache_version, invoke_cached
+from agent.profile import Profiler, profiled
+from agent.state import AgentState, tool_log_entries
+from agent.streaming import Event
+from agent.trace import Tracer, now_ms, percentile, span
+
+
+@dataclass(frozen=True)
+class BatchConfig:
+    """
+    Everything a worker process needs to build its own graph.
+    """
+    max_iterations: int = 2
+    search_backend: str = "bm25"
+    max_concurrency: int = graph_module.DEFAULT_MAX_CONCURRENCY
+    cache_size: int = 256
+    cache_ttl: float = 600.0
+    kb_path: Optional[str] = None
+    # KB directory updated in place (tools/ingest.py); workers follow its versions live.
+    kb_dir: Optional[str] = None
+    # Directory for the prebuilt bm25 index of the in-module KB (build_default_registry(index_dir=...)).
+    index_dir: Optional[str] = None
+    # >1 serves bm25 search from that many worker-process shards (tools/shard.py).
+    search_shards: int = 1
+    # JSONL glossary for lookup_definition (tools/glossary.py); None uses DEFINITIONS.
+    glossary_path: Optional[str] = None
+    # Run the follow-up search together with the first one (build_graph(speculative=True)).
+    speculative: bool = False
+    # Keep graph state in LangGraph channels instead of a pydantic AgentState (build_graph(compact_state=True)).
+    compact_state: bool = False
+    # Prefix for per-worker JSONL span files (<prefix>.w<N>.jsonl); None disables tracing.
+    trace_prefix: Optional[str] = None
+    # Directory for per-worker CPU/allocation profiles (agent/profile.py); None disables profiling.
+    profile_dir: Optional[str] = None
+    # Prefix of the tool audit log (agent/audit.py); workers write <prefix>.w<N>.NNNNN.jsonl.
+    # None keeps full tool outputs in the state instead.
+    audit_prefix: Optional[str] = None
+    audit_max_mb: float = 64.0
+    audit_keep: int = 8
+    audit_compress: bool = False
+    # SQLite answer cache shared by all workers (and later runs); None disables it.
+    answer_cache_path: Optional[str] = None
+    answer_cache_mb: float = 64.0
+    # Per-call limit applied to every tool (ToolSpec.timeout_s) and per-question latency budget.
+    tool_timeout_s: Optional[float] = None
+    time_budget_ms: Optional[int] = None
+
+    def registry(self):
+        """
+        Tool registry for this configuration (with a tool cache unless cache_size is 0).
+        """
+        from tools import build_default_registry
+        from tools.cache import ToolCache
+
+        cache = ToolCache(max_entries=self.cache_size, ttl_s=self.cache_ttl) if self.cache_size > 0 else None
+        return build_default_registry(
+            search_backend=self.search_backend,
+            cache=cache,
+            kb_path=self.kb_path,
+            tool_timeout_s=self.tool_timeout_s,
+            search_shards=self.search_shards,
+            glossary_path=self.glossary_path,
+            kb_dir=self.kb_dir,
+            index_dir=self.index_dir,
+        )
+
+    def audit_log(self, tag: Optional[str] = None):
+        """
+        The audit log for this configuration (under <audit_prefix>.<tag> when tagged), or None.
+        """
+        if not self.audit_prefix:
+            return None
+        from agent.audit import AuditLog
+
+        return AuditLog(
+            f"{self.audit_prefix}.{tag}" if tag else self.audit_prefix,
+            max_bytes=int(self.audit_max_mb * 1024 * 1024),
+            keep=self.audit_keep,
+            compress=self.audit_compress,
+        )
+
+    def build(self, audit=None, registry=None) -> Tuple[Any, Optional[AnswerCache]]:
+        """
+        Returns (compiled graph, answer cache or None); `audit` is the graph's audit sink.
+        `registry` defaults to a new self.registry().
+        """
+        registry = registry or self.registry()
+        graph = graph_module.build_graph(
+            registry,
+            max_concurrency=self.max_concurrency,
+            speculative=self.speculative,
+            audit=audit,
+            compact_state=self.compact_state,
+        )
+
+        answer_cache = None
+        if self.answer_cache_path:
+            answer_cache = AnswerCache(
+                self.answer_cache_path,
+                max_bytes=int(self.answer_cache_mb * 1024 * 1024),
+                namespace=answer_cache_namespace(
+                    self.search_backend,
+                    self.kb_path,
+                    self.glossary_path,
+                    self.kb_dir,
+                    index_dir=self.index_dir,
+                    speculative=self.speculative,
+                ),
+                version_fn=answer_cache_version(registry, self.glossary_path),
+            )
+        return graph, answer_cache
+
+
+def read_questions(f: IO[str]) -> Iterator[str]:
+    """
+    One question per line; lines that are JSON objects use their "question" field.
+    Blank lines are skipped.
+    """
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            line = str(json.loads(line).get("question", "")).strip()
+            if not line:
+                continue
+        yield line
+
+
+def count_speculation(counts: Counter, speculation: Optional[dict]) -> None:
+    """
+    Adds one record's speculative follow-up search to the used/dropped/wasted_ms counts.
+    """
+    if speculation is None:
+        return
+    if speculation["used"]:
+        counts["used"] += 1
+    else:
+        counts["dropped"] += 1
+        counts["wasted_ms"] += speculation["duration_ms"]
+
+
+# --- worker process -------------------------------------------------------
+
+_WORKER_GRAPH = None
+_WORKER_ANSWER_CACHE: Optional[AnswerCache] = None
+_WORKER_CONFIG: Optional[BatchConfig] = None
+_WORKER_TRACER: Optional[Tracer] = None
+_WORKER_TRACE_PATH: Optional[str] = None
+_WORKER_PROFILER: Optional[Profiler] = None
+_WORKER_PROFILE_TAG: Optional[str] = None
+
+
+def _init_worker(config: BatchConfig, worker_counter) -> None:
+    global _WORKER_GRAPH, _WORKER_ANSWER_CACHE, _WORKER_CONFIG, _WORKER_TRACER, _WORKER_TRACE_PATH
+    global _WORKER_PROFILER, _WORKER_PROFILE_TAG
+    with worker_counter.get_lock():
+        worker_counter.value += 1
+        worker_id = worker_counter.value
+    graph_module.set_call_id_prefix(f"call_w{worker_id}")
+    _WORKER_CONFIG = config
+    _WORKER_GRAPH, _WORKER_ANSWER_CACHE = config.build(audit=config.audit_log(f"w{worker_id}"))
+    if config.trace_prefix:
+        _WORKER_TRACER = Tracer()
+        _WORKER_TRACE_PATH = f"{config.trace_prefix}.w{worker_id}.jsonl"
+    if config.profile_dir:
+        _WORKER_PROFILER = Profiler()
+        _WORKER_PROFILE_TAG = f"w{worker_id}"
+
+
+def answer_question(
+    graph,
+    question: str,
+    max_iterations: int,
+    question_id: Optional[str] = None,
+    answer_cache: Optional[AnswerCache] = None,
+    time_budget_ms: Optional[int] = None,
+    on_event: Optional[Callable[[Event], None]] = None,
+) -> dict:
+    """
+    Runs one question through the graph and returns a JSON-serializable record.
+    time_budget_ms sets the question's deadline (AgentState.deadline_ms) relative to now;
+    on_event receives streaming progress events (see agent.streaming).
+    """
+    start = time.perf_counter()
+    state = AgentState(
+        user_question=question,
+        max_iterations=max_iterations,
+        question_id=question_id,
+        deadline_ms=now_ms() + time_budget_ms if time_budget_ms is not None else None,
+    )
+    with span("question", "run", question_id=question_id), profiled("question"):
+        out = invoke_cached(graph, state, answer_cache, on_event)
+    latency_ms = (time.perf_counter() - start) * 1000.0
+    # A cached answer replays the state of an earlier run; its speculation cost nothing now.
+    speculation = out.get("speculation") if not out.get("cached") else None
+
+    return {
+        "question_id": question_id,
+        "question": question,
+        "cached": bool(out.get("cached")),
+        "speculation": speculation.model_dump() if speculation is not None else None,
+        "plan": out["plan"],
+        "final": out["final"].model_dump(),
+        "tool_log": [tr.log_entry() for tr in tool_log_entries(out)],
+        "step_log": [st.model_dump() for st in out["step_log"]],
+        "latency_ms": round(latency_ms, 3),
+    }
+
+
+def _run_one(item: Tuple[int, str]) -> dict:
+    index, question = item
+    config = _WORKER_CONFIG
+
+    def answer() -> dict:
+        return answer_question(
+            _WORKER_GRAPH,
+            question,
+            config.max_iterations,
+            question_id=f"q{index}",
+            answer_cache=_WORKER_ANSWER_CACHE,
+            time_budget_ms=config.time_budget_ms,
+        )
+
+    try:
+        with ExitStack() as stack:
+            if _WORKER_TRACER is not None:
+                stack.enter_context(_WORKER_TRACER.activate())
+            if _WORKER_PROFILER is not None:
+                stack.enter_context(_WORKER_PROFILER.activate())
+            record = answer()
+        if _WORKER_TRACER is not None:
+            _WORKER_TRACER.write_jsonl(_WORKER_TRACE_PATH)
+            _WORKER_TRACER.clear()
+        if _WORKER_PROFILER is not None:
+            # Rewritten after every question: pool workers get no shutdown hook.
+            _WORKER_PROFILER.dump(config.profile_dir, _WORKER_PROFILE_TAG)
+    except Exception as e:  # one bad question must not kill the batch
+        record = {"question": question, "error": f"{type(e).__name__}: {e}"}
+    record["index"] = index
+    record["worker_pid"] = os.getpid()
+    return record
+
+
+# --- driver ---------------------------------------------------------------
+
+def run_batch(
+    questions: Iterable[str],
+    out: IO[str],
+    config: BatchConfig,
+    workers: Optional[int] = None,
+    max_in_flight: Optional[int] = None,
+) -> Dict[str, float]:
+    """
+    Streams questions through a process pool and writes one JSONL record per question
+    as soon as it finishes (completion order; each record carries its input "index").
+    At most `max_in_flight` questions are queued at once, so input is never fully buffered.
+    Returns summary metrics (throughput and latency percentiles).
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 4
+
+    latencies: List[float] = []
+    errors = 0
+    cached = 0
+    speculation: Counter = Counter()
+    start = time.perf_counter()
+
+    def _drain(done: Iterable[Future]) -> None:
+        nonlocal errors, cached
+        for fut in done:
+            record = fut.result()
+            if "error" in record:
+                errors += 1
+            else:
+                latencies.append(record["latency_ms"])
+                cached += record["cached"]
+                count_speculation(speculation, record["speculation"])
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+
+    if mp.get_start_method() == "fork":
+        graph_module.preload()  # imported once here instead of once per worker
+    worker_counter = mp.Value("i", 0)
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(config, worker_counter),
+    ) as pool:
+        pending: set = set()
+        for item in enumerate(questions):
+            if len(pending) >= max_in_flight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                _drain(done)
+            pending.add(pool.submit(_run_one, item))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            _drain(done)
+
+    wall_s = time.perf_counter() - start
+    latencies.sort()
+    total = len(latencies) + errors
+    return {
+        "questions": total,
+        "errors": errors,
+        "cached_answers": cached,
+        "speculative_used": speculation["used"],
+        "speculative_dropped": speculation["dropped"],
+        "speculative_wasted_ms": speculation["wasted_ms"],
+        "workers": workers,
+        "wall_s": round(wall_s, 3),
+        "throughput_qps": round(total / wall_s, 2) if wall_s > 0 else 0.0,
+        "latency_p50_ms": round(percentile(latencies, 50), 3),
+        "latency_p90_ms": round(percentile(latencies, 90), 3),
+        "latency_p99_ms": round(percentile(latencies, 99), 3),
+        "latency_max_ms": round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+def print_summary(summary: Dict[str, float], f: IO[str] = sys.stderr) -> None:
+    print("\n=== BATCH SUMMARY ===", file=f)
+    for key, value in summary.items():
+        print(f"{key}: {value}", file=f)
+    print("=====================", file=f)
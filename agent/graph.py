@@ -1,38 +1,122 @@
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import functools
 import itertools
-from typing import Literal
-
-from langgraph.graph import StateGraph, END
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage  # used for conceptual alignment
-
-from agent.state import AgentState, ToolCall, ToolResult, FinalAnswer
-from agent.trace import timed_call
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from typing import TYPE_CHECKING, Callable, Dict, List, Literal, Optional
+
+from agent.state import AgentState, CompactState, FastState, ToolCall, ToolResult, FinalAnswer, Speculation, StepTiming
+from agent.profile import profiled
+from agent.trace import atimed_call, now_ms, span, timed_call
 from agent import policies
+from agent.streaming import emit
 from agent.synth import synthesize_answer
 
 from tools import build_default_registry
+from tools.registry import ToolRegistry
+from tools.results import no_results
+
+if TYPE_CHECKING:
+    from langchain_core.runnables import RunnableLambda
+
+# LangGraph and langchain_core are imported when a graph is compiled (build_graph), not
+# with this module: importing them costs more than the rest of the package together,
+# and the node functions and policies don't need them.
+
+_REGISTRY: Optional[ToolRegistry] = None
+
+# Upper bound on tool calls executed at once within a single act step.
+DEFAULT_MAX_CONCURRENCY = 4
+
+# Time kept back for synthesis when deciding whether a follow-up pass still fits the deadline.
+SYNTHESIS_RESERVE_MS = 5
+
+def default_registry() -> ToolRegistry:
+    """
+    Registry used by nodes and build_graph when none is passed; built on first use.
+    """
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = build_default_registry()
+    return _REGISTRY
+
+
+def __getattr__(name: str):
+    # REGISTRY used to be built at import time; it stays importable, built on first access.
+    if name == "REGISTRY":
+        return default_registry()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def preload() -> None:
+    """
+    Imports the graph runtime now instead of at the first build_graph. Worth calling
+    before forking workers, so they share the imported modules instead of each
+    importing them again.
+    """
+    import langgraph.graph  # noqa: F401
+    import langchain_core.runnables  # noqa: F401
 
-REGISTRY = build_default_registry()
 
 _counter = itertools.count(1)
-def new_call_id(prefix: str = "call") -> str:
-    return f"{prefix}_{next(_counter):04d}"
+_counter_lock = threading.Lock()
+_call_prefix = "call"
 
 
-def planner_node(state: AgentState) -> AgentState:
+def set_call_id_prefix(prefix: str) -> None:
+    """
+    Namespaces call ids for this process (e.g. "call_w3" in batch worker 3) so ids stay
+    unique when results from several processes are merged.
+    """
+    global _call_prefix
+    _call_prefix = prefix
+
+
+def new_call_id(prefix: Optional[str] = None) -> str:
+    """
+    Process-unique call id; safe to call from concurrent requests (see agent.server).
+    """
+    with _counter_lock:
+        n = next(_counter)
+    return f"{prefix or _call_prefix}_{n:04d}"
+
+
+def follow_up_query(question: str) -> str:
+    """
+    Query of the targeted follow-up search (more_evidence_node, or speculative mode).
+    """
+    return question + " overview examples tradeoffs"
+
+
+def planner_node(state: AgentState, *, speculative: bool = False, glossary=None) -> AgentState:
     """
     Plans and proposes tool calls. Designed to mirror what an LLM planner would do,
     but implemented deterministically for offline operation.
+    With `speculative`, the follow-up search runs alongside the primary search when a
+    follow-up pass would still be allowed; reflect_node then keeps or drops its result.
+    `glossary` (ToolRegistry.glossary) returns the loaded glossary file. Its terms found in
+    the question are looked up too (policies.extract_terms), and naming one the vocabulary
+    does not know is enough to look it up, since the glossary is the user's own definitions.
     """
     state.iteration += 1
 
     q = state.user_question
-    terms = policies.extract_terms(q)
-
-    do_search = policies.should_search(q)
-    do_define = policies.should_define(q)
-    do_summary = policies.wants_summary(q)
+    features = policies.analyze(q)
+    terms = features.terms
+
+    do_search = features.search
+    do_define = features.define
+    if glossary is not None:
+        terms = policies.extract_terms(q, glossary())
+        do_define = do_define or len(terms) > len(features.terms)
+    do_summary = features.summary
+    # Only while a follow-up pass would still be allowed (see route_after_reflect).
+    do_speculate = speculative and do_search and state.speculation is None and state.iteration < state.max_iterations
 
     plan = [
         "Parse the question and identify key concepts.",
@@ -48,6 +132,11 @@ def planner_node(state: AgentState) -> AgentState:
         plan.insert(3, "Search the offline knowledge base for evidence.")
     if do_summary:
         plan.insert(4, "Summarize long evidence snippets to keep the answer readable.")
+    if do_speculate:
+        plan.insert(
+            plan.index("Search the offline knowledge base for evidence.") + 1,
+            "Run the targeted follow-up search alongside it, in case the first search finds nothing.",
+        )
 
     state.plan = plan
 
@@ -58,11 +147,16 @@ def planner_node(state: AgentState) -> AgentState:
 
     if do_search:
         calls.append(ToolCall(id=new_call_id(), name="search_web", args={"query": q, "k": 3}))
+        if do_speculate:
+            follow_up = ToolCall(id=new_call_id(), name="search_web", args={"query": follow_up_query(q), "k": 3})
+            calls.append(follow_up)
+            state.speculation = Speculation(call_id=follow_up.id)
 
     if do_summary:
         calls.append(ToolCall(id=new_call_id(), name="summarize", args={"text": f"User asked: {q}", "max_sentences": 2}))
 
     state.tool_calls = calls
+    emit({"type": "plan", "iteration": state.iteration, "plan": list(plan), "tool_calls": list(calls)})
     return state
 
 
@@ -70,55 +164,326 @@ def route_after_planner(state: AgentState) -> Literal["act", "final"]:
     return "act" if state.tool_calls else "final"
 
 
-def act_node(state: AgentState) -> AgentState:
-    """
-    Executes tool calls via registry; appends ToolResults to state and tool_log.
-    """
-    results: list[ToolResult] = []
+def _run_call(registry: ToolRegistry, call: ToolCall) -> ToolResult:
+    with span(f"tool:{call.name}", "tool", call_id=call.id), profiled(f"tool:{call.name}"):
+        timed = timed_call(registry.invoke, call.name, call.args)
+    output, cache_hit = timed.output
+
+    return ToolResult(
+        id=call.id,
+        name=call.name,
+        args=call.args,
+        output=output,
+        started_at_ms=timed.started_at_ms,
+        finished_at_ms=timed.finished_at_ms,
+        cache_hit=cache_hit,
+    )
 
-    for call in state.tool_calls:
-        spec = REGISTRY.get(call.name)
-        timed = timed_call(spec.fn, **call.args)
 
-        tr = ToolResult(
+async def _arun_call(registry: ToolRegistry, call: ToolCall) -> ToolResult:
+    with span(f"tool:{call.name}", "tool", call_id=call.id):
+        timed = await atimed_call(registry.ainvoke, call.name, call.args)
+    output, cache_hit = timed.output
+
+    return ToolResult(
+        id=call.id,
+        name=call.name,
+        args=call.args,
+        output=output,
+        started_at_ms=timed.started_at_ms,
+        finished_at_ms=timed.finished_at_ms,
+        cache_hit=cache_hit,
+    )
+
+
+def _batch_jobs(registry: ToolRegistry, calls: List[ToolCall]) -> List[List[int]]:
+    """
+    Positions of `calls` grouped into jobs: all calls of a tool with a batch_fn (e.g. the
+    primary and follow-up searches of speculative mode) form one job, other calls one each.
+    """
+    jobs: List[List[int]] = []
+    batched: Dict[str, List[int]] = {}
+    for i, call in enumerate(calls):
+        if registry.get(call.name).batch_fn is None:
+            jobs.append([i])
+        elif call.name in batched:
+            batched[call.name].append(i)
+        else:
+            batched[call.name] = [i]
+            jobs.append(batched[call.name])
+    return jobs
+
+
+def _run_job(registry: ToolRegistry, calls: List[ToolCall]) -> List[ToolResult]:
+    """
+    Runs one job of _batch_jobs: a single call, or calls of one tool through registry.invoke_batch.
+    """
+    if len(calls) == 1:
+        return [_run_call(registry, calls[0])]
+    name = calls[0].name
+    with span(f"tool:{name}", "tool", call_id=",".join(c.id for c in calls), batch=len(calls)), profiled(f"tool:{name}"):
+        timed = timed_call(registry.invoke_batch, name, [c.args for c in calls])
+    return [
+        ToolResult(
             id=call.id,
             name=call.name,
             args=call.args,
-            output=timed.output,
+            output=output,
             started_at_ms=timed.started_at_ms,
             finished_at_ms=timed.finished_at_ms,
+            cache_hit=cache_hit,
         )
-        results.append(tr)
+        for call, (output, cache_hit) in zip(calls, timed.output)
+    ]
+
+
+def _reported(result: ToolResult) -> ToolResult:
+    # Streams each result as soon as its call completes (see agent.streaming).
+    emit({"type": "tool_result", "result": result})
+    return result
+
+
+def _timed_out(call: ToolCall, started_at_ms: Optional[int], limit_ms: Optional[int]) -> ToolResult:
+    finished = now_ms()
+    if started_at_ms is None:
+        output = "Cancelled: the question's latency budget ran out before this call started."
+    else:
+        output = f"Timed out after {finished - started_at_ms} ms" + (f" (limit {limit_ms} ms)." if limit_ms is not None else ".")
+    return ToolResult(
+        id=call.id,
+        name=call.name,
+        args=call.args,
+        output=output,
+        started_at_ms=started_at_ms or finished,
+        finished_at_ms=finished,
+        status="timeout",
+    )
+
 
+def _has_time_limits(registry: ToolRegistry, state: AgentState) -> bool:
+    return state.deadline_ms is not None or any(registry.get(c.name).timeout_s is not None for c in state.tool_calls)
+
+
+def _call_timeout_s(registry: ToolRegistry, call: ToolCall, state: AgentState) -> Optional[float]:
+    """
+    Seconds a call starting now may run: its ToolSpec.timeout_s, capped by what is left
+    of the question's deadline. None = unbounded.
+    """
+    limits = []
+    spec_timeout = registry.get(call.name).timeout_s
+    if spec_timeout is not None:
+        limits.append(spec_timeout)
+    if state.deadline_ms is not None:
+        limits.append(max(0.0, (state.deadline_ms - now_ms()) / 1000.0))
+    return min(limits) if limits else None
+
+
+def _run_calls_with_limits(
+    registry: ToolRegistry, calls: List[ToolCall], state: AgentState, max_concurrency: int
+) -> List[ToolResult]:
+    """
+    act_node path when a tool timeout or a deadline applies. Each call may run until
+    min(its start + ToolSpec.timeout_s, deadline); calls still queued at the deadline are
+    cancelled before they start. A running sync tool can't be interrupted, so a timed-out
+    call is abandoned: its thread finishes in the background and the result is dropped.
+    """
+    deadline = state.deadline_ms / 1000.0 if state.deadline_ms is not None else math.inf
+    limits = [registry.get(call.name).timeout_s for call in calls]
+    started: Dict[int, float] = {}
+
+    def run(i: int, ctx: contextvars.Context) -> ToolResult:
+        started[i] = time.time()
+        return ctx.run(_run_call, registry, calls[i])
+
+    results: List[Optional[ToolResult]] = [None] * len(calls)
+    pool = ThreadPoolExecutor(max_workers=min(max(1, max_concurrency), len(calls)))
+    try:
+        # Each call runs in a copy of this context so tool spans nest under the act span.
+        futures: Dict[Future, int] = {pool.submit(run, i, contextvars.copy_context()): i for i in range(len(calls))}
+        pending = set(futures)
+        while pending:
+            now = time.time()
+            expiry: Dict[Future, float] = {}
+            for fut in pending:
+                i = futures[fut]
+                t0 = started.get(i)
+                own = t0 + limits[i] if t0 is not None and limits[i] is not None else math.inf
+                expiry[fut] = min(deadline, own)
+            for fut in [f for f in pending if expiry[f] <= now and not f.done()]:
+                i = futures[fut]
+                fut.cancel()
+                pending.discard(fut)
+                t0 = started.get(i)
+                limit_ms = round(limits[i] * 1000) if limits[i] is not None else None
+                results[i] = _reported(_timed_out(calls[i], int(t0 * 1000) if t0 is not None else None, limit_ms))
+            if not pending:
+                break
+            timeout = min(expiry[f] for f in pending) - now
+            if any(futures[f] not in started for f in pending):
+                # A queued call's own timeout starts when a worker picks it up; poll for that.
+                timeout = min(timeout, 0.005)
+            done, pending = wait(pending, timeout=None if timeout == math.inf else max(0.0, timeout), return_when=FIRST_COMPLETED)
+            for fut in done:
+                results[futures[fut]] = _reported(fut.result())
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
+def _record_step(state: AgentState, results: List[ToolResult], step_start: int, step_end: int, audit=None) -> AgentState:
+    if audit is not None:
+        # The sink keeps full outputs; the state keeps what it hands back (see agent.audit).
+        results = audit.record(results, state.question_id)
     state.tool_results.extend(results)
-    state.tool_log.extend(results)
+    state.tool_log.extend(r.id for r in results)
+    state.step_log.append(
+        StepTiming(
+            iteration=state.iteration,
+            call_ids=[r.id for r in results],
+            started_at_ms=step_start,
+            finished_at_ms=step_end,
+        )
+    )
 
     # Clear pending calls
     state.tool_calls = []
     return state
 
 
-def reflect_node(state: AgentState) -> AgentState:
+def act_node(
+    state: AgentState,
+    *,
+    registry: Optional[ToolRegistry] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    audit=None,
+) -> AgentState:
     """
-    Decide if we need more evidence. If the question expects explanation/comparison and
-    we have no meaningful search results, do another targeted pass (bounded).
+    Executes tool calls via registry; appends ToolResults to state (and their ids to tool_log).
+    Calls proposed in the same step are independent, so they run concurrently on a
+    thread pool (at most `max_concurrency` at once); results keep call order. Calls of a
+    tool with a batch_fn run together as one batch (see _batch_jobs). Calls that
+    exceed their ToolSpec.timeout_s or the question's deadline are recorded with
+    status="timeout"; those steps run every call on its own. With an `audit` sink (agent.audit), each step's results are written to
+    it and the state keeps the results it returns.
     """
-    q = state.user_question
-
-    search_results = [r for r in state.tool_results if r.name == "search_web"]
+    registry = registry or default_registry()
+    calls = state.tool_calls
+
+    step_start = now_ms()
+    if calls and _has_time_limits(registry, state):
+        results = _run_calls_with_limits(registry, calls, state, max_concurrency)
+    else:
+        jobs = _batch_jobs(registry, calls)
+        results = [None] * len(calls)
+        if max_concurrency <= 1 or len(jobs) <= 1:
+            for job in jobs:
+                for i, result in zip(job, _run_job(registry, [calls[i] for i in job])):
+                    results[i] = _reported(result)
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_concurrency, len(jobs))) as pool:
+                # Run each job in a copy of this context so tool spans nest under the act span.
+                futures = {
+                    pool.submit(contextvars.copy_context().run, _run_job, registry, [calls[i] for i in job]): job
+                    for job in jobs
+                }
+                for fut in as_completed(futures):
+                    for i, result in zip(futures[fut], fut.result()):
+                        results[i] = _reported(result)
+    return _record_step(state, results, step_start, now_ms(), audit)
+
+
+async def aact_node(
+    state: AgentState,
+    *,
+    registry: Optional[ToolRegistry] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    audit=None,
+) -> AgentState:
+    """
+    Async act_node: tool calls of the step run as tasks on the current event loop
+    (coroutine tools are awaited, sync tools run in a thread), bounded by a semaphore.
+    Calls past their timeout or the deadline are cancelled and recorded with status="timeout".
+    """
+    registry = registry or default_registry()
+    sem = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run(call: ToolCall) -> ToolResult:
+        async with sem:
+            timeout = _call_timeout_s(registry, call, state)
+            if timeout is None:
+                return _reported(await _arun_call(registry, call))
+            start = now_ms()
+            try:
+                return _reported(await asyncio.wait_for(_arun_call(registry, call), timeout))
+            except asyncio.TimeoutError:
+                spec_timeout = registry.get(call.name).timeout_s
+                return _reported(_timed_out(call, start, round(spec_timeout * 1000) if spec_timeout is not None else None))
+
+    step_start = now_ms()
+    results = await asyncio.gather(*(run(call) for call in state.tool_calls))
+    return _record_step(state, list(results), step_start, now_ms(), audit)
+
+
+def _needs_more_evidence(question: str, tool_results: List[ToolResult]) -> bool:
+    search_results = [r for r in tool_results if r.name == "search_web" and r.status == "ok"]
     have_search = bool(search_results)
-    search_is_empty = have_search and all("No offline KB results" in r.output for r in search_results)
+    search_is_empty = have_search and all(no_results(r.output) for r in search_results)
 
     # Evidence required for “why/how/compare” style questions
-    needs_evidence = policies.should_search(q)
+    needs_evidence = policies.analyze(question).search
+
+    return bool(needs_evidence and (not have_search or search_is_empty))
+
+
+def _resolve_speculation(state: AgentState) -> None:
+    """
+    Keeps the speculative follow-up result when the primary results alone would have asked
+    for more evidence (the follow-up pass then counts as done: one iteration);
+    otherwise drops it from tool_results, tool_log and step_log so it is never cited.
+    """
+    spec = state.speculation
+    result = next(r for r in state.tool_results if r.id == spec.call_id)
+    primary = [r for r in state.tool_results if r.id != spec.call_id]
+    spec.duration_ms = result.duration_ms
+    spec.used = _needs_more_evidence(state.user_question, primary)
+    if spec.used:
+        state.iteration += 1
+    else:
+        state.tool_results = primary
+        state.tool_log = [call_id for call_id in state.tool_log if call_id != spec.call_id]
+        for step in state.step_log:
+            if spec.call_id in step.call_ids:
+                step.call_ids = [call_id for call_id in step.call_ids if call_id != spec.call_id]
+    emit({"type": "speculation", "call_id": spec.call_id, "used": spec.used, "duration_ms": spec.duration_ms})
+
+
+def reflect_node(state: AgentState) -> AgentState:
+    """
+    Decide if we need more evidence. If the question expects explanation/comparison and
+    we have no meaningful search results, do another targeted pass (bounded).
+    In speculative mode that pass already ran with the first step; see _resolve_speculation.
+    """
+    if state.speculation is not None and state.speculation.used is None:
+        _resolve_speculation(state)
 
     # Determine if we should try again
-    state.needs_more_evidence = bool(needs_evidence and (not have_search or search_is_empty))
+    state.needs_more_evidence = _needs_more_evidence(state.user_question, state.tool_results)
     return state
 
 
+def more_evidence_fits(state: AgentState) -> bool:
+    """
+    Whether a follow-up pass can still finish before the deadline. The pass is one
+    search step, estimated by the slowest step so far, plus a reserve for synthesis.
+    """
+    if state.deadline_ms is None:
+        return True
+    estimate_ms = max((st.duration_ms for st in state.step_log), default=0)
+    return now_ms() + estimate_ms + SYNTHESIS_RESERVE_MS < state.deadline_ms
+
+
 def route_after_reflect(state: AgentState) -> Literal["more_evidence", "final"]:
-    if state.needs_more_evidence and state.iteration < state.max_iterations:
+    if state.needs_more_evidence and state.iteration < state.max_iterations and more_evidence_fits(state):
         return "more_evidence"
     return "final"
 
@@ -127,8 +492,12 @@ def more_evidence_node(state: AgentState) -> AgentState:
     """
     Targeted follow-up tool call. This makes the agent look and behave like a real research loop.
     """
-    targeted_query = state.user_question + " overview examples tradeoffs"
+    # Each evidence pass counts as an iteration, so route_after_reflect stays bounded
+    # even when the follow-up search comes back empty too.
+    state.iteration += 1
+    targeted_query = follow_up_query(state.user_question)
     state.tool_calls = [ToolCall(id=new_call_id(), name="search_web", args={"query": targeted_query, "k": 3})]
+    emit({"type": "follow_up", "iteration": state.iteration, "tool_calls": list(state.tool_calls)})
     return state
 
 
@@ -137,7 +506,15 @@ def final_node(state: AgentState) -> AgentState:
     Deterministic synthesis with citations. (Designed so a real LLM synthesizer
     could be swapped in later without changing the graph.)
     """
-    answer_text, citations, confidence, limitations = synthesize_answer(state.user_question, state.tool_results)
+    # Still wanting evidence with iterations left means the router skipped the pass for lack of time.
+    budget_exhausted = state.needs_more_evidence and state.iteration < state.max_iterations
+    with span("synthesize_answer", "synth"):
+        answer_text, citations, confidence, limitations = synthesize_answer(
+            state.user_question,
+            state.tool_results,
+            budget_exhausted=budget_exhausted,
+            on_section=lambda title, text: emit({"type": "section", "title": title, "text": text}),
+        )
     state.final = FinalAnswer(
         answer=answer_text,
         citations=citations,
@@ -147,20 +524,116 @@ def final_node(state: AgentState) -> AgentState:
     return state
 
 
-def build_graph():
-    g = StateGraph(AgentState)
+def _as_coroutine(fn: Callable[[AgentState], AgentState]):
+    """
+    Async form of a CPU-only node; runs inline on the event loop (no thread hop).
+    """
+    async def node(state: AgentState) -> AgentState:
+        return fn(state)
+
+    return node
+
+
+def _traced(name: str, fn: Callable[[AgentState], AgentState]):
+    def node(state: AgentState) -> AgentState:
+        with profiled(f"node:{name}"), span(
+            f"node:{name}", "node", question_id=state.question_id, iteration=state.iteration
+        ) as sp:
+            out = fn(state)
+            if sp is not None:
+                sp.attrs["iteration"] = out.iteration
+            return out
+
+    return node
+
+
+def _atraced(name: str, afn):
+    async def node(state: AgentState) -> AgentState:
+        with span(f"node:{name}", "node", question_id=state.question_id, iteration=state.iteration) as sp:
+            out = await afn(state)
+            if sp is not None:
+                sp.attrs["iteration"] = out.iteration
+            return out
+
+    return node
+
+
+def _node(name: str, fn: Callable[[AgentState], AgentState], afn=None) -> RunnableLambda:
+    """
+    Pairs the sync and async implementations of a node (each wrapped in a trace span,
+    and the sync one in a profile section) so the compiled graph supports both
+    invoke/stream and ainvoke/astream.
+    """
+    from langchain_core.runnables import RunnableLambda
 
-    g.add_node("planner", planner_node)
-    g.add_node("act", act_node)
-    g.add_node("reflect", reflect_node)
-    g.add_node("more_evidence", more_evidence_node)
-    g.add_node("final", final_node)
+    return RunnableLambda(_traced(name, fn), afunc=_atraced(name, afn or _as_coroutine(fn)))
+
+
+def _compact_node(name: str, fn: Callable[[AgentState], AgentState]):
+    """
+    Node of a compact-state graph: runs `fn` (traced, see _traced) on a FastState built
+    from the channel values and returns only what changed. It is a plain function, so
+    LangGraph calls it directly rather than through langchain_core's RunnableLambda
+    (whose callback and config handling costs more per node than the node itself).
+    """
+    traced = _traced(name, fn)
+
+    def node(values: CompactState) -> dict:
+        return traced(FastState.from_channels(values)).updates(values)
+
+    node.__name__ = name
+    return node
+
+
+def _compact_route(fn):
+    def route(values: CompactState) -> str:
+        return fn(FastState.from_channels(values, writable=False))
+
+    return route
+
+
+def build_graph(
+    registry: Optional[ToolRegistry] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    speculative: bool = False,
+    audit=None,
+    compact_state: bool = False,
+):
+    """
+    Compiles the agent graph. Tools run against `registry` (defaults to default_registry()),
+    with up to `max_concurrency` calls of one step in flight at once (1 = sequential).
+    `speculative` issues the follow-up search together with the primary one (see planner_node).
+    `audit` receives every tool result as its step completes (agent.audit.AuditLog), so long
+    outputs live in the audit log instead of the state.
+    `compact_state` keeps the state in CompactState channels (agent.state) instead of an
+    AgentState validated and copied for every node; its nodes are sync only, so
+    ainvoke/astream run them (act included) in LangGraph's thread pool. Both kinds take
+    graph_input(state) and return the same dict of fields.
+    The graph can be driven synchronously (invoke/stream) or on an event loop (ainvoke/astream).
+    """
+    from langgraph.graph import END, StateGraph
+
+    glossary = registry.glossary if registry is not None else None
+    planner = functools.partial(planner_node, speculative=speculative, glossary=glossary)
+    act = functools.partial(act_node, registry=registry, max_concurrency=max_concurrency, audit=audit)
+    nodes = {"planner": planner, "act": act, "reflect": reflect_node, "more_evidence": more_evidence_node, "final": final_node}
+    if compact_state:
+        g = StateGraph(CompactState)
+        for name, fn in nodes.items():
+            g.add_node(name, _compact_node(name, fn))
+        after_planner, after_reflect = _compact_route(route_after_planner), _compact_route(route_after_reflect)
+    else:
+        g = StateGraph(AgentState)
+        aact = functools.partial(aact_node, registry=registry, max_concurrency=max_concurrency, audit=audit)
+        for name, fn in nodes.items():
+            g.add_node(name, _node(name, fn, aact if name == "act" else None))
+        after_planner, after_reflect = route_after_planner, route_after_reflect
 
     g.set_entry_point("planner")
 
-    g.add_conditional_edges("planner", route_after_planner, {"act": "act", "final": "final"})
+    g.add_conditional_edges("planner", after_planner, {"act": "act", "final": "final"})
     g.add_edge("act", "reflect")
-    g.add_conditional_edges("reflect", route_after_reflect, {"more_evidence": "more_evidence", "final": "final"})
+    g.add_conditional_edges("reflect", after_reflect, {"more_evidence": "more_evidence", "final": "final"})
     g.add_edge("more_evidence", "act")
     g.add_edge("final", END)
 
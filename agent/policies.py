@@ -1,64 +1,189 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import re
-from typing import List
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+
+DEFAULT_VOCAB_PATH = Path(__file__).with_name("data") / "policy_vocab.json"
+
+_WORD_CHAR = re.compile(r"[a-z0-9]")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _trie_pattern(patterns: Iterable[str]) -> str:
+    """
+    Regex source for a character trie of the patterns. Shared prefixes are factored out,
+    so the engine walks one automaton instead of trying every alternative in turn, and
+    greedy optional suffixes make it prefer the longest pattern at each position.
+    """
+    trie: dict = {}
+    for p in patterns:
+        node = trie
+        for ch in p:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def emit(node: dict) -> str:
+        alts = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+class Vocabulary:
+    """
+    Known terms and trigger phrases compiled into a single matcher.
+
+    Matches respect word boundaries ("rag" does not match "storage"); a pattern written
+    with a trailing "*" may be followed by more word characters ("explain*" matches "explained").
+    """
+
+    def __init__(self, terms: Iterable[str], triggers: Dict[str, Iterable[str]]) -> None:
+        # pattern text -> (kind, is_prefix); kind is "term" or a trigger category.
+        self._patterns: Dict[str, Tuple[str, bool]] = {}
+        self.terms: List[str] = []
+        self.triggers: Dict[str, List[str]] = {}
+
+        for raw in terms:
+            text = _normalize(raw.rstrip("*"))
+            if text and text not in self._patterns:
+                self._patterns[text] = ("term", raw.endswith("*"))
+                self.terms.append(text)
+        for category, phrases in triggers.items():
+            self.triggers[category] = []
+            for raw in phrases:
+                text = _normalize(raw.rstrip("*"))
+                if text:
+                    self._patterns.setdefault(text, (category, raw.endswith("*")))
+                    self.triggers[category].append(text)
+
+        pattern = _trie_pattern(self._patterns) or r"(?!)"
+        self._regex = re.compile(r"(?<![a-z0-9])(?=(" + pattern + "))")
+        # Names the vocabulary's content, e.g. in answer-cache keys (agent.answer_cache).
+        text = json.dumps(sorted(self._patterns.items()), ensure_ascii=False)
+        self.digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+    @classmethod
+    def from_file(cls, path: Path | str) -> "Vocabulary":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data.get("terms", []), data.get("triggers", {}))
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def scan(self, text: str) -> List[Tuple[str, str]]:
+        """
+        All (pattern, kind) matches in a normalized text, in order of appearance.
+        At each word start the automaton yields the longest candidate; shorter patterns
+        starting there are recovered by checking its prefixes.
+        """
+        found: List[Tuple[str, str]] = []
+        for m in self._regex.finditer(text):
+            start, longest = m.start(1), m.group(1)
+            for end in range(len(longest), 0, -1):
+                entry = self._patterns.get(longest[:end])
+                if entry is None:
+                    continue
+                kind, is_prefix = entry
+                after = start + end
+                if is_prefix or after >= len(text) or not _WORD_CHAR.match(text[after]):
+                    found.append((longest[:end], kind))
+        return found
+
+
+@dataclass(frozen=True)
+class QuestionFeatures:
+    """
+    Everything the planner, reflection and synthesis need to know about a question,
+    computed once per question by analyze().
+    """
+    terms: Tuple[str, ...]
+    triggers: FrozenSet[str]
+    search: bool
+    define: bool
+    summary: bool
+
+
+_VOCAB = Vocabulary.from_file(DEFAULT_VOCAB_PATH)
 
 # Terms the agent can proactively recognize for definitions.
-KNOWN_TERMS = [
-    "langgraph",
-    "langchain",
-    "rag",
-    "function calling",
-    "citations",
-    "tool calling",
-    "agent",
-]
-
-
-def extract_terms(question: str) -> List[str]:
-    q = question.lower()
-    found = []
-    for t in KNOWN_TERMS:
-        if t in q:
-            found.append(t)
+KNOWN_TERMS = list(_VOCAB.terms)
+
+
+def get_vocabulary() -> Vocabulary:
+    return _VOCAB
+
+
+def vocabulary_digest() -> str:
+    return _VOCAB.digest
+
+
+def set_vocabulary(vocab: Vocabulary) -> None:
+    """
+    Replaces the active vocabulary (e.g. Vocabulary.from_file on a larger data file).
+    """
+    global _VOCAB, KNOWN_TERMS
+    _VOCAB = vocab
+    KNOWN_TERMS = list(vocab.terms)
+    analyze.cache_clear()
+
+
+@lru_cache(maxsize=4096)
+def analyze(question: str) -> QuestionFeatures:
+    text = _normalize(question)
+    matches = _VOCAB.scan(text)
+
+    found = [p for p, kind in matches if kind == "term"]
     # Also capture quoted terms: "..."
     found += re.findall(r'"([^"]+)"', question)
     # Deduplicate preserving order
     seen = set()
-    out = []
+    terms = []
     for x in found:
         x = x.strip().lower()
         if x and x not in seen:
-            out.append(x)
+            terms.append(x)
             seen.add(x)
-    return out
+
+    kinds = {kind for _, kind in matches}
+    return QuestionFeatures(
+        terms=tuple(terms),
+        triggers=frozenset(p for p, kind in matches if kind != "term"),
+        search="search" in kinds,
+        define="define" in kinds,
+        summary="summary" in kinds,
+    )
+
+
+def extract_terms(question: str, glossary=None) -> List[str]:
+    """
+    Known vocabulary terms in the question. With a glossary (tools.glossary.Glossary),
+    its terms and aliases found in the question are appended as canonical terms.
+    """
+    terms = list(analyze(question).terms)
+    if glossary is not None:
+        terms += [t for t in glossary.find_terms(question) if t.lower() not in terms]
+    return terms
 
 
 def should_search(question: str) -> bool:
-    q = question.lower()
-    triggers = [
-        "what is",
-        "explain",
-        "why",
-        "how",
-        "compare",
-        "difference",
-        "pros",
-        "cons",
-        "evidence",
-        "sources",
-        "research",
-        "best",
-    ]
-    return any(t in q for t in triggers)
+    return analyze(question).search
 
 
 def should_define(question: str) -> bool:
-    q = question.lower()
-    triggers = ["define", "definition", "meaning of", "what does", "stand for"]
-    return any(t in q for t in triggers)
+    return analyze(question).define
 
 
 def wants_summary(question: str) -> bool:
-    q = question.lower()
-    return any(t in q for t in ["summarize", "tl;dr", "tldr", "in short"])
\ No newline at end of file
+    return analyze(question).summary
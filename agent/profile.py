@@ -0,0 +1,370 @@
+"""
+Profiling mode: CPU profiles (cProfile) and allocation sites (tracemalloc) grouped by
+graph node and by tool.
+
+Code runs inside sections: "question" around a whole run, "node:<name>" around each
+graph node and "tool:<name>" around each tool call. Attribution is exclusive: entering
+a nested section pauses the enclosing one, so "node:act" is the act node's own work and
+the tool calls it makes are counted under "tool:<name>", while "question" keeps what
+runs between nodes (LangGraph's runtime and AgentState validation and copies).
+
+Like tracing (agent.trace), sections cost nothing unless a Profiler is active in the
+current context. Profiles are per thread: tool calls run concurrently on a pool each get
+their own, but allocations are process-wide, so run with --max-concurrency 1 for exact
+per-tool allocation numbers. Async runs (ainvoke/astream) interleave nodes on one
+thread and are not profiled.
+
+Usage:
+    python main.py --profile prof/                      # report after each question
+    python main.py --batch qs.txt --profile prof/       # aggregated report after the batch
+    python -m agent.profile report prof/ --top 15       # re-read saved profiles
+    python -m pstats prof/node-act.<tag>.prof           # raw cProfile files
+"""
+from __future__ import annotations
+
+import argparse
+import cProfile
+import glob
+import json
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple
+
+# Frames that belong to the measurement itself, not to the profiled code.
+_ALLOC_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+)
+
+
+class _Section:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.profiles: List[cProfile.Profile] = []  # finished and not yet merged
+        self.merged: Optional[pstats.Stats] = None
+        self.alloc_bytes: Counter = Counter()  # "file:line" -> net bytes allocated
+        self.alloc_count: Counter = Counter()
+
+
+class _ThreadState(threading.local):
+    def __init__(self) -> None:
+        self.stack: List[Tuple[str, Optional[cProfile.Profile]]] = []
+        self.mark: Optional[tracemalloc.Snapshot] = None
+
+
+class Profiler:
+    """
+    Collects per-section CPU profiles and net allocations while active (activate()).
+    cpu / memory switch the two collectors off independently; memory starts tracemalloc
+    for the duration of activate() unless it is already running.
+    """
+
+    def __init__(self, cpu: bool = True, memory: bool = True) -> None:
+        self.cpu = cpu
+        self.memory = memory
+        self.sections: Dict[str, _Section] = {}
+        self._lock = threading.Lock()
+        self._local = _ThreadState()
+
+    @contextmanager
+    def activate(self) -> Iterator["Profiler"]:
+        started = self.memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        token = _ACTIVE_PROFILER.set(self)
+        try:
+            yield self
+        finally:
+            _ACTIVE_PROFILER.reset(token)
+            if started:
+                tracemalloc.stop()
+
+    def _section(self, name: str) -> _Section:
+        with self._lock:
+            sec = self.sections.get(name)
+            if sec is None:
+                sec = self.sections[name] = _Section()
+            return sec
+
+    def _account(self, name: Optional[str]) -> None:
+        """
+        Charges allocations since the last mark on this thread to section `name`.
+        """
+        if not self.memory or not tracemalloc.is_tracing():
+            return
+        local = self._local
+        snap = tracemalloc.take_snapshot().filter_traces(_ALLOC_FILTERS)
+        if name is not None and local.mark is not None:
+            sec = self._section(name)
+            for stat in snap.compare_to(local.mark, "lineno"):
+                if stat.size_diff or stat.count_diff:
+                    frame = stat.traceback[0]
+                    site = f"{frame.filename}:{frame.lineno}"
+                    sec.alloc_bytes[site] += stat.size_diff
+                    sec.alloc_count[site] += stat.count_diff
+        local.mark = snap
+
+    def _start_cpu(self, sec: _Section) -> Optional[cProfile.Profile]:
+        if not self.cpu:
+            return None
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # Another profiler is active (e.g. on another thread under sys.monitoring).
+            return None
+        with self._lock:
+            sec.profiles.append(prof)
+        return prof
+
+    @contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        local = self._local
+        parent = local.stack[-1] if local.stack else None
+        if parent is not None and parent[1] is not None:
+            parent[1].disable()
+        self._account(parent[0] if parent else None)
+
+        sec = self._section(name)
+        with self._lock:
+            sec.calls += 1
+        local.stack.append((name, self._start_cpu(sec)))
+        try:
+            yield
+        finally:
+            _, prof = local.stack.pop()
+            if prof is not None:
+                prof.disable()
+            self._account(name)
+            if parent is not None:
+                # The parent resumes with a fresh profile; they are merged when reported.
+                local.stack[-1] = (parent[0], self._start_cpu(self._section(parent[0])))
+
+    # -- results -----------------------------------------------------------------
+
+    def stats(self, name: str) -> Optional[pstats.Stats]:
+        """
+        Merged CPU profile of a section. Call between runs: profiles of sections still
+        running are not complete.
+        """
+        sec = self.sections[name]
+        with self._lock:
+            profiles = [p for p in sec.profiles if p.getstats()]
+            sec.profiles = []
+            if profiles:
+                # Folded into one Stats as we go, so repeated dumps stay cheap.
+                if sec.merged is None:
+                    sec.merged = pstats.Stats(*profiles)
+                else:
+                    sec.merged.add(*profiles)
+            return sec.merged
+
+    def summary(self) -> "ProfileReport":
+        report = ProfileReport()
+        for name, sec in list(self.sections.items()):
+            report.add(name, sec.calls, self.stats(name), sec.alloc_bytes, sec.alloc_count)
+        return report
+
+    def dump(self, directory: str, tag: str) -> List[str]:
+        """
+        Writes one pstats file per section (<section>.<tag>.prof) and the call counts and
+        allocation sites of all sections (sections.<tag>.json) into `directory`.
+        """
+        os.makedirs(directory, exist_ok=True)
+        written = []
+        meta = {}
+        for name, sec in list(self.sections.items()):
+            stats = self.stats(name)
+            if stats is not None:
+                path = os.path.join(directory, f"{_file_safe(name)}.{tag}.prof")
+                stats.dump_stats(path)
+                written.append(path)
+            meta[name] = {"calls": sec.calls, "alloc_bytes": dict(sec.alloc_bytes), "alloc_count": dict(sec.alloc_count)}
+        path = os.path.join(directory, f"sections.{tag}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        written.append(path)
+        return written
+
+
+def clear_profiles(directory: str) -> None:
+    """
+    Removes the files Profiler.dump writes, so a new run's report starts from zero.
+    """
+    for pattern in ("sections.*.json", "*.prof"):
+        for path in glob.glob(os.path.join(directory, pattern)):
+            os.remove(path)
+
+
+def _file_safe(name: str) -> str:
+    return name.replace(":", "-").replace(os.sep, "_")
+
+
+_ACTIVE_PROFILER: ContextVar[Optional[Profiler]] = ContextVar("active_profiler", default=None)
+
+
+def current_profiler() -> Optional[Profiler]:
+    return _ACTIVE_PROFILER.get()
+
+
+@contextmanager
+def profiled(name: str) -> Iterator[None]:
+    """
+    Runs the block as profile section `name` on the active profiler; a no-op when profiling is off.
+    """
+    profiler = _ACTIVE_PROFILER.get()
+    if profiler is None:
+        yield
+        return
+    with profiler.section(name):
+        yield
+
+
+def profile_invoke(graph, state, profiler: Optional[Profiler] = None, **kwargs: Any) -> Tuple[Any, Profiler]:
+    """
+    graph.invoke(state, **kwargs) under a profiler (a new one by default), with the run
+    as the "question" section. Returns (graph output, profiler).
+    """
+    profiler = profiler or Profiler()
+    with profiler.activate(), profiled("question"):
+        out = graph.invoke(state, **kwargs)
+    return out, profiler
+
+
+# --- reports --------------------------------------------------------------------
+
+# Order of sections in reports; tools and anything else follow alphabetically.
+SECTION_ORDER = ("question", "node:planner", "node:act", "node:reflect", "node:more_evidence", "node:final")
+
+
+class ProfileReport:
+    """
+    Per-section totals merged from one or more profilers or saved profile directories.
+    """
+
+    def __init__(self) -> None:
+        self.calls: Counter = Counter()
+        self.stats: Dict[str, pstats.Stats] = {}
+        self.alloc_bytes: Dict[str, Counter] = {}
+        self.alloc_count: Dict[str, Counter] = {}
+
+    def add(
+        self,
+        name: str,
+        calls: int,
+        stats: Optional[pstats.Stats],
+        alloc_bytes: Dict[str, int],
+        alloc_count: Dict[str, int],
+    ) -> None:
+        self.calls[name] += calls
+        if stats is not None:
+            if name in self.stats:
+                self.stats[name].add(stats)
+            else:
+                self.stats[name] = stats
+        self.alloc_bytes.setdefault(name, Counter()).update(alloc_bytes)
+        self.alloc_count.setdefault(name, Counter()).update(alloc_count)
+
+    @classmethod
+    def load(cls, directory: str) -> "ProfileReport":
+        """
+        Merges everything Profiler.dump wrote into `directory` (all tags: workers, questions).
+        """
+        report = cls()
+        for meta_path in sorted(glob.glob(os.path.join(directory, "sections.*.json"))):
+            tag = os.path.basename(meta_path)[len("sections.") : -len(".json")]
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            for name, sec in meta.items():
+                prof_path = os.path.join(directory, f"{_file_safe(name)}.{tag}.prof")
+                stats = pstats.Stats(prof_path) if os.path.exists(prof_path) else None
+                report.add(name, sec["calls"], stats, sec["alloc_bytes"], sec["alloc_count"])
+        return report
+
+    def names(self) -> List[str]:
+        known = [n for n in SECTION_ORDER if n in self.calls]
+        return known + sorted(n for n in self.calls if n not in SECTION_ORDER)
+
+    def cpu_ms(self, name: str) -> float:
+        stats = self.stats.get(name)
+        return stats.total_tt * 1000.0 if stats is not None else 0.0
+
+    def top_functions(self, name: str, top: int = 10) -> List[Tuple[str, int, float, float]]:
+        """
+        (function, calls, own ms, cumulative ms) of the section's hottest functions by own time.
+        """
+        stats = self.stats.get(name)
+        if stats is None:
+            return []
+        rows = []
+        for (filename, line, func), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+            label = f"{func}" if filename == "~" else f"{_short_path(filename)}:{line}({func})"
+            rows.append((label, ncalls, tottime * 1000.0, cumtime * 1000.0))
+        rows.sort(key=lambda r: r[2], reverse=True)
+        return rows[:top]
+
+    def top_allocations(self, name: str, top: int = 10) -> List[Tuple[str, int, int]]:
+        """
+        (file:line, net bytes, net blocks) of the sites that grew memory most in the section.
+        """
+        sizes = self.alloc_bytes.get(name, Counter())
+        counts = self.alloc_count.get(name, Counter())
+        rows = [(_short_path(site), size, counts[site]) for site, size in sizes.items() if size > 0]
+        rows.sort(key=lambda r: r[1], reverse=True)
+        return rows[:top]
+
+    def print(self, f: IO[str] = sys.stdout, top: int = 10) -> None:
+        names = self.names()
+        print("\n=== PROFILE ===", file=f)
+        print(f"{'section':28} {'calls':>7} {'cpu_ms':>10} {'net_alloc_KiB':>14}", file=f)
+        for name in names:
+            alloc_kib = sum(v for v in self.alloc_bytes.get(name, {}).values()) / 1024.0
+            print(f"{name:28} {self.calls[name]:>7} {self.cpu_ms(name):>10.2f} {alloc_kib:>14.1f}", file=f)
+        for name in names:
+            functions = self.top_functions(name, top)
+            allocations = self.top_allocations(name, top)
+            if not functions and not allocations:
+                continue
+            print(f"\n--- {name} ---", file=f)
+            if functions:
+                print(f"  {'own_ms':>9} {'cum_ms':>9} {'calls':>7}  function", file=f)
+                for label, ncalls, own_ms, cum_ms in functions:
+                    print(f"  {own_ms:>9.3f} {cum_ms:>9.3f} {ncalls:>7}  {label}", file=f)
+            if allocations:
+                print(f"  {'net_KiB':>9} {'blocks':>9}  allocation site", file=f)
+                for site, size, count in allocations:
+                    print(f"  {size / 1024.0:>9.1f} {count:>9}  {site}", file=f)
+        print("===============", file=f)
+
+
+def _short_path(path: str) -> str:
+    """
+    Paths relative to the project or site-packages, so reports stay readable.
+    """
+    for root in sorted({os.getcwd(), *sys.path}, key=len, reverse=True):
+        if root and path.startswith(root + os.sep):
+            return path[len(root) + 1 :]
+    return path
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m agent.profile")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_report = sub.add_parser("report", help="Print the merged report of a --profile directory.")
+    p_report.add_argument("directory")
+    p_report.add_argument("--top", type=int, default=10, help="Functions and allocation sites per section (default 10).")
+    args = parser.parse_args(argv)
+
+    ProfileReport.load(args.directory).print(top=args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,436 @@
+"""
+Long-running local HTTP/JSON service around one compiled graph.
+
+    POST /ask         {"question": "...", "max_iterations": 2, "time_budget_ms": 500}  -> answer record (see agent.batch)
+    POST /ask/stream  same body -> NDJSON progress events (see agent.streaming), then {"type": "final", "record": ...}
+    GET  /metrics     QPS, queue depth, in-flight count and latency histograms
+    GET  /healthz     liveness
+
+Requests are handed to a fixed pool of worker threads through a bounded queue. When the
+queue is full the request is rejected immediately with 503 and a Retry-After header, so
+load beyond capacity turns into fast failures instead of unbounded latency.
+"""
+from __future__ import annotations
+
+import json
+import queue
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from collections import Counter, deque
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from agent.batch import BatchConfig, answer_question, count_speculation
+from agent.streaming import jsonable
+from agent.trace import percentile
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS: Tuple[float, ...] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Requests may lower or raise max_iterations, but not past this.
+MAX_ITERATIONS_LIMIT = 10
+
+# Marks the end of a streaming job's event queue.
+_DONE = object()
+
+
+def _is_int(value: Any) -> bool:
+    # JSON true/false arrive as bool, which is an int subclass; they are not numbers here.
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class QueueFull(Exception):
+    """
+    Raised by AgentService.submit when the request queue is at capacity.
+    """
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram (counts per bucket, not cumulative).
+    """
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS_MS) -> None:
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect_left(self.bounds, value_ms)] += 1
+        self.total += value_ms
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"le_{b:g}" for b in self.bounds] + ["inf"]
+        n = sum(self.counts)
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": n,
+            "mean_ms": round(self.total / n, 3) if n else 0.0,
+        }
+
+
+class ServiceMetrics:
+    """
+    Counters and histograms shared by the HTTP threads and the workers (one lock).
+    """
+
+    def __init__(self, window_s: float = 60.0, recent: int = 2048) -> None:
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.window_s = window_s
+        self.accepted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.speculation: Counter = Counter()  # used / dropped / wasted_ms (see batch.count_speculation)
+        self.latency = Histogram()
+        self.queue_wait = Histogram()
+        self._recent: Deque[float] = deque(maxlen=recent)
+        self._finished_at: Deque[float] = deque()
+
+    def on_accepted(self) -> None:
+        with self._lock:
+            self.accepted += 1
+
+    def on_rejected(self) -> None:
+        with self._lock:
+            self.rejected += 1
+
+    def on_timeout(self) -> None:
+        with self._lock:
+            self.timeouts += 1
+
+    def on_started(self, queue_wait_ms: float) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.queue_wait.observe(queue_wait_ms)
+
+    def on_speculation(self, speculation: Optional[dict]) -> None:
+        with self._lock:
+            count_speculation(self.speculation, speculation)
+
+    def on_finished(self, latency_ms: float, ok: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            if not ok:
+                self.errors += 1
+            self.latency.observe(latency_ms)
+            self._recent.append(latency_ms)
+            self._finished_at.append(now)
+            self._trim(now)
+
+    def _trim(self, now: float) -> None:
+        while self._finished_at and self._finished_at[0] < now - self.window_s:
+            self._finished_at.popleft()
+
+    def snapshot(self, queue_depth: int, queue_capacity: int, workers: int) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            self._trim(now)
+            uptime = now - self.started_at
+            window = min(self.window_s, uptime) or 1e-9
+            recent = sorted(self._recent)
+            return {
+                "uptime_s": round(uptime, 3),
+                "workers": workers,
+                "queue_depth": queue_depth,
+                "queue_capacity": queue_capacity,
+                "in_flight": self.in_flight,
+                "accepted": self.accepted,
+                "rejected": self.rejected,
+                "completed": self.completed,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "speculative_used": self.speculation["used"],
+                "speculative_dropped": self.speculation["dropped"],
+                "speculative_wasted_ms": self.speculation["wasted_ms"],
+                "qps": round(len(self._finished_at) / window, 2),
+                "qps_lifetime": round(self.completed / uptime, 2) if uptime > 0 else 0.0,
+                "latency_p50_ms": round(percentile(recent, 50), 3),
+                "latency_p90_ms": round(percentile(recent, 90), 3),
+                "latency_p99_ms": round(percentile(recent, 99), 3),
+                "latency_ms": self.latency.to_dict(),
+                "queue_wait_ms": self.queue_wait.to_dict(),
+            }
+
+
+@dataclass
+class _Job:
+    request_id: str
+    question: str
+    max_iterations: int
+    time_budget_ms: Optional[int] = None
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    future: Future = field(default_factory=Future)
+    # Streaming jobs: progress events (JSON-ready), then _DONE once `future` is resolved.
+    events: Optional["queue.Queue[Any]"] = None
+
+
+class AgentService:
+    """
+    Builds the graph once and answers questions on `workers` threads fed by a queue of at
+    most `queue_size` waiting requests. The graph, registry and caches are shared by all
+    workers; call ids come from the thread-safe agent.graph.new_call_id.
+    """
+
+    def __init__(self, config: BatchConfig, workers: int = 4, queue_size: int = 64) -> None:
+        self.config = config
+        self.workers = workers
+        self.queue_size = queue_size
+        self.metrics = ServiceMetrics()
+        self.audit = config.audit_log()
+        self.registry = config.registry()
+        self.graph, self.answer_cache = config.build(audit=self.audit, registry=self.registry)
+        self._queue: "queue.Queue[Optional[_Job]]" = queue.Queue(maxsize=queue_size)
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> "AgentService":
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"agent-worker-{i + 1}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def stop(self) -> None:
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        self._threads = []
+        if self.audit is not None:
+            self.audit.close()
+
+    def submit(
+        self,
+        question: str,
+        max_iterations: Optional[int] = None,
+        request_id: Optional[str] = None,
+        time_budget_ms: Optional[int] = None,
+        stream: bool = False,
+    ) -> _Job:
+        """
+        Queues a question; the latency budget (default BatchConfig.time_budget_ms) counts
+        from submission, so time spent waiting in the queue is part of it.
+        """
+        job = _Job(
+            request_id=request_id or uuid.uuid4().hex[:12],
+            question=question,
+            max_iterations=max_iterations or self.config.max_iterations,
+            time_budget_ms=time_budget_ms if time_budget_ms is not None else self.config.time_budget_ms,
+            events=queue.Queue() if stream else None,
+        )
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.metrics.on_rejected()
+            raise QueueFull(f"request queue full ({self.queue_size} waiting)") from None
+        self.metrics.on_accepted()
+        return job
+
+    def _worker(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            # Abandoned by a client that already timed out: don't spend a worker on it.
+            if not job.future.set_running_or_notify_cancel():
+                continue
+            waited_ms = (time.perf_counter() - job.enqueued_at) * 1000.0
+            self.metrics.on_started(waited_ms)
+            budget_ms = max(0, round(job.time_budget_ms - waited_ms)) if job.time_budget_ms is not None else None
+            on_event = (lambda event: job.events.put(jsonable(event))) if job.events is not None else None
+            ok = True
+            try:
+                record = answer_question(
+                    self.graph,
+                    job.question,
+                    job.max_iterations,
+                    question_id=job.request_id,
+                    answer_cache=self.answer_cache,
+                    time_budget_ms=budget_ms,
+                    on_event=on_event,
+                )
+                self.metrics.on_speculation(record["speculation"])
+                job.future.set_result(record)
+            except Exception as e:  # reported to the client as a 500
+                ok = False
+                job.future.set_exception(e)
+            finally:
+                self.metrics.on_finished((time.perf_counter() - job.enqueued_at) * 1000.0, ok)
+                if job.events is not None:
+                    job.events.put(_DONE)
+
+    def metrics_snapshot(self) -> Dict[str, Any]:
+        snapshot = self.metrics.snapshot(self._queue.qsize(), self.queue_size, self.workers)
+        # Tool calls shared between requests (single-flight) and batched search executions.
+        snapshot["tools"] = self.registry.stats.snapshot()
+        return snapshot
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so load tests don't pay a connect per request
+    server: "AgentHTTPServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._send_json(200, self.server.service.metrics_snapshot())
+        else:
+            self._send_json(404, {"error": f"no route for GET {self.path}"})
+
+    def _read_ask(self) -> Optional[Tuple[str, Optional[int], Optional[int]]]:
+        """
+        Validated (question, max_iterations, time_budget_ms), or None after answering 400.
+        """
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            question = str(payload.get("question", "")).strip()
+            max_iterations = payload.get("max_iterations")
+            time_budget_ms = payload.get("time_budget_ms")
+            if not question:
+                raise ValueError("'question' is required")
+            if time_budget_ms is not None and not (_is_int(time_budget_ms) and time_budget_ms > 0):
+                raise ValueError("'time_budget_ms' must be a positive integer")
+            if max_iterations is not None and not (
+                _is_int(max_iterations) and 1 <= max_iterations <= MAX_ITERATIONS_LIMIT
+            ):
+                raise ValueError(f"'max_iterations' must be an integer in 1..{MAX_ITERATIONS_LIMIT}")
+        except (ValueError, AttributeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return None
+        return question, max_iterations, time_budget_ms
+
+    def do_POST(self) -> None:
+        if self.path not in ("/ask", "/ask/stream"):
+            self._send_json(404, {"error": f"no route for POST {self.path}"})
+            return
+        ask = self._read_ask()
+        if ask is None:
+            return
+        question, max_iterations, time_budget_ms = ask
+        stream = self.path == "/ask/stream"
+
+        service = self.server.service
+        try:
+            job = service.submit(question, max_iterations, self.headers.get("X-Request-Id"), time_budget_ms, stream)
+        except QueueFull as e:
+            self._send_json(503, {"error": str(e)}, {"Retry-After": "1"})
+            return
+
+        if stream:
+            self._stream_job(job)
+            return
+
+        headers = {"X-Request-Id": job.request_id}
+        try:
+            record = job.future.result(timeout=self.server.request_timeout_s)
+        except FutureTimeout:
+            job.future.cancel()
+            service.metrics.on_timeout()
+            self._send_json(504, {"error": "timed out waiting for an answer", "request_id": job.request_id}, headers)
+            return
+        except Exception as e:
+            self._send_json(500, {"error": f"{type(e).__name__}: {e}", "request_id": job.request_id}, headers)
+            return
+        record["request_id"] = job.request_id
+        self._send_json(200, record, headers)
+
+    def _write_chunk(self, body: Dict[str, Any]) -> None:
+        data = (json.dumps(body, ensure_ascii=False) + "\n").encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream_job(self, job: _Job) -> None:
+        """
+        Chunked NDJSON: each progress event as it happens, then the final record (or an
+        error event). Failures after the 200 status line can only be reported in-band.
+        """
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("X-Request-Id", job.request_id)
+        self.end_headers()
+
+        deadline = time.monotonic() + self.server.request_timeout_s
+        try:
+            while True:
+                event = job.events.get(timeout=max(0.0, deadline - time.monotonic()))
+                if event is _DONE:
+                    break
+                self._write_chunk(event)
+            record = job.future.result(timeout=0)
+            record["request_id"] = job.request_id
+            self._write_chunk({"type": "final", "record": record})
+        except queue.Empty:
+            job.future.cancel()
+            self.server.service.metrics.on_timeout()
+            self._write_chunk({"type": "error", "error": "timed out waiting for an answer", "request_id": job.request_id})
+        except Exception as e:
+            self._write_chunk({"type": "error", "error": f"{type(e).__name__}: {e}", "request_id": job.request_id})
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class AgentHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # listen backlog; the default of 5 drops connects under load
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        service: AgentService,
+        request_timeout_s: float = 30.0,
+        verbose: bool = False,
+    ) -> None:
+        super().__init__(address, _Handler)
+        self.service = service
+        self.request_timeout_s = request_timeout_s
+        self.verbose = verbose
+
+
+def serve(
+    config: BatchConfig,
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    workers: int = 4,
+    queue_size: int = 64,
+    request_timeout_s: float = 30.0,
+    verbose: bool = False,
+) -> None:
+    """
+    Runs the service until interrupted (Ctrl+C).
+    """
+    service = AgentService(config, workers=workers, queue_size=queue_size).start()
+    httpd = AgentHTTPServer((host, port), service, request_timeout_s=request_timeout_s, verbose=verbose)
+    print(f"Serving on http://{host}:{httpd.server_address[1]} ({workers} workers, queue {queue_size}). Ctrl+C to stop.")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        service.stop()
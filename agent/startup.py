@@ -0,0 +1,85 @@
+"""
+Cold-start breakdown for `python main.py --startup-report`.
+
+Startup is timed in phases, in the order a first question pays for them: the imports
+main.py does itself, the graph runtime (LangGraph, langchain_core), the tool registry,
+compiling the graph, loading or building the search index and glossary, and the first
+question end to end (which still warms pydantic validators and regex caches). Each
+phase also reports how many modules it imported. Interpreter startup before main.py
+runs is not visible from inside the process; `python -m bench --startup-runs N`
+measures whole-process wall time instead.
+"""
+from __future__ import annotations
+
+import sys
+import time
+from contextlib import contextmanager
+from typing import IO, Iterator, List, Tuple
+
+from agent import graph as graph_module
+from agent.batch import BatchConfig
+from agent.state import AgentState, graph_input
+
+# A question that touches search, definitions and synthesis.
+WARMUP_QUESTION = "What is RAG and define LangGraph?"
+
+
+class StartupReport:
+    def __init__(self) -> None:
+        self.phases: List[Tuple[str, float, int]] = []  # (phase, ms, modules imported)
+
+    def add(self, name: str, ms: float, modules: int) -> None:
+        self.phases.append((name, ms, modules))
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        n_modules = len(sys.modules)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - t0) * 1000.0, len(sys.modules) - n_modules)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(ms for _, ms, _ in self.phases)
+
+    def print(self, f: IO[str] = sys.stdout) -> None:
+        print("\n=== STARTUP ===", file=f)
+        print(f"{'phase':34} {'ms':>9} {'cum_ms':>9} {'modules':>8}", file=f)
+        cum = 0.0
+        for name, ms, modules in self.phases:
+            cum += ms
+            print(f"{name:34} {ms:>9.1f} {cum:>9.1f} {modules:>8}", file=f)
+        print(f"{'total':34} {self.total_ms:>9.1f}", file=f)
+        print("===============", file=f)
+
+
+def measure_startup(config: BatchConfig, main_imports_ms: float, main_modules: int) -> StartupReport:
+    """
+    Runs the startup phases for `config` in this process (so call it before anything
+    else has warmed them) and returns their timings. main_imports_ms / main_modules
+    describe the caller's own imports, measured by the caller.
+    """
+    report = StartupReport()
+    report.add("main.py imports", main_imports_ms, main_modules)
+
+    with report.phase("graph runtime import"):
+        graph_module.preload()
+    with report.phase("tool registry"):
+        registry = config.registry()
+    with report.phase("graph compile"):
+        graph = graph_module.build_graph(
+            registry,
+            max_concurrency=config.max_concurrency,
+            speculative=config.speculative,
+            compact_state=config.compact_state,
+        )
+    # Called directly, not through the registry, so the tool cache stays empty.
+    with report.phase("search index load/build"):
+        registry.get("search_web").fn("warmup")
+    with report.phase("glossary load"):
+        registry.get("lookup_definition").fn("warmup")
+    with report.phase("first question"):
+        graph.invoke(graph_input(AgentState(user_question=WARMUP_QUESTION, max_iterations=config.max_iterations)))
+    return report
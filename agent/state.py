@@ -1,7 +1,13 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List, Optional
-from pydantic import BaseModel, Field
+from collections.abc import Sequence
+from dataclasses import dataclass, field, fields
+from itertools import chain
+from typing import Annotated, Any, Dict, Iterator, List, Mapping, Optional, TypedDict, Union
+from pydantic import BaseModel, Field, computed_field
+
+from agent.audit import AuditedOutput
+from tools.results import Definition, SearchResults, render_output
 
 
 class ToolCall(BaseModel):
@@ -14,16 +20,62 @@ class ToolResult(BaseModel):
     id: str
     name: str
     args: Dict[str, Any]
-    output: str
+    # Typed output (see tools.results), or plain text from tools that return strings;
+    # long plain text is AuditedOutput when the graph writes an audit log (agent.audit).
+    output: Union[SearchResults, Definition, AuditedOutput, str]
     started_at_ms: int
     finished_at_ms: int
+    cache_hit: Optional[bool] = None  # None = tool not cached
+    status: str = "ok"  # ok/timeout
 
+    @computed_field
     @property
     def duration_ms(self) -> int:
         if self.started_at_ms and self.finished_at_ms:
             return max(0, self.finished_at_ms - self.started_at_ms)
         return 0
 
+    @property
+    def text(self) -> str:
+        """
+        The output rendered to text (done on demand, not stored).
+        """
+        return render_output(self.output)
+
+    def log_entry(self) -> Dict[str, Any]:
+        """
+        JSON-ready form for printing and records: the output rendered to text.
+        """
+        entry = self.model_dump(exclude={"output"})
+        entry["output"] = self.text
+        return entry
+
+
+class StepTiming(BaseModel):
+    """
+    Wall-clock timing of one act step (all tool calls issued together).
+    """
+    iteration: int
+    call_ids: List[str]
+    started_at_ms: int
+    finished_at_ms: int
+
+    @computed_field
+    @property
+    def duration_ms(self) -> int:
+        return max(0, self.finished_at_ms - self.started_at_ms)
+
+
+class Speculation(BaseModel):
+    """
+    The follow-up search sent alongside the primary one in speculative mode. reflect_node
+    keeps its result only when the primary search found nothing (where the serial graph
+    would have run the follow-up pass); otherwise the result is dropped from the state.
+    """
+    call_id: str
+    used: Optional[bool] = None  # None = not decided yet
+    duration_ms: int = 0  # time the call took; wasted work when not used
+
 
 class Citation(BaseModel):
     tool: str
@@ -40,6 +92,7 @@ class FinalAnswer(BaseModel):
 class AgentState(BaseModel):
     # Input
     user_question: str
+    question_id: Optional[str] = None  # tags trace spans and batch records
 
     # Planning + tool usage
     plan: List[str] = Field(default_factory=list)
@@ -50,9 +103,188 @@ class AgentState(BaseModel):
     iteration: int = 0
     max_iterations: int = 2
     needs_more_evidence: bool = False
+    # Latency budget: wall-clock epoch ms (same clock as trace.now_ms) by which the answer
+    # should be ready. Tool calls are cut off at it and no follow-up pass starts that can't fit.
+    deadline_ms: Optional[int] = None
+    speculation: Optional[Speculation] = None
 
     # Output
     final: Optional[FinalAnswer] = None
 
-    # Audit log (append-only)
-    tool_log: List[ToolResult] = Field(default_factory=list)
\ No newline at end of file
+    # Audit log (append-only): call ids in execution order, resolved against tool_results,
+    # so each result is stored once (see tool_log_entries).
+    tool_log: List[str] = Field(default_factory=list)
+    step_log: List[StepTiming] = Field(default_factory=list)
+
+
+def graph_input(state: AgentState) -> Dict[str, Any]:
+    """
+    Input for graph.invoke/stream: the state's fields as a shallow dict. Nested models are
+    passed as they are (model_dump would turn them into dicts to be validated again).
+    """
+    return {name: getattr(state, name) for name in AgentState.model_fields}
+
+
+# --- compact state (build_graph(compact_state=True)) ------------------------
+#
+# The graph keeps state in LangGraph channels typed by CompactState instead of one
+# AgentState: nothing is validated between nodes, and the append-only lists are extended
+# in place by each node's new items (the append_items reducer), never copied. Nodes
+# still see attribute access, on a FastState built from the channels, where those lists
+# are Appended views that collect only the node's additions. Results are validated once
+# at the boundary (graph_input in, AgentState.model_validate when needed).
+#
+# The channels are not checkpointed (build_graph compiles without a checkpointer), so
+# nothing else holds on to the lists' earlier contents.
+
+
+class Replace(list):
+    """
+    Update for an append_items channel that replaces its list instead of extending it.
+    """
+
+
+class AppendLog(list):
+    """
+    Value of an append_items channel, owned by one graph run and extended in place.
+    """
+
+    # The update applied last. When a conditional edge follows a node, LangGraph applies
+    # the node's writes twice: to shallow copies of the channels for the routing read
+    # (which share this list) and then for real. The second time is skipped.
+    last_update: Optional[list] = None
+
+
+def append_items(current: list, update: list) -> list:
+    if isinstance(update, Replace):
+        return AppendLog(update)
+    if not update:
+        return current
+    if not isinstance(current, AppendLog):
+        # The channel's initial empty list: start the run's own list, so the caller's
+        # input list (graph_input) is never extended.
+        current = AppendLog(current)
+    elif current.last_update is update:
+        return current
+    current.extend(update)
+    current.last_update = update
+    return current
+
+
+class Appended(Sequence):
+    """
+    An append-only list as a compact-state node sees it: the channel's items (shared, not
+    copied) followed by the node's own additions. append/extend only add to `new`, which
+    is all the node's update carries, so a node run costs the same however long the list is.
+    """
+
+    __slots__ = ("base", "new")
+
+    def __init__(self, base: list) -> None:
+        self.base = base
+        self.new: list = []
+
+    def __len__(self) -> int:
+        return len(self.base) + len(self.new)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        n = len(self.base)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Appended index out of range")
+        return self.base[i] if i < n else self.new[i - n]
+
+    def __iter__(self) -> Iterator[Any]:
+        return chain(self.base, self.new)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def append(self, item: Any) -> None:
+        self.new.append(item)
+
+    def extend(self, items) -> None:
+        self.new.extend(items)
+
+
+class CompactState(TypedDict, total=False):
+    user_question: str
+    question_id: Optional[str]
+    plan: List[str]
+    tool_calls: List[ToolCall]
+    tool_results: Annotated[List[ToolResult], append_items]
+    iteration: int
+    max_iterations: int
+    needs_more_evidence: bool
+    deadline_ms: Optional[int]
+    speculation: Optional[Speculation]
+    final: Optional[FinalAnswer]
+    tool_log: Annotated[List[str], append_items]
+    step_log: Annotated[List[StepTiming], append_items]
+
+
+# Channels with the append_items reducer; a node's update carries only its new items.
+APPEND_FIELDS = ("tool_results", "tool_log", "step_log")
+
+
+@dataclass(slots=True)
+class FastState:
+    """
+    AgentState's fields on a slotted dataclass, for nodes of a compact-state graph.
+    """
+    user_question: str
+    question_id: Optional[str] = None
+    plan: List[str] = field(default_factory=list)
+    tool_calls: List[ToolCall] = field(default_factory=list)
+    tool_results: List[ToolResult] = field(default_factory=list)
+    iteration: int = 0
+    max_iterations: int = 2
+    needs_more_evidence: bool = False
+    deadline_ms: Optional[int] = None
+    speculation: Optional[Speculation] = None
+    final: Optional[FinalAnswer] = None
+    tool_log: List[str] = field(default_factory=list)
+    step_log: List[StepTiming] = field(default_factory=list)
+
+    @classmethod
+    def from_channels(cls, values: Mapping[str, Any], writable: bool = True) -> "FastState":
+        """
+        State for a node run. The append-only lists are wrapped in Appended views, so the
+        node's additions never touch (or copy) the channel values; pass writable=False for
+        read-only use such as routing.
+        """
+        state = cls(**values)
+        if writable:
+            for name in APPEND_FIELDS:
+                setattr(state, name, Appended(getattr(state, name)))
+        return state
+
+    def updates(self, before: Mapping[str, Any]) -> Dict[str, Any]:
+        """
+        Channel updates since `before` (the channel values the node started from): the
+        items a node added to the append-only lists (or a Replace when it assigned a new
+        list, e.g. to remove items), and every other field the node reassigned.
+        """
+        out: Dict[str, Any] = {}
+        for f in fields(self):
+            name = f.name
+            value = getattr(self, name)
+            if name in APPEND_FIELDS:
+                if not isinstance(value, Appended):
+                    out[name] = Replace(value)
+                elif value.new:
+                    out[name] = value.new
+            elif value is not before.get(name):
+                out[name] = value
+        return out
+
+
+def tool_log_entries(state: Mapping[str, Any]) -> List[ToolResult]:
+    """
+    The tool log of a state dict (e.g. what graph.invoke returns) as ToolResults.
+    """
+    by_id = {r.id: r for r in state["tool_results"]}
+    return [by_id[call_id] for call_id in state["tool_log"]]
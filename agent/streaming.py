@@ -0,0 +1,85 @@
+"""
+Incremental progress events on top of LangGraph's custom stream mode.
+
+Nodes call emit() as soon as something user-visible is ready:
+
+    {"type": "plan", "iteration": 1, "plan": [...], "tool_calls": [ToolCall, ...]}
+    {"type": "tool_result", "result": ToolResult}             # as each call completes
+    {"type": "follow_up", "iteration": 2, "tool_calls": [...]} # reflect asked for more evidence
+    {"type": "speculation", "call_id": ..., "used": bool, "duration_ms": 3}  # speculative mode
+    {"type": "section", "title": "Definitions", "text": "..."} # as synthesis produces it
+
+stream_answer()/astream_answer() yield those events in order, followed by
+{"type": "final", "state": <final state dict, as graph.invoke returns it>}.
+"""
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Callable, Dict, Iterator
+
+from pydantic import BaseModel
+
+from agent.state import AgentState, ToolResult, graph_input
+
+Event = Dict[str, Any]
+
+_STREAM_MODES = ["custom", "values"]
+
+
+def emit(event: Event) -> None:
+    """
+    Sends a progress event to the running graph's custom stream. A no-op when the graph
+    is driven with invoke() (or a node is called outside a graph run).
+    """
+    from langgraph.config import get_stream_writer  # imported with the graph runtime, see agent.graph
+
+    try:
+        writer = get_stream_writer()
+    except RuntimeError:
+        return
+    writer(event)
+
+
+def stream_answer(graph, state: AgentState) -> Iterator[Event]:
+    final = None
+    for mode, chunk in graph.stream(graph_input(state), stream_mode=_STREAM_MODES):
+        if mode == "custom":
+            yield chunk
+        else:
+            final = chunk
+    yield {"type": "final", "state": final}
+
+
+async def astream_answer(graph, state: AgentState) -> AsyncIterator[Event]:
+    final = None
+    async for mode, chunk in graph.astream(graph_input(state), stream_mode=_STREAM_MODES):
+        if mode == "custom":
+            yield chunk
+        else:
+            final = chunk
+    yield {"type": "final", "state": final}
+
+
+def run_streaming(graph, state: AgentState, on_event: Callable[[Event], None]) -> Dict[str, Any]:
+    """
+    Same result as graph.invoke, with every progress event passed to `on_event` as it happens.
+    """
+    for event in stream_answer(graph, state):
+        if event["type"] == "final":
+            return event["state"]
+        on_event(event)
+    raise RuntimeError("graph stream ended without a final state")
+
+
+def jsonable(value: Any) -> Any:
+    """
+    Event payloads with pydantic models dumped (tool outputs rendered), ready for json.dumps.
+    """
+    if isinstance(value, ToolResult):
+        return value.log_entry()
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    if isinstance(value, dict):
+        return {k: jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v) for v in value]
+    return value
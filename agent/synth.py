@@ -1,9 +1,15 @@
 from __future__ import annotations
 
-from typing import List, Tuple
+from typing import Callable, List, Optional, Tuple
 
+from agent import policies
 from agent.state import Citation, ToolResult
 from tools.implementations import summarize
+from tools.results import SearchResults, no_results, render_output
+from tools.snippets import join_sentences
+
+# One step down per degradation (timed-out tools, skipped follow-up pass).
+_LOWER_CONFIDENCE = {"high": "medium", "medium": "low", "low": "low"}
 
 
 def build_citations(results_used: List[ToolResult]) -> List[Citation]:
@@ -16,12 +22,35 @@ def format_citation_block(citations: List[Citation]) -> str:
     return " ".join([f"[source: {c.tool}#{c.call_id}]" for c in citations])
 
 
-def synthesize_answer(question: str, tool_results: List[ToolResult]) -> Tuple[str, List[Citation], str, List[str]]:
+def evidence_brief(output) -> str:
+    """
+    Two-sentence evidence line for a search output: the top hit's title and doc id plus
+    the first sentence of its snippet. Typed results use the sentence spans segmented at
+    index time; only plain-text outputs are re-split.
+    """
+    if isinstance(output, SearchResults) and output.hits:
+        hit = output.hits[0]
+        return f"1. {hit.title} (doc_id={hit.doc_id}) — {join_sentences(output.sentences(hit)[:1])}"
+    return summarize(render_output(output), max_sentences=2)
+
+
+def synthesize_answer(
+    question: str,
+    tool_results: List[ToolResult],
+    budget_exhausted: bool = False,
+    on_section: Optional[Callable[[str, str], None]] = None,
+) -> Tuple[str, List[Citation], str, List[str]]:
     """
     Deterministic synthesis: use tool outputs, cite every tool output that contributes to content.
+    Timed-out calls contribute no content and lower confidence, as does `budget_exhausted`
+    (the follow-up search was skipped because the latency budget ran out).
+    on_section(title, markdown) is called as each section of the answer is completed.
     Returns: (answer_text, citations, confidence, limitations)
     """
-    q = question.lower()
+    features = policies.analyze(question)
+
+    timed_out = [r for r in tool_results if r.status == "timeout"]
+    tool_results = [r for r in tool_results if r.status == "ok"]
 
     defs = [r for r in tool_results if r.name == "lookup_definition"]
     searches = [r for r in tool_results if r.name == "search_web"]
@@ -30,41 +59,52 @@ def synthesize_answer(question: str, tool_results: List[ToolResult]) -> Tuple[st
     used: List[ToolResult] = []
     parts: List[str] = []
 
+    def section_done(title: str, start: int) -> None:
+        if on_section is not None:
+            on_section(title, "\n".join(parts[start:]).strip())
+
     if defs:
+        start = len(parts)
         parts.append("## Definitions")
         for r in defs:
             term = r.args.get("term", "term")
-            parts.append(f"- **{term}**: {r.output} [source: {r.name}#{r.id}]")
+            parts.append(f"- **{term}**: {r.text} [source: {r.name}#{r.id}]")
             used.append(r)
+        section_done("Definitions", start)
 
     if searches:
+        start = len(parts)
         parts.append("\n## Evidence (offline search)")
         for r in searches:
             # Keep evidence readable but still grounded
-            brief = summarize(r.output, max_sentences=2)
+            brief = evidence_brief(r.output)
             parts.append(f"- {brief} [source: {r.name}#{r.id}]")
             used.append(r)
+        section_done("Evidence", start)
 
     if sums:
+        start = len(parts)
         parts.append("\n## Additional Summary")
         for r in sums:
-            parts.append(f"- {r.output} [source: {r.name}#{r.id}]")
+            parts.append(f"- {r.text} [source: {r.name}#{r.id}]")
             used.append(r)
+        section_done("Additional Summary", start)
 
+    start = len(parts)
     parts.append("\n## Answer")
-    if "langgraph" in q:
+    if "langgraph" in features.terms:
         parts.append(
             "LangGraph is most useful when you want **explicit, stateful control** over multi-step workflows: "
             "branching, loops (tool-use cycles), and clear execution structure. For a research assistant, that maps "
             "cleanly onto a graph: **plan → tool calls → reflect → retry → synthesize**, with state and audit logs."
         )
-    elif "rag" in q:
+    elif "rag" in features.terms:
         parts.append(
             "RAG (Retrieval-Augmented Generation) improves reliability by grounding generation in retrieved context. "
             "Even in this offline version, the same principle applies: retrieve evidence first, then generate, and cite "
             "the evidence-producing tool calls."
         )
-    elif "compare" in q or "difference" in q:
+    elif "compare" in features.triggers or "difference" in features.triggers:
         parts.append(
             "This assistant answers comparison questions by first retrieving evidence (offline KB search), then synthesizing "
             "trade-offs into a readable summary. When evidence is insufficient, it performs a targeted follow-up search pass."
@@ -74,6 +114,7 @@ def synthesize_answer(question: str, tool_results: List[ToolResult]) -> Tuple[st
             "This assistant decides when to retrieve evidence from tools, gathers it, and produces a citation-backed answer. "
             "The tool usage log makes the workflow auditable and easy to debug."
         )
+    section_done("Answer", start)
 
     limitations = [
         "No real web access: `search_web` queries a small offline KB.",
@@ -84,12 +125,23 @@ def synthesize_answer(question: str, tool_results: List[ToolResult]) -> Tuple[st
     # Confidence heuristic
     confidence = "medium"
     if searches:
-        if any("No offline KB results" in r.output for r in searches):
+        if any(no_results(r.output) for r in searches):
             confidence = "low"
         else:
             confidence = "high"
 
+    if timed_out:
+        ids = ", ".join(f"{r.name}#{r.id}" for r in timed_out)
+        limitations.append(f"Some tool calls timed out and were left out of the answer: {ids}.")
+        confidence = _LOWER_CONFIDENCE[confidence]
+    if budget_exhausted:
+        limitations.append("The follow-up evidence search was skipped: the latency budget ran out.")
+        confidence = _LOWER_CONFIDENCE[confidence]
+
     citations = build_citations(used)
-    answer_text = "\n".join(parts) + "\n\nCitations: " + format_citation_block(citations)
+    citation_line = "Citations: " + format_citation_block(citations)
+    if on_section is not None:
+        on_section("Citations", citation_line)
+    answer_text = "\n".join(parts) + "\n\n" + citation_line
 
     return answer_text, citations, confidence, limitations
\ No newline at end of file
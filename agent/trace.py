@@ -1,23 +1,228 @@
 from __future__ import annotations
 
+import itertools
+import json
+import os
+import threading
 import time
-from dataclasses import dataclass
-from typing import Any, Callable
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence
 
 
 def now_ms() -> int:
     return int(time.time() * 1000)
 
 
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of already sorted latencies (0.0 when empty); shared by the
+    batch summary, the server's /stats and the bench scripts.
+    """
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, round(pct / 100.0 * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
 @dataclass
 class TimedOutput:
     started_at_ms: int
     finished_at_ms: int
-    output: str
+    output: Any
 
 
-def timed_call(fn: Callable[..., str], **kwargs: Any) -> TimedOutput:
+def timed_call(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> TimedOutput:
     start = now_ms()
-    out = fn(**kwargs)
+    out = fn(*args, **kwargs)
     end = now_ms()
     return TimedOutput(started_at_ms=start, finished_at_ms=end, output=out)
+
+
+async def atimed_call(fn: Callable[..., Awaitable[Any]], *args: Any, **kwargs: Any) -> TimedOutput:
+    start = now_ms()
+    out = await fn(*args, **kwargs)
+    end = now_ms()
+    return TimedOutput(started_at_ms=start, finished_at_ms=end, output=out)
+
+
+# --- span tracing ------------------------------------------------------------
+#
+# Nested spans timed with perf_counter_ns. Nothing is recorded unless a Tracer is
+# active in the current context (Tracer.activate); span() is a cheap no-op otherwise.
+# Parent/child links follow contextvars, so they survive asyncio tasks and any
+# thread pool that runs work in a copied context.
+
+# Attributes a child span inherits from its parent unless it sets them itself.
+INHERITED_ATTRS = ("question_id", "iteration")
+
+
+@dataclass
+class Span:
+    name: str
+    cat: str
+    span_id: int
+    parent_id: Optional[int]
+    start_ns: int
+    end_ns: int = 0
+    pid: int = 0
+    tid: int = 0
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ns(self) -> int:
+        return max(0, self.end_ns - self.start_ns)
+
+
+_ACTIVE_TRACER: ContextVar[Optional["Tracer"]] = ContextVar("active_tracer", default=None)
+_CURRENT_SPAN: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Collects spans and exports them as Chrome trace events or JSONL.
+    Timestamps are perf_counter_ns shifted onto the wall clock, so traces written by
+    different runs or processes line up when merged.
+    """
+
+    def __init__(self) -> None:
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._epoch_offset_ns = time.time_ns() - time.perf_counter_ns()
+
+    @contextmanager
+    def activate(self) -> Iterator["Tracer"]:
+        token = _ACTIVE_TRACER.set(self)
+        try:
+            yield self
+        finally:
+            _ACTIVE_TRACER.reset(token)
+
+    @contextmanager
+    def span(self, name: str, cat: str = "span", **attrs: Any) -> Iterator[Span]:
+        parent = _CURRENT_SPAN.get()
+        if parent is not None:
+            for key in INHERITED_ATTRS:
+                if key not in attrs and key in parent.attrs:
+                    attrs[key] = parent.attrs[key]
+
+        sp = Span(
+            name=name,
+            cat=cat,
+            span_id=next(self._ids),
+            parent_id=parent.span_id if parent else None,
+            start_ns=time.perf_counter_ns(),
+            pid=os.getpid(),
+            tid=threading.get_ident(),
+            attrs=attrs,
+        )
+        token = _CURRENT_SPAN.set(sp)
+        try:
+            yield sp
+        finally:
+            sp.end_ns = time.perf_counter_ns()
+            _CURRENT_SPAN.reset(token)
+            with self._lock:
+                self.spans.append(sp)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.spans.clear()
+
+    def records(self) -> List[dict]:
+        """
+        Spans as plain dicts with wall-clock start/end (ns since the epoch).
+        """
+        with self._lock:
+            spans = list(self.spans)
+        out = []
+        for sp in spans:
+            rec = asdict(sp)
+            rec["start_ns"] = sp.start_ns + self._epoch_offset_ns
+            rec["end_ns"] = sp.end_ns + self._epoch_offset_ns
+            rec["duration_ns"] = sp.duration_ns
+            out.append(rec)
+        return out
+
+    def write_jsonl(self, path: str, append: bool = True) -> None:
+        with open(path, "a" if append else "w", encoding="utf-8") as f:
+            for rec in self.records():
+                f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+
+    def write_chrome(self, path: str) -> None:
+        write_chrome_trace(self.records(), path)
+
+
+def current_tracer() -> Optional[Tracer]:
+    return _ACTIVE_TRACER.get()
+
+
+@contextmanager
+def span(name: str, cat: str = "span", **attrs: Any) -> Iterator[Optional[Span]]:
+    """
+    Records a span on the active tracer; yields None (and records nothing) when tracing is off.
+    """
+    tracer = _ACTIVE_TRACER.get()
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, cat, **attrs) as sp:
+        yield sp
+
+
+def chrome_events(records: List[dict]) -> List[dict]:
+    return [
+        {
+            "name": rec["name"],
+            "cat": rec["cat"],
+            "ph": "X",
+            "ts": rec["start_ns"] / 1000.0,
+            "dur": rec["duration_ns"] / 1000.0,
+            "pid": rec["pid"],
+            "tid": rec["tid"],
+            "args": {**rec["attrs"], "span_id": rec["span_id"], "parent_id": rec["parent_id"]},
+        }
+        for rec in records
+    ]
+
+
+def write_chrome_trace(records: List[dict], path: str) -> None:
+    """
+    Writes records in the Chrome trace-event format (chrome://tracing, Perfetto).
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": chrome_events(records), "displayTimeUnit": "ms"}, f, default=str)
+
+
+def read_jsonl_records(paths: List[str]) -> List[dict]:
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    records.sort(key=lambda r: r["start_ns"])
+    return records
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """
+    python -m agent.trace merge OUT.json IN.jsonl [IN.jsonl ...]
+    Combines JSONL span files (e.g. from several runs or batch workers) into one Chrome trace.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m agent.trace")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_merge = sub.add_parser("merge", help="Merge JSONL span files into a Chrome trace.")
+    p_merge.add_argument("output")
+    p_merge.add_argument("inputs", nargs="+")
+    args = parser.parse_args(argv)
+
+    records = read_jsonl_records(args.inputs)
+    write_chrome_trace(records, args.output)
+    print(f"wrote {args.output}: {len(records)} spans from {len(args.inputs)} file(s)")
+
+
+if __name__ == "__main__":
+    main()
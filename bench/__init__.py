@@ -0,0 +1,5 @@
+"""
+Benchmark suite: synthetic KBs and query mixes, per-component and end-to-end timings.
+
+Run with `python -m bench --help`.
+"""
@@ -0,0 +1,130 @@
+"""
+Usage:
+    python -m bench                                   # default scales, print + write bench_results.json
+    python -m bench --scales 1000,100000,1000000      # larger synthetic KBs
+    python -m bench --save-baseline bench_baseline.json
+    python -m bench --baseline bench_baseline.json --tolerance 0.25   # exit 1 on regressions
+    python -m bench --scales 1000000 --shards 1,2,4,8   # sharded search latency vs shard count
+    python -m bench --glossary-terms 300000             # glossary lookup latency and memory
+    python -m bench --ingest-batches 8                  # incremental KB updates (tools/ingest.py)
+    python -m bench --startup-runs 10 --startup-budget-ms 1500   # cold start; exit 1 over budget
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+from bench.harness import compare
+from bench.suites import run_all
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Research assistant benchmarks.")
+    parser.add_argument("--scales", default="1000,10000", help="Comma-separated synthetic KB sizes (default 1000,10000).")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per benchmark (default 200).")
+    parser.add_argument("--overlap-max-docs", type=int, default=10000, help="Skip the legacy overlap scorer above this KB size.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_results.json", help="Where to write results (JSON).")
+    parser.add_argument("--baseline", default=None, help="Compare against a saved results file.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression vs baseline (default 0.2 = 20%%).")
+    parser.add_argument("--save-baseline", default=None, help="Also write results to this baseline path.")
+    parser.add_argument(
+        "--shards",
+        default="",
+        help="Comma-separated shard counts for the sharded search benchmark (default: skipped). "
+        "Latency only improves while shard count <= available cores.",
+    )
+    parser.add_argument(
+        "--glossary-terms",
+        type=int,
+        default=0,
+        help="Benchmark tools.glossary lookups on a synthetic glossary of this many terms (default: skipped).",
+    )
+    parser.add_argument(
+        "--ingest-batches",
+        type=int,
+        default=0,
+        help="Benchmark this many incremental put batches on a KB directory per scale (default: skipped).",
+    )
+    parser.add_argument(
+        "--startup-runs",
+        type=int,
+        default=0,
+        help="Time this many fresh `python main.py` processes per startup benchmark (default: skipped).",
+    )
+    parser.add_argument(
+        "--startup-budget-ms",
+        type=float,
+        default=None,
+        help="Exit 1 if the p50 cold start through the first question exceeds this (needs --startup-runs).",
+    )
+    args = parser.parse_args()
+    if args.startup_budget_ms is not None and not args.startup_runs:
+        parser.error("--startup-budget-ms needs --startup-runs")
+
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+    shard_counts = [int(s) for s in args.shards.split(",") if s.strip()]
+    results = run_all(
+        scales,
+        args.queries,
+        args.overlap_max_docs,
+        seed=args.seed,
+        shard_counts=shard_counts,
+        glossary_terms=args.glossary_terms,
+        ingest_batches=args.ingest_batches,
+        startup_runs=args.startup_runs,
+    )
+
+    doc = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scales": scales,
+            "queries": args.queries,
+            "seed": args.seed,
+            "cpu_count": os.cpu_count(),
+            "shards": shard_counts,
+            "glossary_terms": args.glossary_terms,
+            "ingest_batches": args.ingest_batches,
+            "startup_runs": args.startup_runs,
+        },
+        "results": results,
+    }
+
+    print(f"{'benchmark':32} {'p50_ms':>10} {'p90_ms':>10} {'p99_ms':>10} {'per_s':>10} {'peak_KiB':>10}")
+    for name, r in results.items():
+        print(
+            f"{name:32} {r.get('p50_ms', '-'):>10} {r.get('p90_ms', '-'):>10} {r.get('p99_ms', '-'):>10} "
+            f"{r.get('throughput_per_s', '-'):>10} {r.get('peak_mem_kib', '-'):>10}"
+        )
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(doc, f, indent=2)
+
+    if args.startup_budget_ms is not None:
+        p50 = results["startup.first_question"]["p50_ms"]
+        if p50 > args.startup_budget_ms:
+            print(f"\nSTARTUP OVER BUDGET: p50 {p50} ms > {args.startup_budget_ms} ms", file=sys.stderr)
+            sys.exit(1)
+        print(f"\nStartup within budget: p50 {p50} ms <= {args.startup_budget_ms} ms")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        problems = compare(results, baseline, args.tolerance)
+        if problems:
+            print("\nREGRESSIONS:", file=sys.stderr)
+            for p in problems:
+                print(f"- {p}", file=sys.stderr)
+            sys.exit(1)
+        print("\nNo regressions vs baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import random
+from typing import List, Tuple
+
+from agent.policies import KNOWN_TERMS
+
+# Topic words mixed into synthetic docs so benchmark queries actually hit postings.
+_TOPICS = ["langgraph", "langchain", "rag", "retrieval", "citations", "agent", "tools", "graphs", "state", "planning"]
+
+# One template per policies trigger path (search / define / summary / none).
+QUERY_TEMPLATES = {
+    "search": [
+        "What is {t} and why would I use it?",
+        "Explain how {t} works.",
+        "Compare {t} and {u}. What is the difference?",
+        "What are the pros and cons of {t}? Cite sources.",
+        "Best research evidence about {t}",
+    ],
+    "define": [
+        "Define {t}.",
+        "What does {t} stand for?",
+        'Give me the definition of "{t}".',
+    ],
+    "summary": [
+        "Summarize {t} in short.",
+        "tl;dr of {t} vs {u}",
+    ],
+    "none": [
+        "hello there",
+        "thanks, {t} looks good",
+    ],
+}
+
+
+def synthetic_kb(n_docs: int, vocab_size: int = 20000, doc_len: int = 40, seed: int = 0) -> List[dict]:
+    """
+    Deterministic corpus in the tools.kb.KB shape. Word frequencies are skewed (Zipf-like)
+    so postings lengths resemble natural text.
+    """
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(vocab_size)]
+    weights = [1.0 / (i + 1) for i in range(vocab_size)]
+    docs = []
+    for i in range(n_docs):
+        topic = _TOPICS[i % len(_TOPICS)]
+        words = rng.choices(vocab, weights=weights, k=doc_len)
+        words[rng.randrange(doc_len)] = topic
+        docs.append(
+            {
+                "id": f"syn:{i}",
+                "title": f"{topic} note {i}",
+                "text": " ".join(words) + ". " + " ".join(rng.choices(vocab, weights=weights, k=doc_len // 2)) + ".",
+                "tags": [topic],
+            }
+        )
+    return docs
+
+
+def query_mix(n: int, seed: int = 0) -> List[str]:
+    """
+    Questions cycling through every trigger path, with known terms substituted in.
+    """
+    rng = random.Random(seed)
+    terms = KNOWN_TERMS + _TOPICS
+    flat = [tpl for tpls in QUERY_TEMPLATES.values() for tpl in tpls]
+    out = []
+    for i in range(n):
+        tpl = flat[i % len(flat)]
+        out.append(tpl.format(t=rng.choice(terms), u=rng.choice(terms)))
+    return out
+
+
+def synthetic_glossary(n_terms: int, seed: int = 0) -> List[Tuple[str, str, List[str]]]:
+    """
+    Glossary entries (term, definition, aliases) for tools.glossary: pronounceable one-
+    to three-word terms, each with a spaced or hyphenated alias variant.
+    """
+    rng = random.Random(seed)
+    syllables = ["ba", "ce", "di", "fo", "gu", "ka", "le", "mi", "no", "pu", "ra", "se", "ti", "vo", "xu", "ze"]
+
+    def word() -> str:
+        return "".join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+
+    out = []
+    seen = set()
+    while len(out) < n_terms:
+        words = [word() for _ in range(rng.choice((1, 1, 2, 3)))]
+        term = " ".join(words)
+        if term in seen:
+            continue
+        seen.add(term)
+        alias = "-".join(words) if len(words) > 1 else f"{term}s"
+        out.append((term, f"Synthetic definition of {term}: " + " ".join(word() for _ in range(20)) + ".", [alias]))
+    return out
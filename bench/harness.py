@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Sequence
+
+from agent.trace import percentile
+
+
+def measure(
+    fn: Callable[[Any], Any],
+    inputs: Sequence[Any],
+    warmup: int = 5,
+    memory_sample: int = 50,
+) -> Dict[str, float]:
+    """
+    Calls fn once per input and reports latency percentiles (ms), throughput and the
+    peak traced allocation (KiB) over a separate pass on the first `memory_sample` inputs.
+    Timing and memory are measured in separate passes because tracemalloc slows calls down.
+    """
+    for x in inputs[:warmup]:
+        fn(x)
+
+    latencies: List[float] = []
+    start = time.perf_counter()
+    for x in inputs:
+        t0 = time.perf_counter_ns()
+        fn(x)
+        latencies.append((time.perf_counter_ns() - t0) / 1e6)
+    wall_s = time.perf_counter() - start
+
+    peak_kib = 0.0
+    if memory_sample:
+        tracemalloc.start()
+        try:
+            for x in inputs[:memory_sample]:
+                fn(x)
+            peak_kib = tracemalloc.get_traced_memory()[1] / 1024.0
+        finally:
+            tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "n": len(latencies),
+        "wall_s": round(wall_s, 4),
+        "throughput_per_s": round(len(latencies) / wall_s, 2) if wall_s > 0 else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 4),
+        "p90_ms": round(percentile(latencies, 90), 4),
+        "p99_ms": round(percentile(latencies, 99), 4),
+        "max_ms": round(latencies[-1], 4) if latencies else 0.0,
+        "peak_mem_kib": round(peak_kib, 1),
+    }
+
+
+def measure_once(fn: Callable[[], Any], memory: bool = True) -> Dict[str, float]:
+    """
+    Single timed call (e.g. an index build). With memory=True, fn runs a second time
+    under tracemalloc to record the peak traced allocation.
+    """
+    t0 = time.perf_counter()
+    fn()
+    wall_s = time.perf_counter() - t0
+
+    peak_kib = 0.0
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            peak_kib = tracemalloc.get_traced_memory()[1] / 1024.0
+        finally:
+            tracemalloc.stop()
+    return {"n": 1, "wall_s": round(wall_s, 4), "p50_ms": round(wall_s * 1000.0, 4), "peak_mem_kib": round(peak_kib, 1)}
+
+
+def compare(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> List[str]:
+    """
+    Regressions of p50 latency or peak memory beyond `tolerance` (0.2 = 20% slower/larger).
+    Benchmarks missing from either side are ignored.
+    """
+    problems = []
+    for name, cur in sorted(current.items()):
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "peak_mem_kib"):
+            b, c = base.get(metric), cur.get(metric)
+            if b and c and c > b * (1.0 + tolerance):
+                problems.append(f"{name}: {metric} {b} -> {c} (+{(c / b - 1.0):.0%})")
+    return problems
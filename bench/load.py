@@ -0,0 +1,92 @@
+"""
+Closed-loop load generator for the HTTP service (python main.py --serve).
+
+Usage:
+    python -m bench.load --url http://127.0.0.1:8765 --concurrency 16 --requests 2000
+
+Each client thread keeps one keep-alive connection and sends the next question as soon as
+the previous answer arrives. Prints client-side throughput, latency percentiles and status
+counts, followed by the server's /metrics.
+"""
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import threading
+import time
+from collections import Counter
+from typing import List
+from urllib.parse import urlsplit
+
+from agent.trace import percentile
+from bench.corpus import query_mix
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m bench.load", description="Load-test the research assistant service.")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--concurrency", type=int, default=8, help="Client threads (default 8).")
+    parser.add_argument("--requests", type=int, default=1000, help="Total requests (default 1000).")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    questions = query_mix(args.requests, seed=args.seed)
+    next_index = iter(range(args.requests))
+    index_lock = threading.Lock()
+
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    results_lock = threading.Lock()
+
+    def client() -> None:
+        conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+        while True:
+            with index_lock:
+                i = next(next_index, None)
+            if i is None:
+                break
+            body = json.dumps({"question": questions[i]})
+            t0 = time.perf_counter()
+            try:
+                conn.request("POST", "/ask", body=body, headers={"Content-Type": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+                status = resp.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+                status = "connection_error"
+            elapsed_ms = (time.perf_counter() - t0) * 1000.0
+            with results_lock:
+                statuses[status] += 1
+                if status == 200:
+                    latencies.append(elapsed_ms)
+        conn.close()
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(args.concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_s = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"requests: {args.requests}  concurrency: {args.concurrency}  wall_s: {wall_s:.3f}")
+    print(f"throughput_qps: {sum(statuses.values()) / wall_s:.2f}  ok_qps: {len(latencies) / wall_s:.2f}")
+    print(
+        f"latency_ms p50={percentile(latencies, 50):.3f} p90={percentile(latencies, 90):.3f} "
+        f"p99={percentile(latencies, 99):.3f}"
+    )
+    print("statuses:", dict(statuses))
+
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=10)
+    conn.request("GET", "/metrics")
+    print("server metrics:", json.dumps(json.loads(conn.getresponse().read()), indent=2))
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+from __future__ import annotations
+
+from typing import Dict, List
+
+from agent.graph import build_graph
+from agent.state import APPEND_FIELDS, AgentState, FastState, StepTiming, ToolResult, append_items, graph_input
+from agent.synth import synthesize_answer
+from bench.corpus import query_mix, synthetic_glossary, synthetic_kb
+from bench.harness import measure, measure_once
+from tools import build_default_registry
+from tools.implementations import make_search_web, summarize
+from tools.index import Hit, InvertedIndex, OverlapScorer, tokenize
+from tools.registry import ToolRegistry, ToolSpec
+
+Results = Dict[str, Dict[str, float]]
+
+
+def registry_for(engine) -> ToolRegistry:
+    """
+    Default tools, with search_web bound to the given engine.
+    """
+    default = build_default_registry()
+    reg = ToolRegistry()
+    search = default.get("search_web")
+    search_fn = make_search_web(engine)
+    reg.register(
+        ToolSpec(
+            search.name,
+            search.description,
+            search.schema,
+            search_fn,
+            search.cacheable,
+            batch_fn=search_fn.batch,
+            batch_arg=search.batch_arg,
+        )
+    )
+    reg.register(default.get("lookup_definition"))
+    reg.register(default.get("summarize"))
+    return reg
+
+
+def retrieval_suite(docs: List[dict], queries: List[str], overlap_max_docs: int, memory_max_docs: int = 100000) -> Results:
+    n = len(docs)
+    out: Results = {}
+
+    out[f"index_build@{n}"] = measure_once(lambda: InvertedIndex(docs), memory=n <= memory_max_docs)
+    index = InvertedIndex(docs)
+
+    search = make_search_web(index)
+    out[f"search_web.bm25@{n}"] = measure(lambda q: search(q, 3), queries)
+    out[f"search_web.bm25@{n}"]["precision_at_k"] = precision_at_k(docs, queries, [index.search(q, 3) for q in queries])
+
+    if n <= overlap_max_docs:
+        legacy = make_search_web(OverlapScorer(docs))
+        out[f"search_web.overlap@{n}"] = measure(lambda q: legacy(q, 3), queries[:50], memory_sample=5)
+
+    out.update(vector_suite(docs, queries))
+    return out
+
+
+def precision_at_k(docs: List[dict], queries: List[str], hits: List[List[Hit]]) -> float:
+    """
+    Mean fraction of returned docs that are relevant, where a synthetic doc is relevant
+    to a query when one of its tags appears among the query tokens.
+    """
+    fractions = []
+    for q, found in zip(queries, hits):
+        q_tokens = set(tokenize(q))
+        if found:
+            fractions.append(sum(1 for _, i in found if q_tokens & set(docs[i]["tags"])) / len(found))
+    return round(sum(fractions) / len(fractions), 4) if fractions else 0.0
+
+
+def vector_suite(docs: List[dict], queries: List[str], k: int = 3) -> Results:
+    """
+    Vectorized backends (skipped when numpy/scipy are missing): single-query latency,
+    one batched pass over all queries, and precision@k (compare with the bm25 entry).
+    """
+    try:
+        from tools.vector import HashedVectorIndex
+    except ImportError:
+        return {}
+    try:
+        HashedVectorIndex([])
+    except ImportError:
+        return {}
+
+    n = len(docs)
+    out: Results = {}
+    for name, kwargs in (("tfidf", {}), ("embed", {"dim": 256})):
+        out[f"index_build.{name}@{n}"] = measure_once(lambda: HashedVectorIndex(docs, **kwargs), memory=False)
+        engine = HashedVectorIndex(docs, **kwargs)
+        search = make_search_web(engine)
+        stats = measure(lambda q: search(q, k), queries)
+        stats["precision_at_k"] = precision_at_k(docs, queries, engine.search_batch(queries, k))
+        out[f"search_web.{name}@{n}"] = stats
+        out[f"search_batch.{name}@{n}"] = measure_once(lambda: engine.search_batch(queries, k), memory=False)
+    return out
+
+
+def synthesis_suite(docs: List[dict], queries: List[str]) -> Results:
+    search = make_search_web(InvertedIndex(docs))
+    outputs = [search(q, 3) for q in queries]
+    texts = [o.render() for o in outputs]
+    results = [
+        [
+            ToolResult(id="call_0001", name="lookup_definition", args={"term": "rag"}, output="Retrieval-Augmented Generation.", started_at_ms=0, finished_at_ms=0),
+            ToolResult(id="call_0002", name="search_web", args={"query": q, "k": 3}, output=o, started_at_ms=0, finished_at_ms=0),
+        ]
+        for q, o in zip(queries, outputs)
+    ]
+    return {
+        "summarize": measure(lambda text: summarize(text, 2), texts),
+        "summarize.query": measure(lambda i: summarize(texts[i], 2, query=queries[i]), list(range(len(queries)))),
+        "search_results.extract": measure(lambda i: outputs[i].extract(queries[i], 2), list(range(len(queries)))),
+        "synthesize_answer": measure(lambda i: synthesize_answer(queries[i], results[i]), list(range(len(queries)))),
+    }
+
+
+def graph_suite(docs: List[dict], queries: List[str]) -> Results:
+    n = len(docs)
+    graph = build_graph(registry_for(InvertedIndex(docs)))
+
+    def run(q: str) -> None:
+        graph.invoke(graph_input(AgentState(user_question=q)))
+
+    return {f"graph.invoke@{n}": measure(run, queries, memory_sample=20)}
+
+
+def state_suite(queries: List[str], history: int = 5000) -> Results:
+    """
+    Per-node framework overhead of the two state representations: full graph runs with
+    stub tools (constant output, no cache), so what is measured is LangGraph, node
+    wrappers and state handling rather than retrieval. per_node_us is the mean run time
+    divided by the nodes a question passes through. The `.log{history}` entries start
+    each question from a tool log that already holds `history` results (of a tool the
+    answer ignores), to show how the per-node cost grows with the log. Part of that growth
+    is the nodes reading the log (reflect, synthesis); `.handoff` entries time the state
+    hand-off alone (channel values to node state, plus applying an update that adds one
+    result), which in compact mode no longer depends on the log length.
+    """
+    default = build_default_registry()
+    stubs = ToolRegistry()
+    for name in ("search_web", "lookup_definition", "summarize"):
+        spec = default.get(name)
+        stubs.register(ToolSpec(spec.name, spec.description, spec.schema, lambda **kwargs: "stub output"))
+
+    past = [
+        ToolResult(id=f"past_{i}", name="noop", args={}, output="stub output", started_at_ms=0, finished_at_ms=0)
+        for i in range(history)
+    ]
+    steps = [StepTiming(iteration=0, call_ids=[r.id], started_at_ms=0, finished_at_ms=0) for r in past]
+
+    def start(q: str, log: bool) -> dict:
+        if not log:
+            return graph_input(AgentState(user_question=q))
+        return graph_input(
+            AgentState(user_question=q, tool_results=list(past), tool_log=[r.id for r in past], step_log=list(steps))
+        )
+
+    out: Results = {}
+    for mode, compact in (("pydantic", False), ("compact", True)):
+        graph = build_graph(stubs, max_concurrency=1, compact_state=compact)
+        nodes = sum(len(list(graph.stream(start(q, False), stream_mode="updates"))) for q in queries)
+        for suffix, log in (("", False), (f".log{history}", True)):
+            if log and not history:
+                continue
+            inputs = [start(q, log) for q in queries]
+            stats = measure(graph.invoke, inputs, memory_sample=20)
+            stats["per_node_us"] = round(stats["mean_ms"] * 1000.0 * len(queries) / nodes, 2)
+            out[f"graph_state.{mode}{suffix}"] = stats
+
+    added = ToolResult(id="added", name="noop", args={}, output="stub output", started_at_ms=0, finished_at_ms=0)
+    for suffix, log in (("", False), (f".log{history}", True)):
+        values = start("hand-off", log)
+        channels = {**values, **{name: append_items([], values[name]) for name in APPEND_FIELDS}}
+
+        def pydantic_handoff(_):
+            # LangGraph validates a pydantic state into a new AgentState for every node.
+            AgentState.model_validate(values).tool_results.append(added)
+
+        def compact_handoff(_):
+            state = FastState.from_channels(channels)
+            state.tool_results.append(added)
+            for name, update in state.updates(channels).items():
+                channels[name] = append_items(channels[name], update) if name in APPEND_FIELDS else update
+
+        for mode, fn in (("pydantic", pydantic_handoff), ("compact", compact_handoff)):
+            stats = measure(fn, range(500), memory_sample=0)
+            stats["handoff_us"] = round(stats["mean_ms"] * 1000.0, 2)
+            out[f"graph_state.{mode}.handoff{suffix}"] = stats
+    return out
+
+
+def shard_suite(docs: List[dict], queries: List[str], shard_counts: List[int], k: int = 3) -> Results:
+    """
+    Sharded BM25 (tools.shard) per shard count: build time, query latency, and whether
+    every query returned exactly the unsharded index's hits (identical = 1.0).
+    """
+    from tools.shard import ShardedIndex
+
+    n = len(docs)
+    expected = [InvertedIndex(docs).search(q, k) for q in queries]
+    out: Results = {}
+    for shards in shard_counts:
+        out[f"shard_build.x{shards}@{n}"] = measure_once(lambda: ShardedIndex(docs, shards).close(), memory=False)
+        index = ShardedIndex(docs, shards)
+        try:
+            stats = measure(lambda q: index.search(q, k), queries, memory_sample=0)
+            stats["identical"] = float(all(index.search(q, k) == hits for q, hits in zip(queries, expected)))
+        finally:
+            index.close()
+        out[f"shard_search.x{shards}@{n}"] = stats
+    return out
+
+
+def batch_suite(docs: List[dict], queries: List[str], batch_size: int = 8, k: int = 3, threads: int = 8) -> Results:
+    """
+    search_web over groups of `batch_size` queries: one call per query vs one
+    search_web_batch pass (identical = 1.0 when every output matches). Then the
+    registry's single-flight coalescing: `threads` threads run the queries, each one
+    `threads` times in a row, through a cacheless registry; reports the coalesce ratio.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    n = len(docs)
+    search = make_search_web(InvertedIndex(docs))
+    groups = [queries[i : i + batch_size] for i in range(0, len(queries), batch_size)]
+    out: Results = {}
+    out[f"search_web.loop.x{batch_size}@{n}"] = measure(lambda g: [search(q, k) for q in g], groups, memory_sample=0)
+    stats = measure(lambda g: search.batch(g, k), groups, memory_sample=0)
+    stats["identical"] = float(all(search.batch(g, k) == [search(q, k) for q in g] for g in groups))
+    out[f"search_web.batch.x{batch_size}@{n}"] = stats
+
+    reg = registry_for(InvertedIndex(docs))
+    calls = [q for q in queries for _ in range(threads)]
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        stats = measure_once(lambda: list(pool.map(lambda q: reg.invoke("search_web", {"query": q}), calls)), memory=False)
+    stats["coalesce_ratio"] = reg.stats.coalesce_ratio
+    out[f"search_web.coalesce.t{threads}@{n}"] = stats
+    return out
+
+
+def glossary_suite(n_terms: int, n_queries: int, seed: int = 0) -> Results:
+    """
+    tools.glossary at n_terms entries: load time, exact/alias/prefix/fuzzy lookup latency,
+    and the structure's size (memory_bytes, from Glossary.stats).
+    """
+    import random
+
+    from tools.glossary import Glossary
+
+    entries = synthetic_glossary(n_terms, seed=seed)
+    out: Results = {f"glossary_build@{n_terms}": measure_once(lambda: Glossary(entries), memory=False)}
+    glossary = Glossary(entries)
+    out[f"glossary_build@{n_terms}"].update(glossary.stats())
+
+    rng = random.Random(seed)
+    sample = rng.sample(entries, min(n_queries, len(entries)))
+
+    def typo(term: str) -> str:
+        i = rng.randrange(len(term))
+        return term[:i] + term[i + 1 :]
+
+    cases = {
+        "exact": (glossary.lookup, [term for term, _, _ in sample]),
+        "alias": (glossary.lookup, [aliases[0] for _, _, aliases in sample]),
+        "prefix": (lambda t: glossary.prefix(t[:4]), [term for term, _, _ in sample]),
+        "fuzzy1": (lambda t: glossary.fuzzy(t, max_edits=1), [typo(term) for term, _, _ in sample]),
+        "fuzzy2": (lambda t: glossary.fuzzy(t, max_edits=2), [typo(typo(term)) for term, _, _ in sample]),
+    }
+    for name, (fn, queries) in cases.items():
+        out[f"glossary.{name}@{n_terms}"] = measure(fn, queries, memory_sample=0)
+    return out
+
+
+def ingest_suite(docs: List[dict], queries: List[str], batches: int, batch_size: int = 10, k: int = 3) -> Results:
+    """
+    A tools.ingest KB directory over `docs` taking `batches` puts of `batch_size` updated
+    documents: put latency (log append + new snapshot), query latency with the delta
+    segments and after compaction, compaction time, and whether every query returned
+    exactly the hits of an index rebuilt from scratch (identical = 1.0).
+    """
+    import random
+    import shutil
+    import tempfile
+
+    from tools.ingest import LiveKB
+
+    n = len(docs)
+    rng = random.Random(0)
+    workdir = tempfile.mkdtemp(prefix="rakb-ingest-")
+    try:
+        live = LiveKB.create(workdir, docs, poll_interval_s=None, compact_interval_s=None, max_segments=batches)
+        current = {doc["id"]: doc for doc in docs}
+        updates = []
+        for b in range(batches):
+            batch = [dict(doc, text=doc["text"] + f" revision {b}") for doc in rng.sample(docs, batch_size)]
+            updates.append(batch)
+            for doc in batch:
+                current.pop(doc["id"])
+                current[doc["id"]] = doc
+        out: Results = {f"ingest_put.b{batch_size}@{n}": measure(live.put, updates, warmup=0, memory_sample=0)}
+
+        rebuilt = InvertedIndex(list(current.values()))
+        expected = [[(score, rebuilt.doc(i)["id"]) for score, i in rebuilt.search(q, k)] for q in queries]
+
+        def identical(snapshot) -> float:
+            return float(
+                all(
+                    [(score, snapshot.doc(i)["id"]) for score, i in snapshot.search(q, k)] == hits
+                    for q, hits in zip(queries, expected)
+                )
+            )
+
+        stats = measure(lambda q: live.snapshot.search(q, k), queries, memory_sample=0)
+        stats["identical"] = identical(live.snapshot)
+        out[f"ingest_search.segments{len(live.snapshot.segments)}@{n}"] = stats
+        out[f"ingest_compact@{n}"] = measure_once(live.compact, memory=False)
+        stats = measure(lambda q: live.snapshot.search(q, k), queries, memory_sample=0)
+        stats["identical"] = identical(live.snapshot)
+        out[f"ingest_search.compacted@{n}"] = stats
+        live.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return out
+
+
+def startup_suite(runs: int) -> Results:
+    """
+    Whole-process cold start, `runs` fresh interpreters per command: importing main.py,
+    and `main.py --startup-report` (imports, graph compile, index load and one question).
+    Wall time includes interpreter startup, which the in-process report cannot see.
+    """
+    import os
+    import subprocess
+    import sys
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    commands = {
+        "startup.import_main": [sys.executable, "-c", "import main"],
+        "startup.first_question": [sys.executable, "main.py", "--startup-report"],
+    }
+
+    def run(cmd: List[str]) -> None:
+        subprocess.run(cmd, cwd=root, check=True, stdout=subprocess.DEVNULL)
+
+    return {name: measure(run, [cmd] * runs, warmup=1, memory_sample=0) for name, cmd in commands.items()}
+
+
+def run_all(
+    scales: List[int],
+    n_queries: int,
+    overlap_max_docs: int,
+    seed: int = 0,
+    shard_counts: List[int] = (),
+    glossary_terms: int = 0,
+    ingest_batches: int = 0,
+    startup_runs: int = 0,
+) -> Results:
+    queries = query_mix(n_queries, seed=seed)
+    results: Results = {}
+    for n in scales:
+        docs = synthetic_kb(n, seed=seed)
+        results.update(retrieval_suite(docs, queries, overlap_max_docs))
+        results.update(graph_suite(docs, queries))
+        results.update(batch_suite(docs, queries))
+        if shard_counts:
+            results.update(shard_suite(docs, queries, shard_counts))
+        if ingest_batches:
+            results.update(ingest_suite(docs, queries, ingest_batches))
+    results.update(synthesis_suite(synthetic_kb(min(scales), seed=seed), queries))
+    results.update(state_suite(queries))
+    if glossary_terms:
+        results.update(glossary_suite(glossary_terms, n_queries, seed=seed))
+    if startup_runs:
+        results.update(startup_suite(startup_runs))
+    return results
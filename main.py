@@ -1,11 +1,29 @@
 from __future__ import annotations
 
+import sys
+import time
+
+# Startup clock for --startup-report; taken before the imports below on purpose.
+_STARTED = time.perf_counter()
+_MODULES_AT_START = len(sys.modules)
+
 import argparse
 import json
+import uuid
+from contextlib import ExitStack
 from dotenv import load_dotenv
 
-from agent.graph import build_graph
-from agent.state import AgentState
+from agent.answer_cache import AnswerCache, answer_cache_namespace, answer_cache_version, invoke_cached
+from agent.batch import BatchConfig, print_summary, read_questions, run_batch
+from agent.graph import DEFAULT_MAX_CONCURRENCY, build_graph
+from agent.profile import Profiler, ProfileReport, clear_profiles, profiled
+from agent.server import serve
+from agent.state import AgentState, tool_log_entries
+from agent.trace import Tracer, now_ms, span
+from tools import build_default_registry
+from tools.cache import CacheStats, ToolCache
+from tools.implementations import SEARCH_BACKENDS
+from tools.registry import CallStats
 
 
 def _print_plan(plan: list[str]) -> None:
@@ -15,7 +33,13 @@ def _print_plan(plan: list[str]) -> None:
     print("============\n")
 
 
-def _print_tool_log(tool_log: list[dict], full: bool = False) -> None:
+def _print_tool_log(
+    tool_log: list[dict],
+    full: bool = False,
+    step_log: list[dict] | None = None,
+    cache_stats: CacheStats | None = None,
+    call_stats: CallStats | None = None,
+) -> None:
     print("\n=== TOOL USAGE LOG ===")
     for r in tool_log:
         print(f"- {r['name']}  id={r['id']}")
@@ -27,18 +51,313 @@ def _print_tool_log(tool_log: list[dict], full: bool = False) -> None:
         dur = r.get("duration_ms")
         if dur is not None:
             print(f"  duration_ms: {dur}")
+        if r.get("status", "ok") != "ok":
+            print(f"  status: {r['status']}")
+        hit = r.get("cache_hit")
+        if hit is not None:
+            print(f"  cache: {'hit' if hit else 'miss'}")
+    for i, step in enumerate(step_log or [], 1):
+        ids = ", ".join(step["call_ids"])
+        print(f"- step {i} (iteration {step['iteration']}): {ids}")
+        print(f"  step_duration_ms: {step['duration_ms']}")
+    cached = [r for r in tool_log if r.get("cache_hit") is not None]
+    if cached:
+        hits = sum(1 for r in cached if r["cache_hit"])
+        line = f"- cache: {hits} hit(s), {len(cached) - hits} miss(es)"
+        if cache_stats is not None:
+            line += f"; session hit rate {cache_stats.hit_rate:.0%} ({cache_stats.hits}/{cache_stats.hits + cache_stats.misses})"
+        print(line)
+    if call_stats is not None and (call_stats.batches or call_stats.coalesced):
+        print(
+            f"- batched: {call_stats.batches} batch(es), mean size {call_stats.mean_batch_size:.1f}; "
+            f"coalesced {call_stats.coalesced}/{call_stats.executions} call(s) this session"
+        )
     print("======================\n")
 
 
+def _print_event(event: dict) -> None:
+    kind = event["type"]
+    if kind == "plan":
+        _print_plan(event["plan"])
+    elif kind == "follow_up":
+        print("[reflect] not enough evidence yet; running a follow-up search", flush=True)
+    elif kind == "speculation":
+        verdict = "used" if event["used"] else "dropped"
+        print(f"[reflect] speculative follow-up search id={event['call_id']} {verdict}", flush=True)
+    elif kind == "tool_result":
+        r = event["result"]
+        cache = {True: ", cache hit", False: ", cache miss"}.get(r.cache_hit, "")
+        print(f"[tool] {r.name}  id={r.id}  {r.status}, {r.duration_ms} ms{cache}", flush=True)
+    elif kind == "section":
+        print("\n" + event["text"], flush=True)
+
+
+def _write_trace(tracer: Tracer, path: str) -> None:
+    if path.endswith(".jsonl"):
+        tracer.write_jsonl(path)
+        tracer.clear()
+    else:
+        tracer.write_chrome(path)
+
+
+def _batch_config(args: argparse.Namespace) -> BatchConfig:
+    return BatchConfig(
+        max_iterations=args.max_iterations,
+        search_backend=args.search_backend,
+        max_concurrency=args.max_concurrency,
+        cache_size=args.cache_size,
+        cache_ttl=args.cache_ttl,
+        kb_path=args.kb_path,
+        kb_dir=args.kb_dir,
+        index_dir=args.index_dir,
+        search_shards=args.search_shards,
+        speculative=args.speculative,
+        compact_state=args.compact_state,
+        glossary_path=args.glossary,
+        trace_prefix=args.trace,
+        profile_dir=args.profile,
+        audit_prefix=args.audit_log,
+        audit_max_mb=args.audit_max_mb,
+        audit_keep=args.audit_keep,
+        audit_compress=args.audit_gzip,
+        answer_cache_path=args.answer_cache,
+        answer_cache_mb=args.answer_cache_mb,
+        tool_timeout_s=args.tool_timeout,
+        time_budget_ms=args.time_budget_ms,
+    )
+
+
+def _run_batch_mode(args: argparse.Namespace) -> None:
+    config = _batch_config(args)
+    src = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    if args.profile:
+        clear_profiles(args.profile)
+    try:
+        summary = run_batch(read_questions(src), dst, config, workers=args.workers)
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+    print_summary(summary)
+    if args.profile:
+        ProfileReport.load(args.profile).print(sys.stderr)
+
+
 def main() -> None:
+    main_started, main_modules = time.perf_counter(), len(sys.modules)
     load_dotenv()
 
     parser = argparse.ArgumentParser(description="Offline Tool-Using Research Assistant (LangGraph).")
     parser.add_argument("--full-log", action="store_true", help="Print full tool outputs.")
     parser.add_argument("--max-iterations", type=int, default=2, help="Max agent loop iterations (default 2).")
+    parser.add_argument(
+        "--search-backend",
+        choices=sorted(SEARCH_BACKENDS),
+        default="bm25",
+        help="search_web scorer: bm25 inverted index (default), the legacy token-overlap scan, "
+        "or vectorized tfidf/embed (need numpy + scipy).",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=DEFAULT_MAX_CONCURRENCY,
+        help=f"Max tool calls run concurrently per step (default {DEFAULT_MAX_CONCURRENCY}; 1 = sequential).",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        help="Max cached tool outputs (LRU; default 256; 0 disables the tool cache).",
+    )
+    parser.add_argument("--cache-ttl", type=float, default=600.0, help="Tool cache entry TTL in seconds (default 600).")
+    parser.add_argument(
+        "--kb-path",
+        default=None,
+        help="Search a compiled KB file (python -m tools.kbfile build ...) instead of tools/kb.py.",
+    )
+    parser.add_argument(
+        "--kb-dir",
+        default=None,
+        help="Search a KB directory (python -m tools.ingest init ...) and follow its updates live.",
+    )
+    parser.add_argument(
+        "--index-dir",
+        default=None,
+        help="Keep the bm25 index of tools/kb.py prebuilt in this directory: built on first use, "
+        "memory-mapped by later runs instead of re-indexing.",
+    )
+    parser.add_argument(
+        "--search-shards",
+        type=int,
+        default=1,
+        help="Split the bm25 index into N shards searched by N worker processes (default 1 = in-process).",
+    )
+    parser.add_argument(
+        "--glossary",
+        default=None,
+        help="Look definitions up in a JSONL glossary (term, definition, aliases per line) "
+        "instead of the built-in DEFINITIONS.",
+    )
+    parser.add_argument(
+        "--speculative",
+        action="store_true",
+        help="Run the targeted follow-up search together with the first search; reflection keeps it "
+        "only when the first search finds nothing.",
+    )
+    parser.add_argument(
+        "--compact-state",
+        action="store_true",
+        help="Keep graph state in LangGraph channels with append reducers instead of a pydantic AgentState "
+        "validated and copied for every node (lower per-node overhead).",
+    )
+    parser.add_argument(
+        "--tool-timeout",
+        type=float,
+        default=None,
+        help="Seconds any single tool call may take before it is recorded as timed out (default: no limit).",
+    )
+    parser.add_argument(
+        "--time-budget-ms",
+        type=int,
+        default=None,
+        help="Per-question latency budget; tool calls are cut off at it and follow-up searches skipped "
+        "when they can't fit (default: no budget).",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        default=None,
+        help="Answer questions from FILE ('-' for stdin; one per line or JSONL with a 'question' field) and exit.",
+    )
+    parser.add_argument("--workers", type=int, default=None, help="Batch worker processes (default: CPU count) or service worker threads (default 4).")
+    parser.add_argument("--output", default="-", help="Batch JSONL output path (default: stdout).")
+    parser.add_argument(
+        "--trace",
+        metavar="PATH",
+        default=None,
+        help="Record per-node/tool spans: PATH.jsonl appends JSONL spans, any other PATH is rewritten as a "
+        "Chrome trace after each question. In batch mode each worker appends to PATH.w<N>.jsonl.",
+    )
+    parser.add_argument(
+        "--audit-log",
+        metavar="PREFIX",
+        default=None,
+        help="Stream every tool result to rotating JSONL segments PREFIX.NNNNN.jsonl and keep long outputs there "
+        "instead of in memory (read back when printed). In batch mode each worker writes PREFIX.w<N>.NNNNN.jsonl.",
+    )
+    parser.add_argument("--audit-max-mb", type=float, default=64.0, help="Start a new audit segment past this size (default 64).")
+    parser.add_argument("--audit-keep", type=int, default=8, help="Audit segments to retain; 0 keeps all (default 8).")
+    parser.add_argument("--audit-gzip", action="store_true", help="Gzip-compress finished audit segments.")
+    parser.add_argument(
+        "--profile",
+        metavar="DIR",
+        default=None,
+        help="Profile CPU (cProfile) and allocations (tracemalloc) per graph node and tool: print the hottest "
+        "functions and allocation sites after each question (batch mode: once, aggregated over all workers) and "
+        "save raw .prof files to DIR.",
+    )
+    parser.add_argument(
+        "--answer-cache",
+        metavar="PATH",
+        default=None,
+        help="Persistent SQLite cache of whole answers, keyed on the normalized question (shared with batch workers).",
+    )
+    parser.add_argument("--answer-cache-mb", type=float, default=64.0, help="Answer cache size limit in MB (default 64).")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print the plan, each tool result and each answer section as soon as they are ready.",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a local HTTP/JSON service (POST /ask, GET /metrics) instead of the REPL.",
+    )
+    parser.add_argument(
+        "--startup-report",
+        action="store_true",
+        help="Time each startup phase (imports, registry, graph, index and glossary load, first question) and exit.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Service bind address (default 127.0.0.1).")
+    parser.add_argument("--port", type=int, default=8765, help="Service port (default 8765).")
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        default=64,
+        help="Service requests allowed to wait for a worker; beyond this they get 503 (default 64).",
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=float,
+        default=30.0,
+        help="Seconds a service request may wait for its answer before 504 (default 30).",
+    )
     args = parser.parse_args()
+    if args.profile and args.serve:
+        parser.error("--profile is not supported with --serve")
+    if args.index_dir and (args.kb_path or args.kb_dir or args.search_shards > 1 or args.search_backend != "bm25"):
+        parser.error("--index-dir only works with the bm25 backend over the in-module KB")
+
+    if args.startup_report:
+        from agent.startup import measure_startup
 
-    graph = build_graph()
+        main_imports_ms = (main_started - _STARTED) * 1000.0
+        measure_startup(_batch_config(args), main_imports_ms, main_modules - _MODULES_AT_START).print()
+        return
+    if args.batch is not None:
+        _run_batch_mode(args)
+        return
+    if args.serve:
+        serve(
+            _batch_config(args),
+            host=args.host,
+            port=args.port,
+            workers=args.workers or 4,
+            queue_size=args.queue_size,
+            request_timeout_s=args.request_timeout,
+        )
+        return
+
+    cache = ToolCache(max_entries=args.cache_size, ttl_s=args.cache_ttl) if args.cache_size > 0 else None
+    registry = build_default_registry(
+        search_backend=args.search_backend,
+        cache=cache,
+        kb_path=args.kb_path,
+        tool_timeout_s=args.tool_timeout,
+        search_shards=args.search_shards,
+        glossary_path=args.glossary,
+        kb_dir=args.kb_dir,
+        index_dir=args.index_dir,
+    )
+    audit = _batch_config(args).audit_log()
+    graph = build_graph(
+        registry,
+        max_concurrency=args.max_concurrency,
+        speculative=args.speculative,
+        audit=audit,
+        compact_state=args.compact_state,
+    )
+    answer_cache = None
+    if args.answer_cache:
+        answer_cache = AnswerCache(
+            args.answer_cache,
+            max_bytes=int(args.answer_cache_mb * 1024 * 1024),
+            namespace=answer_cache_namespace(
+                args.search_backend,
+                args.kb_path,
+                args.glossary,
+                args.kb_dir,
+                index_dir=args.index_dir,
+                speculative=args.speculative,
+            ),
+            version_fn=answer_cache_version(registry, args.glossary),
+        )
+
+    tracer = Tracer() if args.trace else None
+    if args.profile:
+        clear_profiles(args.profile)
 
     print("Offline Tool-Using Research Assistant (LangGraph). Type 'exit' to quit.\n")
 
@@ -49,14 +368,47 @@ def main() -> None:
         if q.lower() in {"exit", "quit"}:
             break
 
-        state = AgentState(user_question=q, max_iterations=args.max_iterations)
-        out = graph.invoke(state.model_dump())
+        state = AgentState(
+            user_question=q,
+            max_iterations=args.max_iterations,
+            question_id=uuid.uuid4().hex[:12],
+            deadline_ms=now_ms() + args.time_budget_ms if args.time_budget_ms is not None else None,
+        )
+        on_event = _print_event if args.stream else None
+        profiler = Profiler() if args.profile else None
+        with ExitStack() as stack:
+            if tracer is not None:
+                stack.enter_context(tracer.activate())
+            if profiler is not None:
+                stack.enter_context(profiler.activate())
+            with span("question", "run", question_id=state.question_id), profiled("question"):
+                out = invoke_cached(graph, state, answer_cache, on_event)
+        if tracer is not None:
+            _write_trace(tracer, args.trace)
+
+        if out.get("cached"):
+            _print_plan(out["plan"])
+            print("(cached answer)\n")
+            print(out["final"].answer)
+        elif not args.stream:
+            _print_plan(out["plan"])
+            print(out["final"].answer)
+        # tool_log holds call ids; resolve them to ToolResults and render each for printing
+        tool_log = [tr.log_entry() for tr in tool_log_entries(out)]
+        step_log = [st.model_dump() for st in out["step_log"]]
+        _print_tool_log(
+            tool_log,
+            full=args.full_log,
+            step_log=step_log,
+            cache_stats=cache.stats if cache else None,
+            call_stats=registry.stats,
+        )
+        if profiler is not None:
+            profiler.summary().print()
+            profiler.dump(args.profile, state.question_id)
 
-        _print_plan(out["plan"])
-        print(out["final"].answer)
-       # tool_log is a list of ToolResult objects; convert each to dict for printing
-        tool_log = [tr.model_dump() for tr in out["tool_log"]]
-        _print_tool_log(tool_log, full=args.full_log)
+    if audit is not None:
+        audit.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
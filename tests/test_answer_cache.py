@@ -0,0 +1,91 @@
+"""
+Answer cache: what the key covers, namespaces, and replay of cached answers.
+"""
+from __future__ import annotations
+
+import pytest
+
+from agent.answer_cache import AnswerCache, answer_cache_namespace, answer_cache_version, invoke_cached
+from agent.graph import build_graph
+from agent.state import AgentState
+from tools import build_default_registry, implementations
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnswerCache(str(tmp_path / "answers.sqlite"))
+
+
+def test_key_ignores_case_and_whitespace(cache):
+    assert cache.key("What is  LangGraph?", 2) == cache.key("what is langgraph?", 2)
+    assert cache.key("what is langgraph?", 2) != cache.key("what is langgraph?", 3)
+
+
+@pytest.mark.parametrize(
+    "a, b",
+    [
+        ('define "foo bar"', "define foo bar"),  # one quoted term vs two words
+        ("tl;dr langgraph", "tl dr langgraph"),  # summary trigger vs plain words
+    ],
+)
+def test_key_separates_questions_the_planner_treats_differently(cache, a, b):
+    assert cache.key(a, 2) != cache.key(b, 2)
+
+
+def test_version_covers_definitions_and_glossary_file(tmp_path, monkeypatch):
+    registry = build_default_registry()
+    version = answer_cache_version(registry)
+    before = version()
+    monkeypatch.setitem(implementations.DEFINITIONS, "new term", "a definition")
+    assert version() != before
+
+    glossary = tmp_path / "glossary.jsonl"
+    glossary.write_text('{"term": "a", "definition": "first"}\n')
+    file_version = answer_cache_version(registry, str(glossary))
+    first = file_version()
+    glossary.write_text('{"term": "a", "definition": "second one"}\n')
+    assert file_version() != first
+
+
+def test_namespace_covers_every_output_changing_option():
+    base = answer_cache_namespace("bm25", None)
+    variants = [
+        answer_cache_namespace("overlap", None),
+        answer_cache_namespace("bm25", "kb.rakb"),
+        answer_cache_namespace("bm25", None, glossary_path="g.jsonl"),
+        answer_cache_namespace("bm25", None, kb_dir="kbdir"),
+        answer_cache_namespace("bm25", None, index_dir=".rakb-cache"),
+        answer_cache_namespace("bm25", None, speculative=True),
+    ]
+    assert len({base, *variants}) == len(variants) + 1
+
+
+def test_namespaces_share_a_file_without_sharing_answers(tmp_path):
+    path = str(tmp_path / "answers.sqlite")
+    plain = AnswerCache(path, namespace=answer_cache_namespace("bm25", None))
+    speculative = AnswerCache(path, namespace=answer_cache_namespace("bm25", None, speculative=True))
+    graph = build_graph(build_default_registry())
+
+    state = AgentState(user_question="What is LangGraph?", max_iterations=2)
+    invoke_cached(graph, state, plain)
+    assert plain.get(state.user_question, 2) is not None
+    assert speculative.get(state.user_question, 2) is None
+
+
+def test_replayed_answers_get_fresh_call_ids(cache):
+    graph = build_graph(build_default_registry())
+    first = invoke_cached(graph, AgentState(user_question="What is LangGraph?", question_id="q1"), cache)
+    replay = invoke_cached(graph, AgentState(user_question="what is langgraph?", question_id="q2"), cache)
+
+    assert replay["cached"] and replay["question_id"] == "q2"
+    old_ids = {r.id for r in first["tool_results"]}
+    new_ids = [r.id for r in replay["tool_results"]]
+    assert not old_ids & set(new_ids)
+    assert replay["tool_log"] == new_ids
+    assert {c.call_id for c in replay["final"].citations} <= set(new_ids)
+    for call_id in new_ids:
+        assert f"#{call_id}]" in replay["final"].answer
+    for call_id in old_ids:
+        assert f"#{call_id}]" not in replay["final"].answer
+    # The stored answer keeps its own ids for the next replay.
+    assert {r.id for r in cache.get("What is LangGraph?", 2)["tool_results"]} == old_ids
@@ -0,0 +1,124 @@
+"""
+ToolCache (LRU + TTL) and the registry's caching and single-flight coalescing.
+"""
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tools.cache import ToolCache
+from tools.registry import ToolRegistry, ToolSpec
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ToolCache(max_entries=2, ttl_s=None)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == (True, 1)  # "b" is now least recently used
+    cache.put("c", 3)
+    assert cache.get("b") == (False, None)
+    assert cache.get("a") == (True, 1)
+    assert cache.get("c") == (True, 3)
+    assert cache.stats.evictions == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = ToolCache(max_entries=8, ttl_s=10.0, clock=clock)
+    cache.put("a", 1)
+    clock.now = 10.0
+    assert cache.get("a") == (True, 1)
+    clock.now = 10.5
+    assert cache.get("a") == (False, None)
+    assert cache.stats.expirations == 1
+    assert len(cache) == 0
+
+
+def test_max_entries_must_be_positive():
+    with pytest.raises(ValueError):
+        ToolCache(max_entries=0)
+
+
+def _registry(fn, cache=None, version=None, coalesce=True):
+    reg = ToolRegistry(cache=cache, version_fn=version, coalesce=coalesce)
+    reg.register(ToolSpec("echo", "", {}, fn, cacheable=True))
+    return reg
+
+
+def test_registry_caches_by_canonical_args_and_version():
+    calls = []
+    version = ["v1"]
+
+    def echo(text: str, n: int = 1) -> str:
+        calls.append(text)
+        return text * n
+
+    reg = _registry(echo, cache=ToolCache(ttl_s=None), version=lambda: version[0])
+    assert reg.invoke("echo", {"text": "x"}) == ("x", False)
+    assert reg.invoke("echo", {"n": 1, "text": "x"}) == ("x", True)
+    version[0] = "v2"
+    assert reg.invoke("echo", {"text": "x"}) == ("x", False)
+    assert calls == ["x", "x"]
+
+
+def test_identical_concurrent_calls_run_once():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def slow(text: str) -> str:
+        calls.append(text)
+        started.set()
+        release.wait(5)
+        return text.upper()
+
+    reg = _registry(slow)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        leader = pool.submit(reg.invoke, "echo", {"text": "a"})
+        assert started.wait(5)
+        followers = [pool.submit(reg.invoke, "echo", {"text": "a"}) for _ in range(3)]
+        other = pool.submit(reg.invoke, "echo", {"text": "b"})
+        while reg.stats.coalesced < 3:
+            threading.Event().wait(0.01)
+        release.set()
+        results = [f.result(5) for f in [leader, *followers]]
+        other.result(5)
+
+    assert results == [("A", None)] * 4
+    assert sorted(calls) == ["a", "b"]
+    assert reg.stats.executions == 5 and reg.stats.coalesced == 3
+
+
+def test_coalesced_callers_see_the_leaders_error():
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing(text: str) -> str:
+        started.set()
+        release.wait(5)
+        raise RuntimeError("boom")
+
+    reg = _registry(failing)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(reg.invoke, "echo", {"text": "a"})
+        assert started.wait(5)
+        follower = pool.submit(reg.invoke, "echo", {"text": "a"})
+        while reg.stats.coalesced < 1:
+            threading.Event().wait(0.01)
+        release.set()
+        for fut in (leader, follower):
+            with pytest.raises(RuntimeError):
+                fut.result(5)
+    # Nothing is left in flight: the next call runs again.
+    with pytest.raises(RuntimeError):
+        reg.invoke("echo", {"text": "a"})
@@ -0,0 +1,105 @@
+"""
+Search engines: BM25 against the original overlap scorer, and identical scores from
+every BM25 engine (in-memory index, KB file, shards, KB directory snapshots).
+"""
+from __future__ import annotations
+
+import pytest
+
+from bench.corpus import query_mix, synthetic_kb
+from tools.index import InvertedIndex, OverlapScorer
+from tools.ingest import LiveKB
+from tools.kb import KB
+from tools.kbfile import KBFile, build_kb_file
+from tools.shard import ShardedIndex
+
+QUERIES = query_mix(40) + ["what is langgraph", "citations tool calls", "agent loop reflection", "zzz unknown"]
+
+
+@pytest.fixture(scope="module")
+def docs():
+    return synthetic_kb(300)
+
+
+@pytest.fixture(scope="module")
+def reference(docs):
+    return InvertedIndex(docs)
+
+
+def _matches(engine, query, n):
+    return {i for _, i in engine.search(query, n)}
+
+
+def test_bm25_matches_the_same_documents_as_overlap(docs):
+    for corpus in (KB, docs):
+        bm25, overlap = InvertedIndex(corpus), OverlapScorer(corpus)
+        for q in QUERIES:
+            assert _matches(bm25, q, len(corpus)) == _matches(overlap, q, len(corpus)), q
+
+
+@pytest.mark.parametrize(
+    "query, top",
+    [
+        ("what is langgraph", "kb:langgraph:overview"),
+        ("citations tool calls", "kb:citations:practice"),
+        ("agent loop reflection", "kb:agent-loop:reflect"),
+    ],
+)
+def test_bm25_and_overlap_agree_on_the_top_document(query, top):
+    for engine in (InvertedIndex(KB), OverlapScorer(KB)):
+        score, i = engine.search(query, 1)[0]
+        assert engine.doc(i)["id"] == top
+
+
+def test_kb_file_scores_match_inverted_index(docs, reference, tmp_path):
+    path = str(tmp_path / "kb.rakb")
+    build_kb_file(docs, path)
+    kb_file = KBFile(path)
+    try:
+        for q in QUERIES:
+            assert kb_file.search(q, 5) == reference.search(q, 5), q
+        assert kb_file.search_batch(QUERIES, 5) == reference.search_batch(QUERIES, 5)
+    finally:
+        kb_file.close()
+
+
+@pytest.mark.parametrize("from_file", [False, True])
+def test_sharded_index_scores_match_inverted_index(docs, reference, tmp_path, from_file):
+    source = docs
+    if from_file:
+        build_kb_file(docs, str(tmp_path / "kb.rakb"))
+        source = KBFile(str(tmp_path / "kb.rakb"))
+    index = ShardedIndex(source, n_shards=3, workers=2)
+    try:
+        for q in QUERIES:
+            assert index.search(q, 5) == reference.search(q, 5), q
+        assert index.search_batch(QUERIES, 5) == reference.search_batch(QUERIES, 5)
+    finally:
+        index.close()
+
+
+def test_ingest_snapshots_score_like_a_rebuilt_index(docs, tmp_path):
+    live = LiveKB.create(str(tmp_path / "kbdir"), docs, poll_interval_s=None, compact_interval_s=None, max_segments=8)
+    try:
+        current = {doc["id"]: doc for doc in docs}
+        for b in range(3):
+            batch = [dict(doc, text=doc["text"] + f" revision {b}") for doc in docs[b * 7 : b * 7 + 10]]
+            live.put(batch)
+            for doc in batch:
+                current.pop(doc["id"])
+                current[doc["id"]] = doc
+        live.delete([docs[-1]["id"]])
+        current.pop(docs[-1]["id"])
+
+        rebuilt = InvertedIndex(list(current.values()))
+
+        def hits(engine, q):
+            return [(score, engine.doc(i)["id"]) for score, i in engine.search(q, 5)]
+
+        for q in QUERIES:
+            assert hits(live.snapshot, q) == hits(rebuilt, q), q
+        live.compact()
+        for q in QUERIES:
+            assert hits(live.snapshot, q) == hits(rebuilt, q), q
+    finally:
+        live.close()
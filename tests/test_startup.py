@@ -0,0 +1,35 @@
+"""
+Cold-start budget: `import main` in a fresh interpreter stays cheap because LangGraph,
+langchain_core and the search indexes load on first use (agent.graph, tools).
+"""
+from __future__ import annotations
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# p50 wall time of `python -c "import main"`, interpreter startup included. Override
+# with STARTUP_BUDGET_MS on slow machines.
+STARTUP_BUDGET_MS = float(os.environ.get("STARTUP_BUDGET_MS", "1000"))
+
+
+def _import_main_ms() -> float:
+    t0 = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import main"], cwd=ROOT, check=True, stdout=subprocess.DEVNULL)
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def test_import_main_within_budget():
+    _import_main_ms()  # warm the OS file cache and __pycache__
+    p50 = statistics.median(_import_main_ms() for _ in range(3))
+    assert p50 <= STARTUP_BUDGET_MS, f"import main took {p50:.0f} ms (budget {STARTUP_BUDGET_MS:.0f} ms)"
+
+
+def test_import_main_defers_graph_runtime():
+    code = "import sys, main; print(sorted(m for m in ('langgraph', 'langchain_core', 'bench') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+    assert out.stdout.strip() == "[]"
@@ -1,11 +1,100 @@
 from __future__ import annotations
 
+import os
+from typing import Optional
+
+from tools.cache import ToolCache
 from tools.registry import ToolRegistry, ToolSpec
-from tools.implementations import search_web, lookup_definition, summarize
+from tools.implementations import (
+    SEARCH_BACKENDS,
+    lazy,
+    lookup_definition,
+    make_live_search_web,
+    make_lookup_definition,
+    make_search_web,
+    prebuilt_search_web,
+    sharded_search_web,
+    summarize,
+)
+from tools.kb import kb_digest
+
+
+def build_default_registry(
+    search_backend: str = "bm25",
+    cache: Optional[ToolCache] = None,
+    kb_path: Optional[str] = None,
+    tool_timeout_s: Optional[float] = None,
+    search_shards: int = 1,
+    glossary_path: Optional[str] = None,
+    kb_dir: Optional[str] = None,
+    index_dir: Optional[str] = None,
+) -> ToolRegistry:
+    """
+    search_backend selects the search_web scorer: "bm25" (inverted index, default),
+    "overlap" (the original token-overlap scan, for comparison), "tfidf" (hashed n-gram
+    TF-IDF scored with sparse matrix products) or "embed" (dense hashed embeddings);
+    the last two need numpy and scipy.
+    cache enables memoization of search_web and lookup_definition, keyed on the KB version.
+    kb_path points search_web at a compiled, memory-mapped KB file (see tools/kbfile.py)
+    instead of the in-module tools.kb.KB list.
+    tool_timeout_s sets ToolSpec.timeout_s on every tool (None = wait indefinitely).
+    search_shards > 1 splits the corpus into that many BM25 shards searched in parallel
+    worker processes (see tools/shard.py); results are identical to the unsharded index.
+    glossary_path points lookup_definition at a JSONL glossary (see tools/glossary.py)
+    instead of the in-module DEFINITIONS dict.
+    kb_dir points search_web at a KB directory (see tools/ingest.py) that can be updated
+    while the process runs; searches switch to each new version as it is published.
+    index_dir keeps the bm25 index of the in-module KB as a KB file in that directory:
+    built by the first process, memory-mapped by later ones (tools.implementations.prebuilt_kb_file).
+
+    Indexes and glossaries are loaded when a tool first needs them, not here.
+    """
+    if search_backend not in SEARCH_BACKENDS:
+        raise ValueError(f"Unknown search backend: {search_backend}")
+    if search_shards > 1 and search_backend != "bm25":
+        raise ValueError("sharded search only supports the bm25 search backend")
+
+    search_fn = SEARCH_BACKENDS[search_backend] if search_shards <= 1 else sharded_search_web(search_shards)
+    # A content digest, not the per-process kb_version counter: the answer cache persists
+    # across restarts, and an edited tools/kb.py must not match answers about the old text.
+    version_fn = kb_digest
+    if kb_path is not None:
+        if search_backend != "bm25":
+            raise ValueError("KB files only support the bm25 search backend")
+        from tools.kbfile import KBFile
 
+        kb_file = KBFile(kb_path)
+        if search_shards > 1:
+            from tools.shard import ShardedIndex
 
-def build_default_registry() -> ToolRegistry:
-    reg = ToolRegistry()
+            search_fn = make_live_search_web(lazy(lambda: ShardedIndex(kb_file, search_shards)), source=kb_file.source)
+        else:
+            search_fn = make_search_web(kb_file)
+        version_fn = lambda: kb_file.version  # noqa: E731
+    if kb_dir is not None:
+        if search_backend != "bm25" or search_shards > 1 or kb_path is not None:
+            raise ValueError("KB directories only support the unsharded bm25 search backend, without kb_path")
+        from tools.ingest import open_live_kb
+
+        live = open_live_kb(kb_dir)
+        search_fn = make_live_search_web(lambda: live.snapshot)
+        version_fn = lambda: f"{live.directory}@{live.version}"  # noqa: E731
+    if index_dir is not None:
+        if search_backend != "bm25" or search_shards > 1 or kb_path is not None or kb_dir is not None:
+            raise ValueError("index_dir only applies to the unsharded bm25 backend over the in-module KB")
+        search_fn = prebuilt_search_web(index_dir)
+
+    lookup_fn = lookup_definition
+    glossary = None
+    if glossary_path is not None:
+        from tools.glossary import Glossary
+
+        if not os.path.isfile(glossary_path):
+            raise FileNotFoundError(f"glossary not found: {glossary_path}")
+        glossary = lazy(lambda: Glossary.from_file(glossary_path))
+        lookup_fn = make_lookup_definition(glossary, path=glossary_path)
+
+    reg = ToolRegistry(cache=cache, version_fn=version_fn, glossary=glossary)
 
     reg.register(
         ToolSpec(
@@ -19,36 +108,45 @@ def build_default_registry() -> ToolRegistry:
                 },
                 "required": ["query"],
             },
-            fn=search_web,
+            fn=search_fn,
+            cacheable=True,
+            timeout_s=tool_timeout_s,
+            # Several searches of one step are scored in one pass (search_web_batch).
+            batch_fn=getattr(search_fn, "batch", None),
+            batch_arg="query",
         )
     )
 
     reg.register(
         ToolSpec(
             name="lookup_definition",
-            description="Lookup a definition from a hardcoded dictionary.",
+            description="Look up a definition (exact term, alias, or close misspelling) in the glossary.",
             schema={
                 "type": "object",
                 "properties": {"term": {"type": "string"}},
                 "required": ["term"],
             },
-            fn=lookup_definition,
+            fn=lookup_fn,
+            cacheable=True,
+            timeout_s=tool_timeout_s,
         )
     )
 
     reg.register(
         ToolSpec(
             name="summarize",
-            description="Rule-based summarization (minimal dependencies).",
+            description="Extractive summarization: leading sentences, or with `query` the sentences that best match it.",
             schema={
                 "type": "object",
                 "properties": {
                     "text": {"type": "string"},
                     "max_sentences": {"type": "integer", "minimum": 1, "maximum": 5, "default": 2},
+                    "query": {"type": "string"},
                 },
                 "required": ["text"],
             },
             fn=summarize,
+            timeout_s=tool_timeout_s,
         )
     )
 
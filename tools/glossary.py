@@ -0,0 +1,324 @@
+"""
+Compact glossary for lookup_definition: exact, alias, prefix and fuzzy lookups.
+
+Entries come from a JSONL file, one object per line:
+
+    {"term": "LangGraph", "definition": "...", "aliases": ["lang graph", "langgraph"]}
+
+Terms and aliases are normalized (lowercase, single spaces) into one sorted list of
+interned keys, each mapped to its entry through an array of indexes. Definitions are
+stored back to back in a single UTF-8 blob and decoded only when returned, so the
+per-entry overhead is one key string per term or alias plus a few array slots.
+
+    exact / alias   binary search over the sorted keys
+    prefix          binary search to the first key, then a linear scan
+    fuzzy           Levenshtein distance <= max_edits, computed as a trie walk over the
+                    sorted keys: one DP row per shared prefix, and whole key ranges are
+                    skipped as soon as the row exceeds the edit budget. A second walk
+                    over the sorted reversed keys lets each walk allow only half the
+                    edits on the first half of the word, which keeps the walk narrow
+                    near the root where the trie is widest
+
+Usage:
+    python -m tools.glossary export-default glossary.jsonl   # dump DEFINITIONS as JSONL
+    python -m tools.glossary info glossary.jsonl
+    python -m tools.glossary lookup glossary.jsonl "langgrph"
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+# Sorts after every character that appears in a normalized key.
+_MAX_CHAR = "\U0010ffff"
+
+_WORD = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+
+
+def normalize_term(term: str) -> str:
+    return " ".join(term.lower().split())
+
+
+class GlossaryMatch(NamedTuple):
+    key: str  # the term or alias that matched
+    term: str  # canonical term of its entry
+    distance: int  # edit distance from the query
+
+
+def _fuzzy_walk(keys: List[str], word: str, max_edits: int, split: int) -> List[Tuple[str, int]]:
+    """
+    (key, distance) for the sorted `keys` within max_edits of `word` whose alignment uses
+    at most max_edits // 2 edits on word[:split].
+
+    A depth-first walk over the implicit trie of the sorted keys: keys[lo:hi] all share
+    keys[lo][:depth], and row is the Levenshtein DP row of that prefix against `word`.
+    A range is skipped once no cell of its row is within max_edits or, until the prefix
+    has covered word[:split] cheaply enough, no cell of row[:split + 1] is within the
+    tighter max_edits // 2.
+    """
+    head_edits = max_edits // 2
+    m = len(word)
+    over = max_edits + 1  # any distance beyond the budget; cells outside the band keep it
+    found: List[Tuple[str, int]] = []
+    root = [j if j <= max_edits else over for j in range(m + 1)]
+    stack = [(0, len(keys), 0, root, split == 0)]
+    while stack:
+        lo, hi, depth, row, head_done = stack.pop()
+        if lo < hi and len(keys[lo]) == depth:
+            if row[m] <= max_edits:
+                found.append((keys[lo], row[m]))
+            lo += 1
+        d = depth + 1
+        # Only cells with |d - j| <= max_edits can be within budget (Ukkonen's band).
+        first, last = max(1, d - max_edits), min(m, d + max_edits)
+        while lo < hi:
+            prefix = keys[lo][:d]
+            ch = prefix[-1]
+            end = bisect_right(keys, prefix + _MAX_CHAR, lo, hi)
+            lo_next = lo
+            lo = end
+            if first > last + 1:
+                continue  # the prefix is already longer than the word plus the budget
+            new_row = [over] * (m + 1)
+            if d <= max_edits:
+                new_row[0] = d
+            best = new_row[0]
+            left = new_row[first - 1]
+            for j in range(first, last + 1):
+                # min(left + 1, up + 1, diagonal + mismatch), capped at `over`
+                cell = row[j - 1] if word[j - 1] == ch else row[j - 1] + 1
+                if row[j] < cell:
+                    cell = row[j] + 1
+                if left < cell:
+                    cell = left + 1
+                if cell > over:
+                    cell = over
+                new_row[j] = left = cell
+                if cell < best:
+                    best = cell
+            if best > max_edits:
+                continue
+            done = head_done or new_row[split] <= head_edits
+            if done or min(new_row[: split + 1]) <= head_edits:
+                stack.append((lo_next, end, d, new_row, done))
+    return found
+
+
+class Glossary:
+    def __init__(self, entries: Iterable[Tuple[str, str, Sequence[str]]]) -> None:
+        """
+        entries: (term, definition, aliases). When two entries claim the same key, a
+        term wins over an alias and the earlier entry wins otherwise.
+        """
+        terms: List[str] = []
+        blob = bytearray()
+        offsets = array("Q", [0])
+        key_entry: Dict[str, int] = {}
+        alias_keys: List[Tuple[str, int]] = []
+
+        for term, definition, aliases in entries:
+            key = normalize_term(term)
+            if not key:
+                continue
+            i = len(terms)
+            terms.append(sys.intern(term.strip()))
+            blob += definition.encode("utf-8")
+            offsets.append(len(blob))
+            key_entry.setdefault(sys.intern(key), i)
+            alias_keys.extend((normalize_term(a), i) for a in aliases)
+        for key, i in alias_keys:
+            if key:
+                key_entry.setdefault(sys.intern(key), i)
+
+        self._keys: List[str] = sorted(key_entry)
+        self._rkeys: List[str] = sorted(k[::-1] for k in self._keys)  # backward pass of fuzzy()
+        self._entry = array("I", (key_entry[k] for k in self._keys))
+        self._terms = terms
+        self._blob = bytes(blob)
+        self._offsets = offsets
+
+    @classmethod
+    def from_file(cls, path: str) -> "Glossary":
+        def entries():
+            with open(path, encoding="utf-8") as f:
+                for line_no, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    obj = json.loads(line)
+                    if "term" not in obj or "definition" not in obj:
+                        raise ValueError(f"{path}:{line_no}: glossary entries need 'term' and 'definition'")
+                    yield obj["term"], obj["definition"], obj.get("aliases", ())
+
+        return cls(entries())
+
+    @classmethod
+    def from_dict(cls, definitions: Dict[str, str]) -> "Glossary":
+        return cls((term, text, ()) for term, text in definitions.items())
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def _definition(self, entry: int) -> str:
+        return self._blob[self._offsets[entry] : self._offsets[entry + 1]].decode("utf-8")
+
+    def _find(self, key: str) -> Optional[int]:
+        pos = bisect_left(self._keys, key)
+        if pos < len(self._keys) and self._keys[pos] == key:
+            return self._entry[pos]
+        return None
+
+    def __contains__(self, term: str) -> bool:
+        return self._find(normalize_term(term)) is not None
+
+    def lookup(self, term: str) -> Optional[Tuple[str, str]]:
+        """
+        (canonical term, definition) for a term or alias, or None.
+        """
+        entry = self._find(normalize_term(term))
+        if entry is None:
+            return None
+        return self._terms[entry], self._definition(entry)
+
+    def definition_of(self, term: str) -> Optional[str]:
+        """
+        Definition of a canonical term (as returned by lookup/prefix/fuzzy).
+        """
+        found = self.lookup(term)
+        return found[1] if found else None
+
+    def prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        Canonical terms with a term or alias starting with `prefix`, in key order.
+        """
+        key = normalize_term(prefix)
+        out: List[str] = []
+        seen = set()
+        for pos in range(bisect_left(self._keys, key), len(self._keys)):
+            if not self._keys[pos].startswith(key) or len(out) >= limit:
+                break
+            entry = self._entry[pos]
+            if entry not in seen:
+                seen.add(entry)
+                out.append(self._terms[entry])
+        return out
+
+    def fuzzy(self, term: str, max_edits: int = 2, limit: int = 5) -> List[GlossaryMatch]:
+        """
+        Keys within `max_edits` Levenshtein edits of `term`, closest first (ties by key),
+        one match per canonical term.
+        """
+        word = normalize_term(term)
+        half = len(word) // 2
+        # Any alignment within max_edits spends at most max_edits // 2 edits on the first
+        # half of the word or on the second half: search the keys forward for the first
+        # case and the reversed keys (with the reversed word) for the second.
+        found = dict(_fuzzy_walk(self._keys, word, max_edits, half))
+        for rkey, dist in _fuzzy_walk(self._rkeys, word[::-1], max_edits, len(word) - half):
+            found[rkey[::-1]] = dist
+
+        out: List[GlossaryMatch] = []
+        seen = set()
+        for key, dist in sorted(found.items(), key=lambda kv: (kv[1], kv[0])):
+            entry = self._find(key)
+            if entry in seen:
+                continue
+            seen.add(entry)
+            out.append(GlossaryMatch(key, self._terms[entry], dist))
+            if len(out) >= limit:
+                break
+        return out
+
+    def find_terms(self, text: str, max_words: int = 4) -> List[str]:
+        """
+        Canonical terms whose term or alias occurs in `text` as whole words (longest match
+        first, no overlaps), in order of appearance.
+        """
+        words = _WORD.findall(text.lower())
+        out: List[str] = []
+        i = 0
+        while i < len(words):
+            for n in range(min(max_words, len(words) - i), 0, -1):
+                entry = self._find(" ".join(words[i : i + n]))
+                if entry is not None:
+                    if self._terms[entry] not in out:
+                        out.append(self._terms[entry])
+                    i += n
+                    break
+            else:
+                i += 1
+        return out
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """
+        Approximate resident size of the structure, by component.
+        """
+        key_ids = {id(k) for k in self._keys}
+        return {
+            "keys_bytes": sys.getsizeof(self._keys) + sum(sys.getsizeof(k) for k in self._keys),
+            "reversed_keys_bytes": sys.getsizeof(self._rkeys) + sum(sys.getsizeof(k) for k in self._rkeys),
+            # Terms equal to their normalized key share the interned key string.
+            "terms_bytes": sys.getsizeof(self._terms)
+            + sum(sys.getsizeof(t) for t in self._terms if id(t) not in key_ids),
+            "definitions_bytes": sys.getsizeof(self._blob) + sys.getsizeof(self._offsets),
+            "key_index_bytes": sys.getsizeof(self._entry),
+        }
+
+    def stats(self) -> Dict[str, int]:
+        memory = self.memory_bytes()
+        return {"entries": len(self._terms), "keys": len(self._keys), "memory_bytes": sum(memory.values()), **memory}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m tools.glossary", description="Inspect and query glossary files.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_export = sub.add_parser("export-default", help="Write the in-module DEFINITIONS as JSONL.")
+    p_export.add_argument("output")
+
+    p_info = sub.add_parser("info", help="Load a glossary and print its size and memory use.")
+    p_info.add_argument("path")
+
+    p_lookup = sub.add_parser("lookup", help="Exact/alias, prefix and fuzzy lookup of a term.")
+    p_lookup.add_argument("path")
+    p_lookup.add_argument("term")
+    p_lookup.add_argument("--max-edits", type=int, default=2)
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "export-default":
+        from tools.implementations import DEFINITIONS
+
+        with open(args.output, "w", encoding="utf-8") as f:
+            for term, text in DEFINITIONS.items():
+                f.write(json.dumps({"term": term, "definition": text, "aliases": []}, ensure_ascii=False) + "\n")
+        print(f"wrote {args.output}: {len(DEFINITIONS)} terms")
+        return
+
+    t0 = time.perf_counter()
+    glossary = Glossary.from_file(args.path)
+    load_ms = (time.perf_counter() - t0) * 1000.0
+
+    if args.cmd == "info":
+        for key, value in glossary.stats().items():
+            print(f"{key}: {value}")
+        print(f"load_ms: {load_ms:.1f}")
+    else:
+        for name, fn in (
+            ("exact", lambda: glossary.lookup(args.term)),
+            ("prefix", lambda: glossary.prefix(args.term)),
+            ("fuzzy", lambda: glossary.fuzzy(args.term, max_edits=args.max_edits)),
+        ):
+            t0 = time.perf_counter()
+            result = fn()
+            print(f"{name} ({(time.perf_counter() - t0) * 1000.0:.3f} ms): {result}")
+
+
+if __name__ == "__main__":
+    main()
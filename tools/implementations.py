@@ -1,10 +1,21 @@
 from __future__ import annotations
 
-import re
-from typing import Dict, List, Tuple
+import hashlib
+import json
+import os
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar, Union
 
-from tools.kb import KB
+from tools.index import Hit, InvertedIndex, OverlapScorer, search_batch
+from tools.kb import KB, kb_digest, kb_version
+from tools.results import Definition, SearchHit, SearchResults, register_engine_source
+from tools.snippets import doc_sentences, join_extracted, join_sentences, select_sentences, sentence_spans, sentence_text
 
+if TYPE_CHECKING:  # imported on first use, so `python -m tools.glossary` runs cleanly
+    from tools.glossary import Glossary
+
+T = TypeVar("T")
 
 DEFINITIONS: Dict[str, str] = {
     "langchain": "A framework for building LLM apps using composable components like tools, chains, and agents.",
@@ -15,45 +26,328 @@ DEFINITIONS: Dict[str, str] = {
 }
 
 
-def _tokenize(text: str) -> List[str]:
-    return re.findall(r"[a-z0-9]+", text.lower())
+# Typos tolerated when a term is neither a glossary term nor an alias; shorter terms
+# must match exactly (one edit away from "rag" is "bag", "rat", ...).
+FUZZY_MAX_EDITS = 1
+FUZZY_MIN_LENGTH = 4
+
+# (DEFINITIONS items it was built from, glossary); see _default_glossary.
+_DEFAULT_GLOSSARY: Tuple[Tuple[Tuple[str, str], ...], Optional[Glossary]] = ((), None)
+
+
+def _default_glossary() -> Glossary:
+    """
+    DEFINITIONS as a Glossary, rebuilt whenever the dict has been edited.
+    """
+    from tools.glossary import Glossary
+
+    global _DEFAULT_GLOSSARY
+    items = tuple(DEFINITIONS.items())
+    if _DEFAULT_GLOSSARY[1] is None or _DEFAULT_GLOSSARY[0] != items:
+        _DEFAULT_GLOSSARY = (items, Glossary.from_dict(DEFINITIONS))
+    return _DEFAULT_GLOSSARY[1]
+
+
+def definitions_digest(glossary_path: Optional[str] = None) -> str:
+    """
+    Short sha1 of the definitions lookup_definition serves: the glossary file's bytes,
+    or DEFINITIONS when there is no file. Content based, so it survives restarts.
+    """
+    if glossary_path is None:
+        text = json.dumps(sorted(DEFINITIONS.items()), ensure_ascii=False).encode("utf-8")
+        return hashlib.sha1(text).hexdigest()[:16]
+    st = os.stat(glossary_path)
+    return _file_digest(os.path.abspath(glossary_path), st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=8)
+def _file_digest(path: str, mtime_ns: int, size: int) -> str:
+    # Keyed on mtime and size too, so an edited file is hashed again.
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def _define(glossary: Glossary, term: str, path: Optional[str] = None) -> Definition:
+    from tools.glossary import normalize_term
+
+    found = glossary.lookup(term)
+    if found is None and len(normalize_term(term)) >= FUZZY_MIN_LENGTH:
+        close = glossary.fuzzy(term, max_edits=FUZZY_MAX_EDITS, limit=1)
+        if close:
+            found = close[0].term, glossary.definition_of(close[0].term)
+    if found is None:
+        return Definition(term=term, glossary=path)
+    matched, text = found
+    return Definition(term=term, text=text, matched=None if normalize_term(matched) == normalize_term(term) else matched)
+
+
+def lookup_definition(term: str) -> Definition:
+    """
+    Definition from DEFINITIONS: exact term, or the closest term within FUZZY_MAX_EDITS typos.
+    """
+    return _define(_default_glossary(), term)
+
+
+def lazy(factory: Callable[[], T]) -> Callable[[], T]:
+    """
+    Accessor that calls `factory` on first use and returns the same object afterwards,
+    so registries can defer loading indexes and glossaries until a tool first runs.
+    """
+    lock = threading.Lock()
+    box: List[T] = []
+
+    def get() -> T:
+        if not box:
+            with lock:
+                if not box:
+                    box.append(factory())
+        return box[0]
+
+    return get
+
+
+def make_lookup_definition(
+    glossary: Union[Glossary, Callable[[], Glossary]], path: Optional[str] = None
+) -> Callable[..., Definition]:
+    """
+    Binds a lookup_definition tool to a glossary (e.g. Glossary.from_file), or to a
+    zero-argument function returning one (see lazy): exact term or alias first, then the
+    closest term within FUZZY_MAX_EDITS typos. `path` names the glossary file in the
+    output for unknown terms.
+    """
+    get_glossary = glossary if callable(glossary) else (lambda: glossary)
+
+    def lookup_definition(term: str) -> Definition:
+        return _define(get_glossary(), term, path)
+
+    return lookup_definition
+
+
+def summarize(text: str, max_sentences: int = 2, query: Optional[str] = None) -> str:
+    """
+    Extractive summary: the first `max_sentences` sentences, or with `query` the
+    sentences that best match it (tools.snippets.select_sentences), in text order.
+    """
+    spans = sentence_spans(text)
+    if query:
+        chosen = select_sentences(query, [(text, spans)], max_sentences)
+        return join_extracted([sentence_text(text, span) for _, span in chosen])
+    return join_sentences([sentence_text(text, span) for span in spans[:max_sentences]])
+
+
+# How each search backend builds its engine over a document sequence.
+ENGINE_FACTORIES: Dict[str, Callable[[Sequence[dict]], object]] = {
+    "bm25": InvertedIndex,
+    "overlap": OverlapScorer,
+}
+
+
+def _vector_factory(**kwargs) -> Callable[[Sequence[dict]], object]:
+    def build(docs: Sequence[dict]):
+        from tools.vector import HashedVectorIndex  # numpy/scipy are optional
+
+        return HashedVectorIndex(docs, **kwargs)
+
+    return build
+
 
+ENGINE_FACTORIES["tfidf"] = _vector_factory()
+ENGINE_FACTORIES["embed"] = _vector_factory(dim=256)
 
-def lookup_definition(term: str) -> str:
-    key = term.strip().lower()
-    return DEFINITIONS.get(key, f"No definition found for '{term}'. Extend DEFINITIONS to add it.")
+# (backend, shards) -> (KB version, engine)
+_KB_ENGINES: Dict[Tuple[str, int], Tuple[int, object]] = {}
+_KB_ENGINES_LOCK = threading.Lock()
 
 
-def summarize(text: str, max_sentences: int = 2) -> str:
-    cleaned = " ".join(text.split())
-    parts = re.split(r"\.\s+", cleaned)
-    parts = [p.strip() for p in parts if p.strip()]
-    out = ". ".join(parts[:max_sentences])
-    if out and not out.endswith("."):
-        out += "."
-    return out
+def kb_engine(backend: str = "bm25", shards: int = 1):
+    """
+    Search engine of the given backend over tools.kb.KB, built on first use and shared
+    afterwards. Rebuilt when the KB version changes (see tools.kb.mark_changed).
+    shards > 1 serves the bm25 backend from a tools.shard.ShardedIndex.
+    Thread-safe: concurrent first calls build one engine. A replaced engine is not closed
+    here, since other threads may still be searching it; engines that hold resources
+    (ShardedIndex) release them once the last of those searches drops its reference.
+    """
+    version = kb_version()
+    key = (backend, shards)
+    cached = _KB_ENGINES.get(key)
+    if cached is None or cached[0] != version:
+        with _KB_ENGINES_LOCK:
+            cached = _KB_ENGINES.get(key)
+            if cached is None or cached[0] != version:
+                if shards > 1:
+                    from tools.shard import ShardedIndex
+
+                    if backend != "bm25":
+                        raise ValueError("sharded search only supports the bm25 backend")
+                    engine = ShardedIndex(KB, shards)
+                else:
+                    engine = ENGINE_FACTORIES[backend](KB)
+                cached = (version, engine)
+                _KB_ENGINES[key] = cached
+    return cached[1]
 
 
-def search_web(query: str, k: int = 3) -> str:
+def default_index() -> InvertedIndex:
     """
-    Offline retrieval: token overlap scoring over a tiny KB.
-    Output includes doc provenance via doc_id.
+    BM25 index over tools.kb.KB (see kb_engine).
     """
-    q_tokens = set(_tokenize(query))
-    scored: List[Tuple[int, dict]] = []
+    return kb_engine("bm25")
 
-    for doc in KB:
-        d_tokens = set(_tokenize(doc["title"] + " " + doc["text"] + " " + " ".join(doc["tags"])))
-        score = len(q_tokens & d_tokens)
-        scored.append((score, doc))
 
-    scored.sort(key=lambda x: x[0], reverse=True)
-    hits = [doc for score, doc in scored if score > 0][:k]
+def _search_results(query: str, engine, source: str, hits: List[Hit]) -> SearchResults:
+    found = []
+    for score, pos in hits:
+        doc = engine.doc(pos)
+        found.append(
+            SearchHit(
+                doc_id=doc["id"],
+                title=doc["title"],
+                score=score,
+                doc_index=pos,
+                start=0,
+                end=len(doc["text"]),
+                sentences=doc_sentences(engine, pos),
+            )
+        )
+    return SearchResults(query=query, source=source, hits=tuple(found))
 
-    if not hits:
-        return f"No offline KB results for query='{query}'. (KB is small; add more docs in tools/kb.py.)"
 
-    lines = []
-    for i, doc in enumerate(hits, 1):
-        lines.append(f"{i}. {doc['title']} (doc_id={doc['id']}) — {doc['text']}")
-    return "\n".join(lines)
\ No newline at end of file
+def _batch_results(queries: List[str], engine, source: str, k: int) -> List[SearchResults]:
+    hits = search_batch(engine, queries, k)
+    return [_search_results(q, engine, source, found) for q, found in zip(queries, hits)]
+
+
+def _with_batch(search_web: Callable[..., SearchResults], search_web_batch: Callable[..., List[SearchResults]]):
+    """
+    Attaches the multi-query form to a search_web function, for ToolSpec.batch_fn:
+    search_web_batch(queries, k) returns what [search_web(q, k) for q in queries] would,
+    scoring all queries in one pass over the index (tools.index.search_batch).
+    """
+    search_web.batch = search_web_batch
+    return search_web
+
+
+def make_search_web(engine, source: Optional[str] = None) -> Callable[..., SearchResults]:
+    """
+    Binds a search_web tool to a specific engine (e.g. a tools.kbfile.KBFile). Hits are
+    resolved back to document text through `source` (default: the engine's own doc()).
+    search_web.batch is the matching search_web_batch (see _with_batch).
+    """
+    if source is None:
+        source = getattr(engine, "source", None) or register_engine_source(engine)
+
+    def search_web(query: str, k: int = 3) -> SearchResults:
+        return _search_results(query, engine, source, engine.search(query, k))
+
+    def search_web_batch(queries: List[str], k: int = 3) -> List[SearchResults]:
+        return _batch_results(queries, engine, source, k)
+
+    return _with_batch(search_web, search_web_batch)
+
+
+def make_live_search_web(current: Callable[[], object], source: Optional[str] = None) -> Callable[..., SearchResults]:
+    """
+    search_web over an engine that is replaced while the process runs, or created on
+    first use: `current()` returns the engine to use (e.g. tools.ingest.LiveKB's
+    snapshot, or a lazy() accessor), read once per call so each search, and its hits,
+    come from a single version. Hits resolve through `source` (default: engine.source).
+    """
+
+    def search_web(query: str, k: int = 3) -> SearchResults:
+        engine = current()
+        return _search_results(query, engine, source or engine.source, engine.search(query, k))
+
+    def search_web_batch(queries: List[str], k: int = 3) -> List[SearchResults]:
+        engine = current()
+        return _batch_results(queries, engine, source or engine.source, k)
+
+    return _with_batch(search_web, search_web_batch)
+
+
+# index_dir -> (KB version, KBFile); see prebuilt_kb_file.
+_PREBUILT: Dict[str, Tuple[int, object]] = {}
+
+
+def prebuilt_kb_file(index_dir: str):
+    """
+    tools.kb.KB compiled into a KB file under index_dir, named by a digest of the KB
+    content: the first process builds it and every later one memory-maps it instead of
+    tokenizing the KB again. Re-checked when the KB version changes.
+    """
+    version = kb_version()
+    cached = _PREBUILT.get(index_dir)
+    if cached is None or cached[0] != version:
+        from tools.kbfile import build_kb_file, open_kb_file
+
+        path = os.path.join(index_dir, f"kb-{kb_digest()}.rakb")
+        if not os.path.exists(path):
+            os.makedirs(index_dir, exist_ok=True)
+            # Built under a per-process name: workers starting together may all build it.
+            tmp_path = f"{path}.{os.getpid()}"
+            build_kb_file(KB, tmp_path)
+            os.replace(tmp_path, path)
+        cached = (version, open_kb_file(path))
+        _PREBUILT[index_dir] = cached
+    return cached[1]
+
+
+def prebuilt_search_web(index_dir: str) -> Callable[..., SearchResults]:
+    """
+    BM25 search_web over the in-module KB, served from a prebuilt KB file (prebuilt_kb_file).
+    """
+    return make_live_search_web(lambda: prebuilt_kb_file(index_dir))
+
+
+def search_web(query: str, k: int = 3) -> SearchResults:
+    """
+    Offline retrieval: BM25 over a prebuilt inverted index of the KB.
+    Hits carry doc provenance (doc_id) and a snippet span; text is rendered on demand.
+    """
+    engine = default_index()
+    return _search_results(query, engine, f"kb@{kb_digest()}", engine.search(query, k))
+
+
+def search_web_batch(queries: List[str], k: int = 3) -> List[SearchResults]:
+    """
+    search_web for several queries, scored in one pass over the index.
+    """
+    return _batch_results(queries, default_index(), f"kb@{kb_digest()}", k)
+
+
+_with_batch(search_web, search_web_batch)
+
+
+def _kb_search(backend: str, shards: int = 1) -> Callable[..., SearchResults]:
+    def search_web(query: str, k: int = 3) -> SearchResults:
+        engine = kb_engine(backend, shards)
+        return _search_results(query, engine, f"kb@{kb_digest()}", engine.search(query, k))
+
+    def search_web_batch(queries: List[str], k: int = 3) -> List[SearchResults]:
+        return _batch_results(queries, kb_engine(backend, shards), f"kb@{kb_digest()}", k)
+
+    search_web.__doc__ = f"Offline retrieval over the KB with the {backend!r} backend."
+    return _with_batch(search_web, search_web_batch)
+
+
+def sharded_search_web(shards: int) -> Callable[..., SearchResults]:
+    """
+    search_web over the KB split into `shards` BM25 shards served by worker processes.
+    """
+    return _kb_search("bm25", shards)
+
+
+# Legacy retrieval: token overlap scoring over the whole KB (for comparison).
+search_web_overlap = _kb_search("overlap")
+
+
+# Selectable search implementations, keyed by backend name.
+SEARCH_BACKENDS: Dict[str, Callable[..., SearchResults]] = {
+    "bm25": search_web,
+    "overlap": search_web_overlap,
+    "tfidf": _kb_search("tfidf"),
+    "embed": _kb_search("embed"),
+}
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# A search hit is (score, position of the doc in the corpus sequence).
+Hit = Tuple[float, int]
+
+# A sentence as a (start, end) character span into its text.
+Span = Tuple[int, int]
+
+_SENTENCE_BOUNDARY = re.compile(r"\.\s+(?=\S)")
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def split_sentences(text: str) -> Tuple[Span, ...]:
+    """
+    Spans of the non-empty sentences of `text`, without the terminating ". " (the rule
+    summarize has always used: a period followed by whitespace and more text ends a sentence).
+    """
+    spans = []
+    start = 0
+    for m in _SENTENCE_BOUNDARY.finditer(text):
+        if text[start : m.start()].strip():
+            spans.append((start, m.start()))
+        start = m.end()
+    if text[start:].strip():
+        spans.append((start, len(text)))
+    return tuple(spans)
+
+
+def doc_tokens(doc: dict) -> List[str]:
+    return tokenize(doc["title"] + " " + doc["text"] + " " + " ".join(doc["tags"]))
+
+
+def bm25_idf(n_docs: int, df: int) -> float:
+    return math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+
+
+def bm25_top_k(
+    term_postings: Iterable[Tuple[float, Iterable[Tuple[int, int]]]],
+    doc_lengths: Sequence[int],
+    avg_doc_length: float,
+    k: int,
+    k1: float = 1.5,
+    b: float = 0.75,
+) -> List[Hit]:
+    """
+    Accumulates BM25 scores from (idf, postings) pairs, one per query term, and keeps
+    the k best with a bounded heap. Shared by the in-memory and on-disk indexes.
+    """
+    scores: Dict[int, float] = {}
+    avgdl = avg_doc_length or 1.0
+
+    for idf, plist in term_postings:
+        for i, tf in plist:
+            norm = k1 * (1.0 - b + b * doc_lengths[i] / avgdl)
+            scores[i] = scores.get(i, 0.0) + idf * tf * (k1 + 1.0) / (tf + norm)
+
+    # Ties break toward earlier documents so results are deterministic.
+    best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+    return [(score, i) for i, score in best]
+
+
+def bm25_top_k_batch(
+    query_terms: Sequence[Sequence[str]],
+    lookup: Callable[[str], Optional[Tuple[float, Iterable[Tuple[int, int]]]]],
+    doc_lengths: Sequence[int],
+    avg_doc_length: float,
+    k: int,
+    k1: float = 1.5,
+    b: float = 0.75,
+) -> List[List[Hit]]:
+    """
+    bm25_top_k for several queries in one pass over the postings. Each query is its
+    sorted distinct terms; lookup(term) gives (idf, postings) or None. Every distinct
+    term is looked up, and its per-document contributions computed, once for all the
+    queries that contain it. Terms are visited in sorted order, so each query adds up its
+    scores in the same order as bm25_top_k and the results are identical.
+    """
+    avgdl = avg_doc_length or 1.0
+    by_term: Dict[str, List[int]] = {}
+    for q, terms in enumerate(query_terms):
+        for term in terms:
+            by_term.setdefault(term, []).append(q)
+
+    scores: List[Dict[int, float]] = [{} for _ in query_terms]
+    for term in sorted(by_term):
+        found = lookup(term)
+        if found is None:
+            continue
+        idf, plist = found
+        contributions = []
+        for i, tf in plist:
+            norm = k1 * (1.0 - b + b * doc_lengths[i] / avgdl)
+            contributions.append((i, idf * tf * (k1 + 1.0) / (tf + norm)))
+        for q in by_term[term]:
+            acc = scores[q]
+            for i, c in contributions:
+                acc[i] = acc.get(i, 0.0) + c
+
+    out = []
+    for acc in scores:
+        best = heapq.nlargest(k, acc.items(), key=lambda item: (item[1], -item[0]))
+        out.append([(score, i) for i, score in best])
+    return out
+
+
+def query_terms(query: str) -> List[str]:
+    return sorted(set(tokenize(query)))
+
+
+def search_batch(engine, queries: Sequence[str], k: int) -> List[List[Hit]]:
+    """
+    Top-k hits of each query: in one pass when the engine has search_batch, else one search per query.
+    """
+    batch = getattr(engine, "search_batch", None)
+    if batch is not None:
+        return batch(queries, k)
+    return [engine.search(q, k) for q in queries]
+
+
+class InvertedIndex:
+    """
+    Prebuilt BM25 index over a document sequence.
+
+    Documents are tokenized once at build time into per-token postings lists of
+    (doc position, term frequency). A query only visits the postings of its own
+    terms, and top-k selection uses a bounded heap instead of a full sort.
+    Document texts are also split into sentence spans once, for snippets (sentences()).
+    """
+
+    def __init__(self, docs: Sequence[dict], k1: float = 1.5, b: float = 0.75) -> None:
+        self.docs = docs
+        self.k1 = k1
+        self.b = b
+
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_lengths: List[int] = []
+        self._sentences: List[Tuple[Span, ...]] = []
+
+        for i, doc in enumerate(docs):
+            self._sentences.append(split_sentences(doc["text"]))
+            tokens = doc_tokens(doc)
+            self.doc_lengths.append(len(tokens))
+            for tok, tf in Counter(tokens).items():
+                self.postings.setdefault(tok, []).append((i, tf))
+
+        n = len(self.doc_lengths)
+        self.avg_doc_length = (sum(self.doc_lengths) / n) if n else 0.0
+        self.idf: Dict[str, float] = {tok: bm25_idf(n, len(plist)) for tok, plist in self.postings.items()}
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def doc(self, i: int) -> dict:
+        return self.docs[i]
+
+    def sentences(self, i: int) -> Tuple[Span, ...]:
+        return self._sentences[i]
+
+    def search(self, query: str, k: int) -> List[Hit]:
+        terms = [tok for tok in sorted(set(tokenize(query))) if tok in self.postings]
+        return bm25_top_k(
+            ((self.idf[tok], self.postings[tok]) for tok in terms),
+            self.doc_lengths,
+            self.avg_doc_length,
+            k,
+            self.k1,
+            self.b,
+        )
+
+    def _idf_postings(self, term: str) -> Optional[Tuple[float, List[Tuple[int, int]]]]:
+        plist = self.postings.get(term)
+        return (self.idf[term], plist) if plist is not None else None
+
+    def search_batch(self, queries: Sequence[str], k: int) -> List[List[Hit]]:
+        """
+        search() for many queries at once (bm25_top_k_batch); same hits as separate calls.
+        """
+        return bm25_top_k_batch(
+            [query_terms(q) for q in queries], self._idf_postings, self.doc_lengths, self.avg_doc_length, k, self.k1, self.b
+        )
+
+
+class OverlapScorer:
+    """
+    The original scorer: count of distinct query tokens shared with each document.
+    Re-tokenizes the whole corpus per query; kept for comparison with InvertedIndex.
+    """
+
+    def __init__(self, docs: Sequence[dict]) -> None:
+        self.docs = docs
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def doc(self, i: int) -> dict:
+        return self.docs[i]
+
+    def search(self, query: str, k: int) -> List[Hit]:
+        q_tokens = set(tokenize(query))
+        scored: List[Hit] = []
+
+        for i, doc in enumerate(self.docs):
+            score = len(q_tokens & set(doc_tokens(doc)))
+            scored.append((float(score), i))
+
+        scored.sort(key=lambda x: x[0], reverse=True)
+        return [(score, i) for score, i in scored if score > 0][:k]
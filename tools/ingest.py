@@ -0,0 +1,599 @@
+"""
+Incremental KB ingestion: a KB directory that takes document puts and deletes while
+other processes keep searching it.
+
+Directory layout:
+
+    CURRENT          {"version": V, "base": "base-V.rakb", "log": "log-V.jsonl"}
+    base-V.rakb      compiled KB file (tools.kbfile) with the documents as of version V
+    log-V.jsonl      changes since base-V, one per line; line n produces version V + n
+                         {"op": "put", "doc": {...}}     add, or replace the doc with that id
+                         {"op": "delete", "id": "..."}
+    LOCK             serializes writers and compaction across processes (flock)
+
+In memory, a Snapshot is the memory-mapped base segment, one small in-memory segment
+(tools.index.InvertedIndex) per batch of log lines applied, and the set of deleted
+positions. Snapshots are immutable: applying changes builds a new one, which LiveKB
+publishes with a single reference assignment, so queries never wait for writers and
+each query sees exactly one version. BM25 scores are identical to a full rebuild over
+the live documents: document frequencies, the document count and the average length
+all count live documents only.
+
+Compaction folds the segments and deletions into a new base file and starts an empty
+log. Document positions change, so compaction is a new version too. LiveKB runs it in a
+background thread once there are too many segments or too many deleted documents; a
+watcher thread picks up changes written by other processes (e.g. this CLI).
+
+Usage:
+    python -m tools.ingest init kbdir [--from docs.jsonl]   # default: the in-module KB
+    python -m tools.ingest put kbdir docs.jsonl              # add or update ('-' for stdin)
+    python -m tools.ingest delete kbdir ID [ID ...]
+    python -m tools.ingest compact kbdir
+    python -m tools.ingest info kbdir
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import threading
+from bisect import bisect_right
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from tools.index import Hit, InvertedIndex, Span, bm25_idf, bm25_top_k, bm25_top_k_batch, query_terms, tokenize
+from tools.kbfile import REQUIRED_FIELDS, KBFile, build_kb_file, read_jsonl
+from tools.results import register_source, unregister_source
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: writers in different processes are not serialized
+    fcntl = None
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "LOCK"
+
+# Snapshot sources kept resolvable for results rendered after newer versions are published.
+KEEP_SOURCES = 16
+
+
+def _check_doc(doc: dict) -> dict:
+    missing = [k for k in REQUIRED_FIELDS if k not in doc]
+    if missing:
+        raise ValueError(f"document missing fields {missing}")
+    return doc
+
+
+def _read_current(directory: str) -> dict:
+    with open(os.path.join(directory, CURRENT_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_current(directory: str, version: int) -> dict:
+    current = {"version": version, "base": f"base-{version}.rakb", "log": f"log-{version}.jsonl"}
+    open(os.path.join(directory, current["log"]), "a").close()
+    tmp_path = os.path.join(directory, CURRENT_FILE + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(current, f)
+    os.replace(tmp_path, os.path.join(directory, CURRENT_FILE))
+    return current
+
+
+def _read_log(path: str, offset: int) -> Tuple[List[dict], int]:
+    """
+    Complete log lines after byte `offset`, and the offset just past them. A line still
+    being written by another process is left for the next read.
+    """
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1
+    ops = [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+    return ops, offset + end
+
+
+@contextmanager
+def _dir_lock(directory: str, blocking: bool = True) -> Iterator[bool]:
+    """
+    Exclusive writer lock on a KB directory; yields False if not blocking and it is taken.
+    """
+    f = open(os.path.join(directory, LOCK_FILE), "a")
+    try:
+        if fcntl is not None:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+        yield True
+    finally:
+        f.close()
+
+
+# --- segments ---------------------------------------------------------------
+
+class _BaseSegment:
+    def __init__(self, kb_file: KBFile) -> None:
+        self.kb_file = kb_file
+        self.n = len(kb_file)
+        self.total_length = sum(kb_file._doc_lengths)
+        self._ids: Optional[Dict[str, int]] = None
+
+    @property
+    def ids(self) -> Dict[str, int]:
+        # Decodes every body once; only needed when a change replaces or deletes a doc.
+        if self._ids is None:
+            self._ids = {self.kb_file.doc(i)["id"]: i for i in range(self.n)}
+        return self._ids
+
+    def postings(self, term: str) -> Iterable[Tuple[int, int]]:
+        found = self.kb_file.postings(term)
+        return found[1] if found is not None else ()
+
+    def length(self, i: int) -> int:
+        return self.kb_file._doc_lengths[i]
+
+    def doc(self, i: int) -> dict:
+        return self.kb_file.doc(i)
+
+    def sentences(self, i: int) -> Tuple[Span, ...]:
+        return self.kb_file.sentences(i)
+
+
+class _DeltaSegment:
+    def __init__(self, docs: List[dict]) -> None:
+        self.index = InvertedIndex(docs)
+        self.n = len(docs)
+        self.ids = {doc["id"]: i for i, doc in enumerate(docs)}
+
+    def postings(self, term: str) -> Iterable[Tuple[int, int]]:
+        return self.index.postings.get(term, ())
+
+    def length(self, i: int) -> int:
+        return self.index.doc_lengths[i]
+
+    def doc(self, i: int) -> dict:
+        return self.index.doc(i)
+
+    def sentences(self, i: int) -> Tuple[Span, ...]:
+        return self.index.sentences(i)
+
+
+class Snapshot:
+    """
+    One immutable version of a KB directory, with the search interface of
+    tools.index.InvertedIndex (len, doc, sentences, search). Positions are global across
+    segments and skip deleted documents, so they can exceed len() (the live count).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        version: int,
+        segments: Tuple[object, ...],
+        dead: FrozenSet[int],
+        n_live: int,
+        total_length: int,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> None:
+        self.directory = directory
+        self.version = version
+        self.segments = segments
+        self.offsets: List[int] = []
+        end = 0
+        for seg in segments:
+            self.offsets.append(end)
+            end += seg.n
+        self.end = end
+        self.dead = dead
+        self.n_live = n_live
+        self.total_length = total_length
+        self.avg_doc_length = (total_length / n_live) if n_live else 0.0
+        self.k1 = k1
+        self.b = b
+        self.source = f"kbdir:{directory}@{version}"
+
+    def __len__(self) -> int:
+        return self.n_live
+
+    def _locate(self, pos: int) -> Tuple[object, int]:
+        j = bisect_right(self.offsets, pos) - 1
+        return self.segments[j], pos - self.offsets[j]
+
+    def doc(self, pos: int) -> dict:
+        seg, i = self._locate(pos)
+        return seg.doc(i)
+
+    def sentences(self, pos: int) -> Tuple[Span, ...]:
+        seg, i = self._locate(pos)
+        return seg.sentences(i)
+
+    def length(self, pos: int) -> int:
+        seg, i = self._locate(pos)
+        return seg.length(i)
+
+    def find(self, doc_id: str) -> Optional[int]:
+        """
+        Position of the live document with this id, or None.
+        """
+        for j in range(len(self.segments) - 1, -1, -1):
+            i = self.segments[j].ids.get(doc_id)
+            if i is not None:
+                # The newest copy of an id is the only one that can be live.
+                pos = self.offsets[j] + i
+                return None if pos in self.dead else pos
+        return None
+
+    def live_docs(self) -> Iterator[dict]:
+        for seg, offset in zip(self.segments, self.offsets):
+            for i in range(seg.n):
+                if offset + i not in self.dead:
+                    yield seg.doc(i)
+
+    def search(self, query: str, k: int) -> List[Hit]:
+        term_postings = []
+        lengths: Dict[int, int] = {}
+        dead = self.dead
+        for tok in sorted(set(tokenize(query))):
+            plist = []
+            for seg, offset in zip(self.segments, self.offsets):
+                for i, tf in seg.postings(tok):
+                    pos = offset + i
+                    if pos not in dead:
+                        plist.append((pos, tf))
+                        lengths[pos] = seg.length(i)
+            if plist:
+                term_postings.append((bm25_idf(self.n_live, len(plist)), plist))
+        return bm25_top_k(term_postings, lengths, self.avg_doc_length, k, self.k1, self.b)
+
+    def search_batch(self, queries: Sequence[str], k: int) -> List[List[Hit]]:
+        """
+        search() for many queries at once: each distinct term's live postings are
+        gathered once across segments (tools.index.bm25_top_k_batch).
+        """
+        lengths: Dict[int, int] = {}
+        dead = self.dead
+
+        def lookup(tok: str):
+            plist = []
+            for seg, offset in zip(self.segments, self.offsets):
+                for i, tf in seg.postings(tok):
+                    pos = offset + i
+                    if pos not in dead:
+                        plist.append((pos, tf))
+                        lengths[pos] = seg.length(i)
+            return (bm25_idf(self.n_live, len(plist)), plist) if plist else None
+
+        return bm25_top_k_batch([query_terms(q) for q in queries], lookup, lengths, self.avg_doc_length, k, self.k1, self.b)
+
+    def apply(self, ops: Sequence[dict]) -> "Snapshot":
+        """
+        The snapshot after `ops` (log entries): puts become one new segment, and every
+        op counts as one version whether or not it changed anything.
+        """
+        dead = set(self.dead)
+        n_live, total_length = self.n_live, self.total_length
+        docs: List[dict] = []
+        batch_ids: Dict[str, int] = {}
+
+        def kill(doc_id: str) -> None:
+            nonlocal n_live, total_length
+            if doc_id in batch_ids:
+                dead.add(self.end + batch_ids.pop(doc_id))
+                return
+            pos = self.find(doc_id)
+            if pos is not None and pos not in dead:
+                dead.add(pos)
+                n_live -= 1
+                total_length -= self.length(pos)
+
+        for op in ops:
+            kind = op.get("op")
+            if kind == "put":
+                doc = _check_doc(op["doc"])
+                kill(doc["id"])
+                batch_ids[doc["id"]] = len(docs)
+                docs.append(doc)
+            elif kind == "delete":
+                kill(op["id"])
+            else:
+                raise ValueError(f"unknown log op: {kind!r}")
+
+        segments = self.segments
+        if docs:
+            seg = _DeltaSegment(docs)
+            segments += (seg,)
+            for i in batch_ids.values():
+                n_live += 1
+                total_length += seg.length(i)
+
+        return Snapshot(
+            self.directory,
+            self.version + len(ops),
+            segments,
+            frozenset(dead),
+            n_live,
+            total_length,
+            self.k1,
+            self.b,
+        )
+
+
+# --- live KB ----------------------------------------------------------------
+
+class LiveKB:
+    """
+    A KB directory opened for searching and writing. `snapshot` is the current Snapshot;
+    read it once per query and use that object for the whole query.
+
+    poll_interval_s: how often a background thread picks up changes made by other
+    processes (None = only on refresh() and this object's own writes).
+    compact_interval_s: how often that thread checks whether compaction is due: more
+    than `max_segments` in-memory segments, or deleted documents above `max_dead_ratio`
+    of all positions (None = only on compact()).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        poll_interval_s: Optional[float] = 1.0,
+        compact_interval_s: Optional[float] = 30.0,
+        max_segments: int = 8,
+        max_dead_ratio: float = 0.25,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> None:
+        self.directory = os.path.abspath(directory)
+        self.max_segments = max_segments
+        self.max_dead_ratio = max_dead_ratio
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._current: Optional[dict] = None
+        self._log_offset = 0
+        self._sources: Deque[str] = deque()
+        self.snapshot: Snapshot
+        self.refresh()
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if poll_interval_s or compact_interval_s:
+            self._thread = threading.Thread(
+                target=self._background,
+                args=(poll_interval_s, compact_interval_s),
+                name=f"kb-watch:{os.path.basename(self.directory)}",
+                daemon=True,
+            )
+            self._thread.start()
+
+    @classmethod
+    def create(cls, directory: str, docs: Iterable[dict], **kwargs) -> "LiveKB":
+        """
+        Initializes a KB directory (version 0) with `docs` and opens it.
+        """
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(os.path.join(directory, CURRENT_FILE)):
+            raise FileExistsError(f"{directory} is already a KB directory")
+        with _dir_lock(directory):
+            build_kb_file((_check_doc(doc) for doc in docs), os.path.join(directory, "base-0.rakb"))
+            _write_current(directory, 0)
+        return cls(directory, **kwargs)
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    # -- reading ---------------------------------------------------------------
+
+    def refresh(self) -> int:
+        """
+        Applies changes made since the last refresh (new log lines, or a new base after
+        a compaction) and publishes the resulting snapshot. Returns the current version.
+        """
+        with self._lock:
+            current = _read_current(self.directory)
+            if self._current is None or current["base"] != self._current["base"]:
+                base = _BaseSegment(KBFile(os.path.join(self.directory, current["base"]), self.k1, self.b))
+                snap = Snapshot(
+                    self.directory,
+                    current["version"],
+                    (base,),
+                    frozenset(),
+                    base.n,
+                    base.total_length,
+                    self.k1,
+                    self.b,
+                )
+                if self._current is not None:
+                    # Old base files stay open for queries in flight but are no longer resolvable by name.
+                    unregister_source(self.snapshot.segments[0].kb_file.source)
+                self._current = current
+                self._log_offset = 0
+            else:
+                snap = self.snapshot
+
+            ops, self._log_offset = _read_log(os.path.join(self.directory, current["log"]), self._log_offset)
+            if ops:
+                snap = snap.apply(ops)
+            if snap is not getattr(self, "snapshot", None):
+                self._publish(snap)
+            return snap.version
+
+    def _publish(self, snap: Snapshot) -> None:
+        register_source(snap.source, snap.doc)
+        self._sources.append(snap.source)
+        while len(self._sources) > KEEP_SOURCES:
+            unregister_source(self._sources.popleft())
+        self.snapshot = snap  # the atomic switch: readers pick up the new version on their next query
+
+    # -- writing ---------------------------------------------------------------
+
+    def _append(self, make_ops: Callable[[Snapshot], List[dict]]) -> int:
+        """
+        Appends the ops computed from the up-to-date snapshot to the log, under the
+        directory lock, and publishes the result.
+        """
+        with _dir_lock(self.directory):
+            self.refresh()  # another process may have written or compacted meanwhile
+            ops = make_ops(self.snapshot)
+            if ops:
+                with open(os.path.join(self.directory, self._current["log"]), "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops))
+                    f.flush()
+                    os.fsync(f.fileno())
+            return self.refresh()
+
+    def put(self, docs: Iterable[dict]) -> int:
+        """
+        Adds documents, replacing any live document with the same id. Returns the new version.
+        """
+        ops = [{"op": "put", "doc": _check_doc(doc)} for doc in docs]
+        return self._append(lambda snap: ops)
+
+    def delete(self, doc_ids: Iterable[str]) -> int:
+        """
+        Deletes documents by id; ids that are not live are ignored. Returns the new version.
+        """
+        wanted = list(dict.fromkeys(doc_ids))
+        return self._append(lambda snap: [{"op": "delete", "id": d} for d in wanted if snap.find(d) is not None])
+
+    # -- compaction -------------------------------------------------------------
+
+    def needs_compaction(self) -> bool:
+        snap = self.snapshot
+        positions = snap.end
+        return len(snap.segments) - 1 > self.max_segments or (
+            positions > 0 and len(snap.dead) / positions > self.max_dead_ratio
+        )
+
+    def compact(self, blocking: bool = True) -> Optional[int]:
+        """
+        Writes the live documents to a new base file and switches the directory to it.
+        Returns the new version, or None if another writer holds the lock and not blocking.
+        """
+        with _dir_lock(self.directory, blocking) as locked:
+            if not locked:
+                return None
+            self.refresh()
+            snap = self.snapshot
+            version = snap.version + 1
+            build_kb_file(snap.live_docs(), os.path.join(self.directory, f"base-{version}.rakb"))
+            previous = self._current
+            _write_current(self.directory, version)
+            self.refresh()
+            self._remove_stale(keep={previous["base"], previous["log"]})
+            return version
+
+    def _remove_stale(self, keep: set) -> None:
+        # Keeps the previous generation: another process may be opening it right now.
+        keep = keep | {self._current["base"], self._current["log"]}
+        for name in os.listdir(self.directory):
+            if name.startswith(("base-", "log-")) and name not in keep:
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def _background(self, poll_interval_s: Optional[float], compact_interval_s: Optional[float]) -> None:
+        interval = min(t for t in (poll_interval_s, compact_interval_s) if t)
+        waited = 0.0
+        while not self._stop.wait(interval):
+            waited += interval
+            try:
+                if poll_interval_s:
+                    self.refresh()
+                if compact_interval_s and waited >= compact_interval_s:
+                    waited = 0.0
+                    if self.needs_compaction():
+                        self.compact(blocking=False)
+            except (OSError, ValueError):
+                # A half-finished switch by another process; the next round retries.
+                continue
+
+    def stats(self) -> Dict[str, int]:
+        snap = self.snapshot
+        return {
+            "version": snap.version,
+            "docs": snap.n_live,
+            "deleted": len(snap.dead),
+            "segments": len(snap.segments),
+            "base_docs": snap.segments[0].n,
+        }
+
+
+_OPEN_DIRS: Dict[str, LiveKB] = {}
+_OPEN_LOCK = threading.Lock()
+
+
+def open_live_kb(directory: str) -> LiveKB:
+    """
+    Shared LiveKB per directory, opened (and its background thread started) on first use.
+    """
+    key = os.path.abspath(directory)
+    with _OPEN_LOCK:
+        live = _OPEN_DIRS.get(key)
+        if live is None:
+            live = _OPEN_DIRS[key] = LiveKB(key)
+    return live
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m tools.ingest", description="Create and update KB directories.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_init = sub.add_parser("init", help="Create a KB directory (version 0).")
+    p_init.add_argument("directory")
+    p_init.add_argument("--from", dest="source", help="JSONL corpus (default: the in-module KB in tools/kb.py).")
+
+    p_put = sub.add_parser("put", help="Add or update documents from JSONL (id, title, text, tags per line).")
+    p_put.add_argument("directory")
+    p_put.add_argument("input", help="JSONL path, or '-' for stdin.")
+
+    p_delete = sub.add_parser("delete", help="Delete documents by id.")
+    p_delete.add_argument("directory")
+    p_delete.add_argument("ids", nargs="+")
+
+    p_compact = sub.add_parser("compact", help="Fold all changes into a new base file.")
+    p_compact.add_argument("directory")
+
+    p_info = sub.add_parser("info", help="Print the version and segment layout of a KB directory.")
+    p_info.add_argument("directory")
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "init":
+        if args.source:
+            docs: Iterable[dict] = read_jsonl(args.source)
+        else:
+            from tools.kb import KB
+
+            docs = KB
+        live = LiveKB.create(args.directory, docs, poll_interval_s=None, compact_interval_s=None)
+        print(f"created {args.directory}: {len(live.snapshot)} docs, version {live.version}")
+        return
+
+    live = LiveKB(args.directory, poll_interval_s=None, compact_interval_s=None)
+    before = live.version
+    if args.cmd == "put":
+        version = live.put(read_jsonl(args.input))
+        print(f"{args.directory}: version {before} -> {version}, {len(live.snapshot)} docs")
+    elif args.cmd == "delete":
+        version = live.delete(args.ids)
+        print(f"{args.directory}: version {before} -> {version}, deleted {version - before} of {len(args.ids)}")
+    elif args.cmd == "compact":
+        version = live.compact()
+        print(f"{args.directory}: compacted into base-{version}.rakb, {len(live.snapshot)} docs")
+    elif args.cmd == "info":
+        for key, value in live.stats().items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
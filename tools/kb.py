@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import hashlib
+import json
+
 # Offline “documents” used by search_web. Extend this list to improve coverage.
+# After changing KB at runtime, call mark_changed() so indexes and tool caches refresh.
 
 KB = [
     {
@@ -49,4 +53,33 @@ KB = [
         ),
         "tags": ["agent", "loop", "reflection", "planning"],
     },
-]
\ No newline at end of file
+]
+
+_version = 0
+# (KB version, digest); see kb_digest.
+_digest = (-1, "")
+
+
+def kb_version() -> int:
+    return _version
+
+
+def kb_digest() -> str:
+    """
+    Short sha1 of the KB content, recomputed when the KB version changes. Unlike
+    kb_version (a per-process counter), it names the same content in every process, so
+    it is what persistent caches and rendered sources key on.
+    """
+    global _digest
+    if _digest[0] != _version:
+        text = json.dumps(KB, sort_keys=True, ensure_ascii=False)
+        _digest = (_version, hashlib.sha1(text.encode("utf-8")).hexdigest()[:16])
+    return _digest[1]
+
+
+def mark_changed() -> None:
+    """
+    Bumps the KB version: derived indexes are rebuilt and cached tool outputs invalidated.
+    """
+    global _version
+    _version += 1
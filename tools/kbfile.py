@@ -0,0 +1,338 @@
+"""
+Disk-backed knowledge base: compile a JSONL corpus into a single binary file and
+search it through a read-only memory map.
+
+File layout (little-endian, sections 8-byte aligned):
+
+    header        magic, format version, doc/term counts, avg doc length, section offsets
+    doc offsets   (n_docs + 1) x u64   byte offsets of each document body
+    doc lengths   n_docs x u32         token count per document (BM25 length norm)
+    term table    n_terms x (u64 term offset, u32 term length, u32 df, u64 postings offset),
+                  sorted by term bytes so lookups are a binary search
+    term blob     concatenated UTF-8 terms
+    postings      per term: df x (u32 doc, u32 tf)
+    bodies        one JSON object per document, with its sentence spans under "_sentences"
+
+Opening a file reads only the header; the OS pages in the term table and postings
+touched by a query, and document bodies are decoded only for the top-k hits. Resident
+memory therefore stays roughly flat as the corpus grows.
+
+Usage:
+    python -m tools.kbfile export-default kb.jsonl     # dump tools/kb.py as JSONL
+    python -m tools.kbfile build kb.jsonl kb.rakb      # compile JSONL (or '-' for stdin)
+    python -m tools.kbfile info kb.rakb
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from tools.index import Hit, Span, bm25_idf, bm25_top_k, bm25_top_k_batch, doc_tokens, query_terms, split_sentences, tokenize
+from tools.results import register_source
+
+MAGIC = b"RAKB"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sIIId6Q")
+_TERM = struct.Struct("<QIIQ")
+_POSTING_SIZE = 8  # u32 doc + u32 tf
+
+REQUIRED_FIELDS = ("id", "title", "text", "tags")
+
+# Body field holding the document's precomputed sentence spans (absent in older files).
+SENTENCES_FIELD = "_sentences"
+
+
+def _pad(f, alignment: int = 8) -> int:
+    pos = f.tell()
+    rem = pos % alignment
+    if rem:
+        f.write(b"\0" * (alignment - rem))
+    return f.tell()
+
+
+def _le(arr: array) -> array:
+    if sys.byteorder != "little":
+        arr.byteswap()
+    return arr
+
+
+def read_jsonl(path: str) -> Iterator[dict]:
+    f = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    try:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            doc = json.loads(line)
+            missing = [k for k in REQUIRED_FIELDS if k not in doc]
+            if missing:
+                raise ValueError(f"{path}:{lineno}: document missing fields {missing}")
+            yield doc
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def build_kb_file(docs: Iterable[dict], out_path: str) -> Tuple[int, int]:
+    """
+    Compiles documents into the binary KB format at out_path (written atomically).
+    Returns (n_docs, n_terms).
+    """
+    postings: Dict[str, array] = {}
+    doc_offsets = array("Q", [0])
+    doc_lengths = array("I")
+
+    # Bodies are spooled to disk while the postings are accumulated.
+    with tempfile.TemporaryFile() as bodies:
+        for i, doc in enumerate(docs):
+            body = {**doc, SENTENCES_FIELD: split_sentences(doc["text"])}
+            bodies.write(json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+            doc_offsets.append(bodies.tell())
+
+            tokens = doc_tokens(doc)
+            doc_lengths.append(len(tokens))
+            for tok, tf in Counter(tokens).items():
+                postings.setdefault(tok, array("I")).extend((i, tf))
+
+        n_docs = len(doc_lengths)
+        avgdl = (sum(doc_lengths) / n_docs) if n_docs else 0.0
+        terms = sorted(postings, key=lambda t: t.encode("utf-8"))
+
+        tmp_path = out_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(b"\0" * _HEADER.size)
+
+            doc_offsets_off = _pad(f)
+            f.write(_le(doc_offsets).tobytes())
+            doc_lengths_off = _pad(f)
+            f.write(_le(doc_lengths).tobytes())
+
+            term_table_off = _pad(f)
+            blob = bytearray()
+            post_pos = 0
+            for tok in terms:
+                encoded = tok.encode("utf-8")
+                df = len(postings[tok]) // 2
+                f.write(_TERM.pack(len(blob), len(encoded), df, post_pos))
+                blob += encoded
+                post_pos += df * _POSTING_SIZE
+            term_blob_off = _pad(f)
+            f.write(blob)
+
+            postings_off = _pad(f)
+            for tok in terms:
+                f.write(_le(postings[tok]).tobytes())
+
+            bodies_off = _pad(f)
+            bodies.seek(0)
+            while True:
+                chunk = bodies.read(1 << 20)
+                if not chunk:
+                    break
+                f.write(chunk)
+
+            f.seek(0)
+            f.write(
+                _HEADER.pack(
+                    MAGIC,
+                    FORMAT_VERSION,
+                    n_docs,
+                    len(terms),
+                    avgdl,
+                    doc_offsets_off,
+                    doc_lengths_off,
+                    term_table_off,
+                    term_blob_off,
+                    postings_off,
+                    bodies_off,
+                )
+            )
+        os.replace(tmp_path, out_path)
+
+    return n_docs, len(terms)
+
+
+class KBFile:
+    """
+    Read-only, memory-mapped view of a compiled KB file.
+    Same search interface as tools.index.InvertedIndex (len, doc, search) and identical BM25 scores.
+    """
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75) -> None:
+        if sys.byteorder != "little":
+            raise RuntimeError("KBFile requires a little-endian host")
+        self.path = path
+        self.k1 = k1
+        self.b = b
+
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        # Identifies this build of the file; used as the KB version for tool caching.
+        self.version = f"{os.path.abspath(path)}:{st.st_mtime_ns}:{st.st_size}"
+
+        (
+            magic,
+            fmt,
+            self.n_docs,
+            self.n_terms,
+            self.avg_doc_length,
+            doc_offsets_off,
+            doc_lengths_off,
+            term_table_off,
+            term_blob_off,
+            postings_off,
+            bodies_off,
+        ) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            self._mm.close()
+            raise ValueError(f"{path}: not a KB file (format {FORMAT_VERSION})")
+
+        mv = memoryview(self._mm)
+        self._doc_offsets = mv[doc_offsets_off : doc_offsets_off + 8 * (self.n_docs + 1)].cast("Q")
+        self._doc_lengths = mv[doc_lengths_off : doc_lengths_off + 4 * self.n_docs].cast("I")
+        self._term_table = mv[term_table_off : term_table_off + _TERM.size * self.n_terms]
+        self._term_blob = mv[term_blob_off:postings_off]
+        self._postings = mv[postings_off:bodies_off]
+        self._bodies = mv[bodies_off:]
+        # Lets typed search results (tools.results) resolve hits back to document text.
+        self.source = register_source(f"kbfile:{os.path.abspath(path)}", self.doc)
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def __enter__(self) -> "KBFile":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        for view in (self._doc_offsets, self._doc_lengths, self._term_table, self._term_blob, self._postings, self._bodies):
+            view.release()
+        self._mm.close()
+
+    def _term_entry(self, j: int) -> Tuple[bytes, int, int]:
+        blob_off, length, df, post_off = _TERM.unpack_from(self._term_table, j * _TERM.size)
+        return bytes(self._term_blob[blob_off : blob_off + length]), df, post_off
+
+    def _lookup(self, term: str) -> Optional[Tuple[int, int]]:
+        """
+        Binary search of the sorted term table; returns (df, postings offset) or None.
+        """
+        target = term.encode("utf-8")
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key, df, post_off = self._term_entry(mid)
+            if key < target:
+                lo = mid + 1
+            elif key > target:
+                hi = mid
+            else:
+                return df, post_off
+        return None
+
+    def postings(self, term: str) -> Optional[Tuple[int, Iterable[Tuple[int, int]]]]:
+        found = self._lookup(term)
+        if found is None:
+            return None
+        df, off = found
+        flat = self._postings[off : off + df * _POSTING_SIZE].cast("I")
+        return df, zip(flat[0::2], flat[1::2])
+
+    def _body(self, i: int) -> dict:
+        start, end = self._doc_offsets[i], self._doc_offsets[i + 1]
+        return json.loads(bytes(self._bodies[start:end]))
+
+    def doc(self, i: int) -> dict:
+        body = self._body(i)
+        body.pop(SENTENCES_FIELD, None)
+        return body
+
+    def sentences(self, i: int) -> Tuple[Span, ...]:
+        body = self._body(i)
+        spans = body.get(SENTENCES_FIELD)
+        return tuple(map(tuple, spans)) if spans is not None else split_sentences(body["text"])
+
+    def search(self, query: str, k: int) -> List[Hit]:
+        term_postings = []
+        for tok in sorted(set(tokenize(query))):
+            found = self.postings(tok)
+            if found is not None:
+                df, plist = found
+                term_postings.append((bm25_idf(self.n_docs, df), plist))
+        return bm25_top_k(term_postings, self._doc_lengths, self.avg_doc_length, k, self.k1, self.b)
+
+    def _idf_postings(self, term: str) -> Optional[Tuple[float, Iterable[Tuple[int, int]]]]:
+        found = self.postings(term)
+        if found is None:
+            return None
+        df, plist = found
+        return bm25_idf(self.n_docs, df), plist
+
+    def search_batch(self, queries: Sequence[str], k: int) -> List[List[Hit]]:
+        """
+        search() for many queries at once: each distinct term is decoded once (bm25_top_k_batch).
+        """
+        return bm25_top_k_batch(
+            [query_terms(q) for q in queries], self._idf_postings, self._doc_lengths, self.avg_doc_length, k, self.k1, self.b
+        )
+
+
+_OPEN_FILES: Dict[str, KBFile] = {}
+
+
+def open_kb_file(path: str) -> KBFile:
+    """
+    Shared KBFile per path, opened on first use.
+    """
+    key = os.path.abspath(path)
+    kb_file = _OPEN_FILES.get(key)
+    if kb_file is None:
+        kb_file = _OPEN_FILES[key] = KBFile(key)
+    return kb_file
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m tools.kbfile", description="Build and inspect binary KB files.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p_build = sub.add_parser("build", help="Compile a JSONL corpus (id, title, text, tags per line).")
+    p_build.add_argument("input", help="JSONL corpus path, or '-' for stdin.")
+    p_build.add_argument("output", help="Output KB file path.")
+
+    p_export = sub.add_parser("export-default", help="Write the in-module KB (tools/kb.py) as JSONL.")
+    p_export.add_argument("output")
+
+    p_info = sub.add_parser("info", help="Print header information for a KB file.")
+    p_info.add_argument("path")
+
+    args = parser.parse_args(argv)
+
+    if args.cmd == "build":
+        n_docs, n_terms = build_kb_file(read_jsonl(args.input), args.output)
+        print(f"wrote {args.output}: {n_docs} docs, {n_terms} terms, {os.path.getsize(args.output)} bytes")
+    elif args.cmd == "export-default":
+        from tools.kb import KB
+
+        with open(args.output, "w", encoding="utf-8") as f:
+            for doc in KB:
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+        print(f"wrote {args.output}: {len(KB)} docs")
+    elif args.cmd == "info":
+        with KBFile(args.path) as kb:
+            print(f"{args.path}: {kb.n_docs} docs, {kb.n_terms} terms, avg doc length {kb.avg_doc_length:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,15 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any, Callable, Dict
+import asyncio
+import inspect
+import json
+import threading
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from tools.cache import ToolCache
 
 
 @dataclass(frozen=True)
@@ -9,12 +17,106 @@ class ToolSpec:
     name: str
     description: str
     schema: dict
-    fn: Callable[..., str]
+    # Plain function or coroutine function (async def) returning the tool output: text, or a
+    # typed result from tools.results (rendered only when printed).
+    fn: Callable[..., Union[Any, Awaitable[Any]]]
+    # Opt-in memoization: only for deterministic tools whose output depends on args (+ KB version).
+    cacheable: bool = False
+    # Max seconds the agent waits for one call before recording it as timed out (None = no limit).
+    timeout_s: Optional[float] = None
+    # Optional vectorized form, used for several calls in one step (ToolRegistry.invoke_batch):
+    # batch_fn([v1, v2, ...], **other_args) takes the `batch_arg` values of calls that agree
+    # on every other argument and returns one output per value (e.g. search_web_batch).
+    batch_fn: Optional[Callable[..., List[Any]]] = None
+    batch_arg: Optional[str] = None
+
+    @property
+    def is_async(self) -> bool:
+        return inspect.iscoroutinefunction(self.fn)
+
+
+def full_args(fn: Callable[..., Any], args: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A call's arguments with defaults filled in (as given, if they don't bind to fn).
+    """
+    try:
+        bound = inspect.signature(fn).bind(**args)
+        bound.apply_defaults()
+        return dict(bound.arguments)
+    except (TypeError, ValueError):
+        return dict(args)
+
+
+def canonical_args(fn: Callable[..., Any], args: Dict[str, Any]) -> str:
+    """
+    Stable string form of a call's arguments: defaults filled in, keys sorted.
+    So search_web(query="x") and search_web(k=3, query="x") map to the same key.
+    """
+    return json.dumps(full_args(fn, args), sort_keys=True, ensure_ascii=False, default=str)
+
+
+@dataclass
+class CallStats:
+    """
+    How often the registry shared work between calls: `coalesced` of the `executions`
+    requested for deterministic tools (cacheable, after cache misses) were served by an
+    identical call already in flight, and `batch_sizes` counts how many distinct calls
+    each batch_fn execution served.
+    """
+    executions: int = 0
+    coalesced: int = 0
+    batch_sizes: Counter = field(default_factory=Counter)
+
+    @property
+    def coalesce_ratio(self) -> float:
+        return self.coalesced / self.executions if self.executions else 0.0
+
+    @property
+    def batches(self) -> int:
+        return sum(self.batch_sizes.values())
+
+    @property
+    def mean_batch_size(self) -> float:
+        n = self.batches
+        return sum(size * count for size, count in self.batch_sizes.items()) / n if n else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "coalesce_ratio": round(self.coalesce_ratio, 4),
+            "batches": self.batches,
+            "mean_batch_size": round(self.mean_batch_size, 3),
+            "batch_sizes": {str(size): count for size, count in sorted(self.batch_sizes.items())},
+        }
 
 
 class ToolRegistry:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        cache: Optional[ToolCache] = None,
+        version_fn: Optional[Callable[[], Any]] = None,
+        coalesce: bool = True,
+        glossary: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        """
+        cache: optional memoization layer for tools registered with cacheable=True.
+        version_fn: returns the current data version (e.g. the KB version); it is part of
+        every cache key, so bumping it invalidates previously cached outputs.
+        coalesce: single-flight for cacheable tools. A call identical (same cache key) to
+        one already running, e.g. from a concurrent request, waits for that call's output
+        instead of running again. Counted in `stats`.
+        glossary: returns the tools.glossary.Glossary behind lookup_definition, when it is a
+        file glossary (None = the built-in DEFINITIONS); the planner looks for its terms.
+        """
         self._tools: Dict[str, ToolSpec] = {}
+        self.cache = cache
+        self.glossary = glossary
+        self._version_fn = version_fn
+        self.coalesce = coalesce
+        self.stats = CallStats()
+        self._inflight: Dict[Tuple[str, str, Any], Future] = {}
+        self._lock = threading.Lock()
 
     def register(self, spec: ToolSpec) -> None:
         if spec.name in self._tools:
@@ -44,5 +146,192 @@ class ToolRegistry:
             )
         return schemas
 
-    def call(self, name: str, **kwargs: Any) -> str:
-        return self.get(name).fn(**kwargs)
\ No newline at end of file
+    def data_version(self) -> Any:
+        """
+        Version of the data the tools read (e.g. the KB); None if not tracked.
+        """
+        return self._version_fn() if self._version_fn else None
+
+    def cache_key(self, spec: ToolSpec, args: Dict[str, Any]) -> Tuple[str, str, Any]:
+        return (spec.name, canonical_args(spec.fn, args), self.data_version())
+
+    @staticmethod
+    def _run_sync(spec: ToolSpec, args: Dict[str, Any]) -> Any:
+        if spec.is_async:
+            # Sync callers (e.g. act_node worker threads) have no running event loop.
+            return asyncio.run(spec.fn(**args))
+        return spec.fn(**args)
+
+    @staticmethod
+    async def _run_async(spec: ToolSpec, args: Dict[str, Any]) -> Any:
+        if spec.is_async:
+            return await spec.fn(**args)
+        # Keep blocking sync tools off the event loop.
+        return await asyncio.to_thread(spec.fn, **args)
+
+    def _claim(self, key: Tuple[str, str, Any]) -> Tuple[bool, Future]:
+        """
+        Single-flight: (True, new future) when the caller should run the call and publish
+        its output with _release, else (False, the running call's future).
+        """
+        with self._lock:
+            self.stats.executions += 1
+            fut = self._inflight.get(key)
+            if fut is not None:
+                self.stats.coalesced += 1
+                return False, fut
+            fut = self._inflight[key] = Future()
+            return True, fut
+
+    def _release(self, key: Tuple[str, str, Any], fut: Future, out: Any = None, exc: Optional[BaseException] = None) -> None:
+        if exc is None and self.cache is not None:
+            self.cache.put(key, out)
+        with self._lock:
+            del self._inflight[key]
+        if exc is not None:
+            fut.set_exception(exc)
+        else:
+            fut.set_result(out)
+
+    def invoke(self, name: str, args: Dict[str, Any]) -> Tuple[Any, Optional[bool]]:
+        """
+        Runs a tool, consulting the cache for cacheable tools and sharing identical
+        in-flight calls (coalesce).
+        Returns (output, cache_hit); cache_hit is None when the call bypassed the cache.
+        """
+        spec = self.get(name)
+        if not spec.cacheable or (self.cache is None and not self.coalesce):
+            return self._run_sync(spec, args), None
+
+        key = self.cache_key(spec, args)
+        miss = False if self.cache is not None else None
+        if self.cache is not None:
+            hit, out = self.cache.get(key)
+            if hit:
+                return out, True
+        if not self.coalesce:
+            out = self._run_sync(spec, args)
+            self.cache.put(key, out)
+            return out, miss
+
+        leader, fut = self._claim(key)
+        if not leader:
+            return fut.result(), miss
+        try:
+            out = self._run_sync(spec, args)
+        except BaseException as exc:
+            self._release(key, fut, exc=exc)
+            raise
+        self._release(key, fut, out)
+        return out, miss
+
+    async def ainvoke(self, name: str, args: Dict[str, Any]) -> Tuple[Any, Optional[bool]]:
+        """
+        Async counterpart of invoke(): awaits coroutine tools, runs sync tools in a thread.
+        """
+        spec = self.get(name)
+        if not spec.cacheable or (self.cache is None and not self.coalesce):
+            return await self._run_async(spec, args), None
+
+        key = self.cache_key(spec, args)
+        miss = False if self.cache is not None else None
+        if self.cache is not None:
+            hit, out = self.cache.get(key)
+            if hit:
+                return out, True
+        if not self.coalesce:
+            out = await self._run_async(spec, args)
+            self.cache.put(key, out)
+            return out, miss
+
+        leader, fut = self._claim(key)
+        if not leader:
+            return await asyncio.wrap_future(fut), miss
+        try:
+            out = await self._run_async(spec, args)
+        except BaseException as exc:
+            self._release(key, fut, exc=exc)
+            raise
+        self._release(key, fut, out)
+        return out, miss
+
+    def invoke_batch(self, name: str, args_list: List[Dict[str, Any]]) -> List[Tuple[Any, Optional[bool]]]:
+        """
+        invoke() for several calls of one tool, with the same results: calls that miss the
+        cache (and are not already in flight elsewhere) run through ToolSpec.batch_fn, one
+        execution per group of calls that differ only in `batch_arg`. Identical calls in
+        the list run once. Tools without batch_fn (or async ones) are invoked one by one.
+        """
+        spec = self.get(name)
+        if spec.batch_fn is None or spec.is_async:
+            return [self.invoke(name, args) for args in args_list]
+
+        results: List[Optional[Tuple[Any, Optional[bool]]]] = [None] * len(args_list)
+        miss = False if self.cache is not None and spec.cacheable else None
+        shared = spec.cacheable and (self.cache is not None or self.coalesce)
+        pending: Dict[Any, List[int]] = {}  # cache key (or position) -> positions in args_list
+        for j, args in enumerate(args_list):
+            key = self.cache_key(spec, args) if shared else j
+            if shared and self.cache is not None:
+                hit, out = self.cache.get(key)
+                if hit:
+                    results[j] = (out, True)
+                    continue
+            pending.setdefault(key, []).append(j)
+
+        waiting: List[Tuple[Future, List[int]]] = []
+        groups: Dict[str, List[Tuple[Any, Optional[Future]]]] = {}
+        for key, positions in pending.items():
+            fut = None
+            if shared and self.coalesce:
+                leader, fut = self._claim(key)
+                with self._lock:
+                    self.stats.executions += len(positions) - 1
+                    self.stats.coalesced += len(positions) - 1
+                if not leader:
+                    waiting.append((fut, positions))
+                    continue
+            common = full_args(spec.fn, args_list[positions[0]])
+            common.pop(spec.batch_arg, None)
+            group = json.dumps(common, sort_keys=True, ensure_ascii=False, default=str)
+            groups.setdefault(group, []).append((key, fut))
+
+        unreleased = {key: fut for members in groups.values() for key, fut in members if fut is not None}
+        try:
+            for members in groups.values():
+                common = full_args(spec.fn, args_list[pending[members[0][0]][0]])
+                common.pop(spec.batch_arg, None)
+                outs = spec.batch_fn([args_list[pending[key][0]][spec.batch_arg] for key, _ in members], **common)
+                with self._lock:
+                    self.stats.batch_sizes[len(members)] += 1
+                for (key, fut), out in zip(members, outs):
+                    if fut is not None:
+                        self._release(key, unreleased.pop(key), out)
+                    elif shared:
+                        self.cache.put(key, out)
+                    for j in pending[key]:
+                        results[j] = (out, miss)
+        except BaseException as exc:
+            # Calls coalesced onto the ones that never ran must not wait forever.
+            for key, fut in unreleased.items():
+                self._release(key, fut, exc=exc)
+            raise
+
+        for fut, positions in waiting:
+            out = fut.result()
+            for j in positions:
+                results[j] = (out, miss)
+        return results
+
+    def invalidate(self) -> None:
+        """
+        Drops all cached tool outputs.
+        """
+        if self.cache is not None:
+            self.cache.clear()
+
+    def call(self, name: str, **kwargs: Any) -> Any:
+        return self.invoke(name, kwargs)[0]
+
+    async def acall(self, name: str, **kwargs: Any) -> Any:
+        return (await self.ainvoke(name, kwargs))[0]
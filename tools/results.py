@@ -0,0 +1,177 @@
+"""
+Typed tool outputs.
+
+Tools return these instead of pre-rendered strings: a search result holds doc ids,
+scores and a snippet span into the source document, and text is produced only when
+something is printed (render_output). The objects are immutable, so the tool cache,
+AgentState.tool_results and every copy of the state share the same instances.
+"""
+from __future__ import annotations
+
+import itertools
+import weakref
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple
+
+from pydantic import BaseModel, ConfigDict
+
+from tools.snippets import join_extracted, select_sentences, sentence_text
+
+# Rendered text of a search without hits; also recognized in plain-string outputs.
+NO_RESULTS_PREFIX = "No offline KB results"
+
+# source name -> doc(i); see register_source.
+_SOURCES: Dict[str, Callable[[int], dict]] = {}
+
+
+def register_source(name: str, doc_fn: Callable[[int], dict]) -> str:
+    """
+    Makes documents of a search engine resolvable by (source, doc index) at render time.
+    """
+    _SOURCES[name] = doc_fn
+    return name
+
+
+def unregister_source(name: str) -> None:
+    _SOURCES.pop(name, None)
+
+
+_engine_ids = itertools.count(1)
+
+
+def register_engine_source(engine) -> str:
+    """
+    register_source for an engine without a stable source name of its own (e.g. an
+    in-memory tools.index.InvertedIndex). The name is process-unique and never reused;
+    the engine is held weakly and the source is dropped when the engine is collected, so
+    hits rendered after that resolve to nothing rather than to another engine's documents.
+    """
+    name = f"engine:{next(_engine_ids)}"
+    ref = weakref.ref(engine)
+
+    def doc(index: int) -> Optional[dict]:
+        live = ref()
+        return live.doc(index) if live is not None else None
+
+    register_source(name, doc)
+    weakref.finalize(engine, unregister_source, name)
+    return name
+
+
+def source_doc(source: str, index: int) -> Optional[dict]:
+    doc_fn = _SOURCES.get(source)
+    if doc_fn is None:
+        if source.startswith("kb@"):
+            # The in-module KB, valid only for the content (digest) that produced the hit.
+            from tools.kb import KB, kb_digest
+
+            return KB[index] if source == f"kb@{kb_digest()}" and index < len(KB) else None
+        if source.startswith("kbfile:"):
+            # A KB file not opened in this process yet (e.g. a result read back from the answer cache).
+            from tools.kbfile import open_kb_file
+
+            return open_kb_file(source[len("kbfile:") :]).doc(index)
+        if source.startswith("kbdir:"):
+            # A KB directory (tools.ingest): valid only while that version is current.
+            from tools.ingest import open_live_kb
+
+            directory, _, version = source[len("kbdir:") :].rpartition("@")
+            snapshot = open_live_kb(directory).snapshot
+            return snapshot.doc(index) if str(snapshot.version) == version else None
+        return None
+    return doc_fn(index)
+
+
+class SearchHit(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    doc_id: str
+    title: str
+    score: float
+    doc_index: int  # position of the document in its source
+    start: int  # snippet span within the document text
+    end: int
+    # Sentence spans of the document text, precomputed by the index (tools.snippets).
+    sentences: Tuple[Tuple[int, int], ...] = ()
+
+
+class SearchResults(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    kind: Literal["search"] = "search"
+    query: str
+    source: str
+    hits: Tuple[SearchHit, ...] = ()
+
+    @property
+    def empty(self) -> bool:
+        return not self.hits
+
+    def snippet(self, hit: SearchHit) -> str:
+        doc = source_doc(self.source, hit.doc_index)
+        if doc is None:
+            return "(document text unavailable: the KB changed since this search)"
+        return doc["text"][hit.start : hit.end]
+
+    def sentences(self, hit: SearchHit) -> List[str]:
+        """
+        The hit's snippet as sentences, from the spans segmented at index time.
+        """
+        doc = source_doc(self.source, hit.doc_index)
+        if doc is None:
+            return [self.snippet(hit)]
+        return [sentence_text(doc["text"], span) for span in hit.sentences if hit.start <= span[0] and span[1] <= hit.end]
+
+    def extract(self, query: str, max_sentences: int = 2) -> str:
+        """
+        Query-aware extractive summary: the best-matching sentences across all hits
+        (tools.snippets.select_sentences), in rank then text order.
+        """
+        passages = []
+        for hit in self.hits:
+            doc = source_doc(self.source, hit.doc_index)
+            text = doc["text"] if doc is not None else ""
+            passages.append((text, [sp for sp in hit.sentences if hit.start <= sp[0] and sp[1] <= hit.end]))
+        chosen = select_sentences(query, passages, max_sentences)
+        return join_extracted([sentence_text(passages[p][0], span) for p, span in chosen])
+
+    def render(self) -> str:
+        if not self.hits:
+            return f"{NO_RESULTS_PREFIX} for query='{self.query}'. (KB is small; add more docs in tools/kb.py.)"
+        return "\n".join(
+            f"{i}. {hit.title} (doc_id={hit.doc_id}) — {self.snippet(hit)}" for i, hit in enumerate(self.hits, 1)
+        )
+
+
+class Definition(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    kind: Literal["definition"] = "definition"
+    term: str
+    text: Optional[str] = None  # None = unknown term
+    matched: Optional[str] = None  # glossary term, when found through an alias or a typo
+    glossary: Optional[str] = None  # glossary file searched; None = the in-module DEFINITIONS
+
+    def render(self) -> str:
+        if self.text is None:
+            where = f"Add it to the glossary file {self.glossary}" if self.glossary else "Extend DEFINITIONS to add it"
+            return f"No definition found for '{self.term}'. {where}."
+        if self.matched is not None:
+            return f"{self.text} (matched '{self.matched}')"
+        return self.text
+
+
+def render_output(output: Any) -> str:
+    """
+    Text form of a tool output, for printing and logs.
+    """
+    return output if isinstance(output, str) else output.render()
+
+
+def no_results(output: Any) -> bool:
+    """
+    True for a search output without hits (typed, or a plain string from a custom tool).
+    Other typed outputs can say so with an `empty` attribute (agent.audit.AuditedOutput).
+    """
+    if isinstance(output, str):
+        return NO_RESULTS_PREFIX in output
+    return bool(getattr(output, "empty", False))
@@ -0,0 +1,216 @@
+"""
+Sharded BM25 search across worker processes.
+
+The corpus is split into N contiguous shards. Each shard is compiled into a KB file
+(tools.kbfile) by a worker process (reading its own slice when the corpus is a KB file), and workers memory-map the shard files, so every
+worker shares one copy of each index through the OS page cache. A query is fanned out
+to all shards and the per-shard top-k lists are merged.
+
+Scores are identical to an unsharded tools.index.InvertedIndex: idf and the average
+document length come from corpus-wide statistics held by the coordinator (sent with
+each query), not from each shard's own counts, and contiguous shards keep global doc
+order, so ties still break toward earlier documents.
+"""
+from __future__ import annotations
+
+import heapq
+import multiprocessing as mp
+import os
+import shutil
+import tempfile
+import weakref
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+from tools.index import Hit, Span, bm25_idf, bm25_top_k, bm25_top_k_batch, doc_tokens, tokenize
+from tools.kbfile import KBFile, build_kb_file
+from tools.snippets import sentence_spans
+
+# --- worker process -------------------------------------------------------
+
+_WORKER_SHARDS: Dict[str, KBFile] = {}
+
+
+def _shard_file(path: str) -> KBFile:
+    kb_file = _WORKER_SHARDS.get(path)
+    if kb_file is None:
+        kb_file = _WORKER_SHARDS[path] = KBFile(path)
+    return kb_file
+
+
+def _build_shard(docs: List[dict], path: str) -> Tuple[Counter, int]:
+    """
+    Compiles one shard; returns its document frequencies and total token count.
+    """
+    build_kb_file(docs, path)
+    df: Counter = Counter()
+    total_length = 0
+    for doc in docs:
+        tokens = doc_tokens(doc)
+        total_length += len(tokens)
+        df.update(set(tokens))
+    return df, total_length
+
+
+def _build_shard_from_file(kb_path: str, lo: int, hi: int, path: str) -> Tuple[Counter, int]:
+    """
+    _build_shard for documents [lo, hi) of a KB file, read by the worker itself.
+    """
+    source = KBFile(kb_path)
+    try:
+        docs = [source.doc(i) for i in range(lo, hi)]
+    finally:
+        source.close()
+    return _build_shard(docs, path)
+
+
+def _search_shard(
+    path: str,
+    offset: int,
+    term_idfs: List[Tuple[str, float]],
+    avg_doc_length: float,
+    k: int,
+    k1: float,
+    b: float,
+) -> List[Hit]:
+    kb_file = _shard_file(path)
+    term_postings = []
+    for term, idf in term_idfs:
+        found = kb_file.postings(term)
+        if found is not None:
+            term_postings.append((idf, found[1]))
+    hits = bm25_top_k(term_postings, kb_file._doc_lengths, avg_doc_length, k, k1, b)
+    return [(score, offset + i) for score, i in hits]
+
+
+def _search_shard_batch(
+    path: str,
+    offset: int,
+    query_terms: List[List[str]],
+    idfs: Dict[str, float],
+    avg_doc_length: float,
+    k: int,
+    k1: float,
+    b: float,
+) -> List[List[Hit]]:
+    kb_file = _shard_file(path)
+
+    def lookup(term: str):
+        found = kb_file.postings(term)
+        return (idfs[term], found[1]) if found is not None else None
+
+    batches = bm25_top_k_batch(query_terms, lookup, kb_file._doc_lengths, avg_doc_length, k, k1, b)
+    return [[(score, offset + i) for score, i in hits] for hits in batches]
+
+
+# --- coordinator ----------------------------------------------------------
+
+def _cleanup(pool: ProcessPoolExecutor, workdir: str) -> None:
+    pool.shutdown(wait=True, cancel_futures=True)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+class ShardedIndex:
+    """
+    Same interface as tools.index.InvertedIndex (len, doc, search), with each query
+    fanned out over `n_shards` shards served by `workers` processes (default one per
+    shard). `docs` is a document sequence or anything with len() and doc(i), such as a
+    tools.kbfile.KBFile. Call close() (or let the index be garbage collected) to stop
+    the workers.
+    """
+
+    def __init__(
+        self,
+        docs: Sequence[dict],
+        n_shards: int,
+        workers: Optional[int] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ) -> None:
+        if n_shards < 1:
+            raise ValueError("n_shards must be >= 1")
+        self.docs = docs
+        self._doc = docs.doc if hasattr(docs, "doc") else docs.__getitem__
+        self.k1 = k1
+        self.b = b
+        self._n_docs = len(docs)
+
+        size = -(-self._n_docs // n_shards) if self._n_docs else 0
+        bounds = [(lo, min(lo + size, self._n_docs)) for lo in range(0, self._n_docs, size)] if size else []
+        self._workdir = tempfile.mkdtemp(prefix="rakb-shards-")
+        self.shards: List[Tuple[str, int]] = [
+            (os.path.join(self._workdir, f"shard{j}.rakb"), lo) for j, (lo, _) in enumerate(bounds)
+        ]
+
+        # spawn, not fork: the service calls this from a process that already runs threads.
+        max_workers = workers or max(1, len(bounds))
+        self._pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=mp.get_context("spawn"))
+        self._finalizer = weakref.finalize(self, _cleanup, self._pool, self._workdir)
+
+        # Workers read their own slice of a KB file; other sequences are sliced here, at
+        # most one shard per worker at a time, so the corpus is never copied whole.
+        kb_path = docs.path if isinstance(docs, KBFile) else None
+        self.df: Counter = Counter()
+        total_length = 0
+        pending: Deque[Future] = deque()
+        for (path, _), (lo, hi) in zip(self.shards, bounds):
+            if len(pending) >= max_workers:
+                total_length += self._merge_shard_stats(pending.popleft())
+            if kb_path is not None:
+                pending.append(self._pool.submit(_build_shard_from_file, kb_path, lo, hi, path))
+            else:
+                pending.append(self._pool.submit(_build_shard, [self._doc(i) for i in range(lo, hi)], path))
+        while pending:
+            total_length += self._merge_shard_stats(pending.popleft())
+        self.avg_doc_length = (total_length / self._n_docs) if self._n_docs else 0.0
+
+    def _merge_shard_stats(self, fut: Future) -> int:
+        df, length = fut.result()
+        self.df.update(df)
+        return length
+
+    def __len__(self) -> int:
+        return self._n_docs
+
+    def doc(self, i: int) -> dict:
+        return self._doc(i)
+
+    def sentences(self, i: int) -> Tuple[Span, ...]:
+        if hasattr(self.docs, "sentences"):
+            return self.docs.sentences(i)
+        return sentence_spans(self._doc(i)["text"])
+
+    def close(self) -> None:
+        self._finalizer()
+
+    def search(self, query: str, k: int) -> List[Hit]:
+        term_idfs = [
+            (tok, bm25_idf(self._n_docs, self.df[tok])) for tok in sorted(set(tokenize(query))) if tok in self.df
+        ]
+        if not term_idfs:
+            return []
+        futures = [
+            self._pool.submit(_search_shard, path, offset, term_idfs, self.avg_doc_length, k, self.k1, self.b)
+            for path, offset in self.shards
+        ]
+        hits = [hit for fut in futures for hit in fut.result()]
+        return heapq.nlargest(k, hits, key=lambda hit: (hit[0], -hit[1]))
+
+    def search_batch(self, queries: Sequence[str], k: int) -> List[List[Hit]]:
+        """
+        search() for many queries with one round trip per shard instead of one per query and shard.
+        """
+        query_terms = [[tok for tok in sorted(set(tokenize(q))) if tok in self.df] for q in queries]
+        idfs = {tok: bm25_idf(self._n_docs, self.df[tok]) for terms in query_terms for tok in terms}
+        if not idfs:
+            return [[] for _ in queries]
+        futures = [
+            self._pool.submit(_search_shard_batch, path, offset, query_terms, idfs, self.avg_doc_length, k, self.k1, self.b)
+            for path, offset in self.shards
+        ]
+        per_shard = [fut.result() for fut in futures]
+        return [
+            heapq.nlargest(k, [hit for shard in per_shard for hit in shard[q]], key=lambda hit: (hit[0], -hit[1]))
+            for q in range(len(queries))
+        ]
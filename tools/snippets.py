@@ -0,0 +1,83 @@
+"""
+Sentence segmentation and extractive snippets.
+
+Sentences are stored as (start, end) character spans into the original text, so the
+indexes can segment every document once at build time (InvertedIndex.sentences,
+KBFile.sentences) and search hits can carry the spans without copying text. The
+boundary rule is the one summarize has always used: a period followed by whitespace.
+"""
+from __future__ import annotations
+
+import math
+from functools import lru_cache
+from typing import List, Sequence, Tuple
+
+from tools.index import Span, split_sentences, tokenize
+
+
+@lru_cache(maxsize=4096)
+def sentence_spans(text: str) -> Tuple[Span, ...]:
+    """
+    split_sentences, memoized for texts that are not backed by an index (tool arguments).
+    """
+    return split_sentences(text)
+
+
+def sentence_text(text: str, span: Span) -> str:
+    return " ".join(text[span[0] : span[1]].split())
+
+
+def join_sentences(sentences: Sequence[str]) -> str:
+    out = ". ".join(sentences)
+    if out and not out.endswith("."):
+        out += "."
+    return out
+
+
+def join_extracted(sentences: Sequence[str]) -> str:
+    """
+    join_sentences for sentences picked out of order: the last sentence of a text keeps
+    its period, which would otherwise double up when it lands mid-summary.
+    """
+    return join_sentences([s[:-1] if s.endswith(".") else s for s in sentences])
+
+
+def doc_sentences(engine, i: int) -> Tuple[Span, ...]:
+    """
+    Sentence spans of document i's text: precomputed by the engine when it keeps them.
+    """
+    sentences = getattr(engine, "sentences", None)
+    if sentences is not None:
+        return sentences(i)
+    return sentence_spans(engine.doc(i)["text"])
+
+
+def select_sentences(query: str, passages: Sequence[Tuple[str, Sequence[Span]]], max_sentences: int) -> List[Tuple[int, Span]]:
+    """
+    Query-aware extraction: the `max_sentences` best (passage index, span) pairs across all
+    passages, returned in passage then text order. A sentence scores the idf-weighted
+    count of distinct query terms it contains (idf over the candidate sentences, so terms
+    that appear everywhere count little); ties go to earlier passages and positions.
+    Without any matching sentence, the leading sentences are returned.
+    """
+    q_terms = set(tokenize(query))
+    candidates = []
+    df: dict = {}
+    for p, (text, spans) in enumerate(passages):
+        for span in spans:
+            matched = q_terms.intersection(tokenize(text[span[0] : span[1]]))
+            candidates.append((p, span, matched))
+            for term in matched:
+                df[term] = df.get(term, 0) + 1
+
+    n = len(candidates)
+    scored = []
+    for order, (p, span, matched) in enumerate(candidates):
+        score = sum(math.log(1.0 + n / df[t]) for t in matched)
+        scored.append((-score, order, p, span))
+    scored.sort()
+    if scored and scored[0][0] < 0:
+        chosen = [s for s in scored[:max_sentences] if s[0] < 0]
+    else:
+        chosen = sorted(scored, key=lambda s: s[1])[:max_sentences]
+    return [(p, span) for _, _, p, span in sorted(chosen, key=lambda s: s[1])]
@@ -0,0 +1,172 @@
+"""
+Vectorized retrieval over hashed n-gram TF-IDF features (NumPy/SciPy).
+
+Documents are encoded once into a sparse, L2-normalized matrix. A batch of queries is
+encoded the same way and scored against every document with one sparse matrix product;
+top-k selection uses argpartition per query. With `dim` set, features are additionally
+projected (signed feature hashing) into small dense "hashed embeddings" and scored with
+a dense matrix product instead.
+
+numpy and scipy are optional dependencies, imported only when an index is built.
+"""
+from __future__ import annotations
+
+import zlib
+from array import array
+from collections import Counter
+from typing import List, Optional, Sequence
+
+from tools.index import Hit, doc_tokens, tokenize
+
+
+def _require_numpy():
+    try:
+        import numpy as np
+        import scipy.sparse as sp
+    except ImportError as e:  # pragma: no cover - depends on the environment
+        raise ImportError("The vector search backends need numpy and scipy: pip install numpy scipy") from e
+    return np, sp
+
+
+def _feature_hash(gram: str, n_features: int) -> int:
+    # crc32 is stable across processes (unlike hash()), so batch workers agree on features.
+    return zlib.crc32(gram.encode("utf-8")) % n_features
+
+
+class HashedVectorIndex:
+    """
+    Hashed TF-IDF retrieval: sublinear tf, smoothed idf, cosine similarity.
+    Same interface as tools.index.InvertedIndex (len, doc, search) plus search_batch.
+    """
+
+    def __init__(
+        self,
+        docs: Sequence[dict],
+        n_features: int = 1 << 22,
+        ngram_max: int = 2,
+        dim: Optional[int] = None,
+        min_score: Optional[float] = None,
+        chunk_size: int = 256,
+    ) -> None:
+        np, sp = _require_numpy()
+        self._np, self._sp = np, sp
+        self.docs = docs
+        self.n_features = n_features
+        self.ngram_max = ngram_max
+        self.dim = dim
+        self.chunk_size = chunk_size
+        # Sparse scores are exactly 0 without a shared feature; hashed embeddings are never
+        # exactly 0, so they need a real cutoff to report "no results".
+        self.min_score = min_score if min_score is not None else (0.1 if dim else 0.0)
+
+        x = self._encode_counts([doc_tokens(doc) for doc in docs])
+        self._n_docs = x.shape[0]
+        df = np.bincount(x.indices, minlength=n_features)
+        self.idf = (np.log((1.0 + self._n_docs) / (1.0 + df)) + 1.0).astype(np.float32)
+        weighted = self._weight(x)
+
+        self.projection = None
+        if dim:
+            # (docs, dim) dense hashed embeddings.
+            self.projection = self._projection(n_features, dim)
+            self.matrix = self._dense(weighted)
+        else:
+            # (features, docs): transposed once so Q @ matrix needs no per-query conversion.
+            self.matrix = weighted.T.tocsr()
+
+    # --- encoding ------------------------------------------------------------
+
+    def _grams(self, tokens: List[str]) -> List[str]:
+        grams = list(tokens)
+        for n in range(2, self.ngram_max + 1):
+            grams += [" ".join(tokens[i : i + n]) for i in range(len(tokens) - n + 1)]
+        return grams
+
+    def _encode_counts(self, token_lists: List[List[str]]):
+        np, sp = self._np, self._sp
+        indptr = array("q", [0])
+        indices = array("i")
+        data = array("f")
+        for tokens in token_lists:
+            counts = Counter(_feature_hash(g, self.n_features) for g in self._grams(tokens))
+            indices.extend(counts.keys())
+            data.extend(counts.values())
+            indptr.append(len(indices))
+        return sp.csr_matrix(
+            (np.frombuffer(data, dtype=np.float32), np.frombuffer(indices, dtype=np.int32), np.frombuffer(indptr, dtype=np.int64)),
+            shape=(len(token_lists), self.n_features),
+        )
+
+    def _weight(self, counts):
+        """
+        Sublinear tf * idf, then L2-normalized rows; done on the CSR arrays directly
+        (a diagonal idf matrix would cost O(n_features) per query batch).
+        """
+        np = self._np
+        x = counts.copy()
+        x.data = (1.0 + np.log(x.data)) * self.idf[x.indices]
+        rows = np.repeat(np.arange(x.shape[0]), np.diff(x.indptr))
+        norms = np.sqrt(np.bincount(rows, weights=x.data.astype(np.float64) ** 2, minlength=x.shape[0]))
+        norms[norms == 0] = 1.0
+        x.data = (x.data / norms[rows]).astype(np.float32)
+        return x
+
+    def _projection(self, n_features: int, dim: int):
+        np, sp = self._np, self._sp
+        feats = np.arange(n_features, dtype=np.uint64)
+        h = (feats * np.uint64(2654435761)) % np.uint64(1 << 32)
+        cols = (h % np.uint64(dim)).astype(np.int64)
+        signs = np.where((h >> np.uint64(16)) & np.uint64(1), 1.0, -1.0).astype(np.float32)
+        return sp.csr_matrix((signs, (np.arange(n_features), cols)), shape=(n_features, dim))
+
+    def _dense(self, x):
+        np = self._np
+        e = np.asarray((x @ self.projection).todense(), dtype=np.float32)
+        norms = np.linalg.norm(e, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return e / norms
+
+    def encode_queries(self, queries: Sequence[str]):
+        q = self._weight(self._encode_counts([tokenize(text) for text in queries]))
+        return self._dense(q) if self.dim else q
+
+    # --- search --------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._n_docs
+
+    def doc(self, i: int) -> dict:
+        return self.docs[i]
+
+    def _top_k(self, idx, scores, k: int) -> List[Hit]:
+        np = self._np
+        keep = scores > self.min_score
+        idx, scores = idx[keep], scores[keep]
+        if len(scores) > k:
+            part = np.argpartition(-scores, k - 1)[:k]
+            idx, scores = idx[part], scores[part]
+        order = np.lexsort((idx, -scores))
+        return [(float(scores[j]), int(idx[j])) for j in order]
+
+    def search(self, query: str, k: int) -> List[Hit]:
+        return self.search_batch([query], k)[0]
+
+    def search_batch(self, queries: Sequence[str], k: int) -> List[List[Hit]]:
+        """
+        Scores all queries against all documents with one matrix product per chunk of
+        `chunk_size` queries.
+        """
+        np = self._np
+        out: List[List[Hit]] = []
+        for start in range(0, len(queries), self.chunk_size):
+            q = self.encode_queries(queries[start : start + self.chunk_size])
+            if self.dim:
+                scores = q @ self.matrix.T  # (queries, docs), dense
+                all_idx = np.arange(scores.shape[1])
+                out.extend(self._top_k(all_idx, row, k) for row in scores)
+            else:
+                scores = (q @ self.matrix).tocsr()  # sparse: only docs sharing a feature
+                for r in range(scores.shape[0]):
+                    lo, hi = scores.indptr[r], scores.indptr[r + 1]
+                    out.append(self._top_k(scores.indices[lo:hi], scores.data[lo:hi], k))
+        return out